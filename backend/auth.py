@@ -1,8 +1,9 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import secrets
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Header, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
@@ -51,4 +52,9 @@ async def get_current_admin_session(token: str = Depends(oauth2_scheme), db: Ses
     if db_session is None:
         raise credentials_exception
         
-    return db_session
\ No newline at end of file
+    return db_session
+
+def verify_worker_token(x_worker_token: str = Header(default="")):
+    # Внутренние события принимаем только от воркеров с общим секретом из WORKER_TOKEN
+    if not settings.WORKER_TOKEN or not secrets.compare_digest(x_worker_token, settings.WORKER_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid worker token")
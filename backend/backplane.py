@@ -0,0 +1,198 @@
+import asyncio
+import itertools
+import json
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.config import settings
+
+# Шина между процессами API для рассылок по вебсокетам. Каждый процесс доставляет сообщения
+# только своим сокетам, а событие из шины получают все остальные процессы и узлы.
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+class Backplane:
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        self._handler = None
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        if self._handler is None:
+            return
+        try:
+            self._handler(event)
+        except Exception as e:
+            print(f"⚠️ Backplane event {event.get('op')} failed: {e}")
+
+
+class InMemoryBackplane(Backplane):
+    # Один процесс без соседей или тесты: экземпляры с общим hub видят события друг друга
+
+    def __init__(self, hub: Optional[List["InMemoryBackplane"]] = None):
+        super().__init__()
+        self.hub = hub if hub is not None else []
+
+    async def start(self, handler: Handler) -> None:
+        await super().start(handler)
+        self.hub.append(self)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        peers = [peer for peer in self.hub if peer is not self]
+        if not peers:
+            return
+        # Как и через Postgres, получатель видит копию после сериализации
+        payload = json.dumps(event)
+        loop = asyncio.get_running_loop()
+        for peer in peers:
+            loop.call_soon(peer._dispatch, json.loads(payload))
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self in self.hub:
+            self.hub.remove(self)
+
+
+class PostgresBackplane(Backplane):
+    # LISTEN/NOTIFY. Слушаем на отдельном соединении psycopg2, которое опрашивает цикл событий.
+    # Публикуем пачками в одной транзакции: уведомления приходят после коммита в порядке отправки.
+    # Полезная нагрузка NOTIFY ограничена 8000 байтами, длинные события режутся на части.
+
+    CHUNK_SIZE = 7000
+    RECONNECT_DELAY = 1.0
+
+    def __init__(self, dsn: str = settings.DATABASE_URL, channel: str = settings.WEBSOCKET_BACKPLANE_CHANNEL):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self._ids = itertools.count()
+        self._partial: Dict[Tuple[str, str], List[str]] = {}
+        self._listen_conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._publisher: Optional[asyncio.Task] = None
+        self._reconnect: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler) -> None:
+        await super().start(handler)
+        self._loop = asyncio.get_running_loop()
+        self._outbox = asyncio.Queue()
+        await self._listen()
+        self._publisher = self._loop.create_task(self._publish_loop())
+        print(f"📡 WebSocket backplane listening on '{self.channel}'")
+
+    async def stop(self) -> None:
+        for task in (self._publisher, self._reconnect):
+            if task:
+                task.cancel()
+        self._publisher = self._reconnect = None
+        self._drop_listener()
+        await super().stop()
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        if self._publisher is not None:
+            self._outbox.put_nowait(event)
+
+    def encode(self, event: Dict[str, Any]) -> List[str]:
+        # ensure_ascii: длина строки совпадает с размером в байтах
+        data = json.dumps(event, separators=(",", ":"))
+        chunks = [data[i:i + self.CHUNK_SIZE] for i in range(0, len(data), self.CHUNK_SIZE)] or [""]
+        # Номер сообщения делает нагрузку уникальной: одинаковые NOTIFY в транзакции Postgres схлопывает
+        message_id = next(self._ids)
+        return [f"{self.origin} {message_id} {index} {len(chunks)} {chunk}" for index, chunk in enumerate(chunks)]
+
+    def decode(self, payload: str) -> Optional[Dict[str, Any]]:
+        origin, message_id, index, count, chunk = payload.split(" ", 4)
+        if origin == self.origin:
+            return None
+        if count == "1":
+            return json.loads(chunk)
+        key = (origin, message_id)
+        parts = self._partial.setdefault(key, [])
+        if int(index) != len(parts):
+            # Часть потерялась вместе с соединением
+            del self._partial[key]
+            return None
+        parts.append(chunk)
+        if len(parts) < int(count):
+            return None
+        del self._partial[key]
+        return json.loads("".join(parts))
+
+    async def _listen(self) -> None:
+        import psycopg2
+
+        conn = await asyncio.to_thread(psycopg2.connect, self.dsn)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        self._listen_conn = conn
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+
+    def _drop_listener(self) -> None:
+        conn, self._listen_conn = self._listen_conn, None
+        if conn is None:
+            return
+        try:
+            self._loop.remove_reader(conn.fileno())
+            conn.close()
+        except Exception:
+            pass
+
+    def _on_readable(self) -> None:
+        conn = self._listen_conn
+        try:
+            conn.poll()
+        except Exception as e:
+            print(f"⚠️ Backplane connection lost: {e}")
+            self._drop_listener()
+            self._partial.clear()
+            self._reconnect = self._loop.create_task(self._reconnect_loop())
+            return
+        while conn.notifies:
+            event = self.decode(conn.notifies.pop(0).payload)
+            if event is not None:
+                self._dispatch(event)
+
+    async def _reconnect_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.RECONNECT_DELAY)
+            try:
+                await self._listen()
+            except Exception as e:
+                print(f"⚠️ Backplane reconnect failed: {e}")
+                continue
+            self._reconnect = None
+            return
+
+    async def _publish_loop(self) -> None:
+        while True:
+            events = [await self._outbox.get()]
+            while not self._outbox.empty():
+                events.append(self._outbox.get_nowait())
+            payloads = [payload for event in events for payload in self.encode(event)]
+            try:
+                await asyncio.to_thread(self._notify, payloads)
+            except Exception as e:
+                print(f"⚠️ Backplane publish failed ({len(events)} events): {e}")
+
+    def _notify(self, payloads: List[str]) -> None:
+        from backend.database import engine
+
+        with engine.begin() as conn:
+            conn.exec_driver_sql("SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload", (self.channel, payloads))
+
+
+def create_backplane() -> Backplane:
+    if settings.WEBSOCKET_BACKPLANE == "postgres":
+        return PostgresBackplane()
+    return InMemoryBackplane()
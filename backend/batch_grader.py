@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Раннер worker-образа. В режиме --single проверяет одно решение из файлов, доставленных
+# в контейнер архивом. В пакетном режиме каждое решение проверяется в отдельном подпроцессе.
+# Результаты печатаются построчно (NDJSON) по мере готовности.
+
+
+def run_single(solution_path: str, task_id: str, spec_path: str) -> None:
+    from backend.grader import grade_solution
+    from backend.resource_usage import cgroup_counters, self_usage
+
+    counters = cgroup_counters()
+    # Записи грейдера идут в копию настоящего stdout, а fd 1 до запуска кода студента
+    # перенаправляется в stderr: ни print(), ни os.write(1, ...) и sys.__stdout__ не подделают запись
+    sys.stdout.flush()
+    records = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    def emit(message: Dict[str, Any]) -> None:
+        records.write(json.dumps(message) + "\n")
+        records.flush()
+
+    try:
+        spec_data = json.loads(Path(spec_path).read_text(encoding="utf-8"))
+        result = grade_solution(Path(solution_path), task_id, spec_data, on_case=lambda case: emit({"case": case}))
+    except Exception as e:
+        result = {"error": f"Grader failed: {str(e)}", "traceback": traceback.format_exc()}
+    emit({"result": result, "usage": self_usage(counters)})
+
+
+def _read_records(output: bytes) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    cases, result = [], None
+    for line in output.decode("utf-8", errors="replace").splitlines():
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(message, dict):
+            continue
+        if "case" in message:
+            cases.append(message["case"])
+        elif "result" in message:
+            result = {**message["result"], "usage": message.get("usage")}
+    return cases, result
+
+
+def _grade_isolated(solution_path: Path, task_id: str, spec_path: Path, timeout: float) -> Dict[str, Any]:
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "backend.batch_grader", "--single", str(solution_path), task_id, str(spec_path)],
+            capture_output=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired as e:
+        # subprocess.run уже убил процесс; то, что он успел напечатать, превращаем в частичный результат
+        from backend.grader import partial_result
+
+        cases, _ = _read_records(e.stdout or b"")
+        spec = json.loads(spec_path.read_text(encoding="utf-8"))
+        return partial_result(task_id, spec, cases, f"Time limit exceeded ({timeout}s)")
+
+    if not proc.stdout.strip():
+        return {"error": "No output from grader"}
+    _, result = _read_records(proc.stdout)
+    if result is None:
+        return {"error": "Malformed grader output"}
+    return result
+
+
+def run_batch(jobs_path: str) -> None:
+    jobs_file = Path(jobs_path)
+    batch = json.loads(jobs_file.read_text(encoding="utf-8"))
+    work_dir = jobs_file.parent
+    task_id = batch["task_id"]
+    timeout = batch.get("timeout", 5)
+
+    spec_path = work_dir / "spec.json"
+    spec_path.write_text(json.dumps(batch["spec"]), encoding="utf-8")
+
+    output_lock = threading.Lock()
+
+    def grade(item: Dict[str, Any]) -> None:
+        solution_path = work_dir / f"solution_{item['id']}.py"
+        solution_path.write_text(item["code"], encoding="utf-8")
+        result = _grade_isolated(solution_path, task_id, spec_path, timeout)
+        with output_lock:
+            print(json.dumps({"id": item["id"], "result": result}), flush=True)
+
+    with ThreadPoolExecutor(max_workers=max(batch.get("workers", 1), 1)) as pool:
+        list(pool.map(grade, batch["solutions"]))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--single":
+        run_single(*sys.argv[2:])
+    elif len(sys.argv) == 2:
+        run_batch(sys.argv[1])
+    else:
+        print("Usage: python -m backend.batch_grader <jobs.json> | --single <solution.py> <task_id> <spec.json>", file=sys.stderr)
+        sys.exit(2)
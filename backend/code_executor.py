@@ -1,79 +1,105 @@
-import asyncio
-import json
-import base64
-from typing import Any, Dict
-import docker
+from typing import Any, Callable, Dict, List, Optional
 from backend.config import settings
+from backend.grader import CaseCallback
+from backend.sandbox import SandboxBackend, SandboxError, LocalSandbox, StubSandbox
+
+# Поля результата с учетом ресурсов процесса проверки, сохраняются в Submission как есть
+RESOURCE_FIELDS = ("peak_memory", "process_cpu_time", "throttled_time", "oom_killed")
+
+
+def create_backend(name: str) -> SandboxBackend:
+    if name == "docker":
+        from backend.docker_sandbox import DockerSandbox
+        return DockerSandbox()
+    if name == "local":
+        return LocalSandbox()
+    if name == "stub":
+        return StubSandbox()
+    raise ValueError(f"Unknown execution backend: {name}")
+
+
+def grading_spec(task_spec: Dict, time_limit: Optional[float] = None, fail_fast: Optional[bool] = None) -> Dict:
+    # Task.time_limit действует на каждый тест-кейс, но не дольше общего дедлайна прогона
+    limits = [settings.EXECUTION_TIMEOUT, time_limit, task_spec.get("case_time_limit")]
+    spec = {**task_spec, "case_time_limit": min(limit for limit in limits if limit)}
+    # Выключенный fail_fast не попадает в спецификацию: она входит в ключ кеша результатов,
+    # и проверка без флага должна совпадать с проверкой, где он явно false
+    if fail_fast:
+        spec["fail_fast"] = True
+    elif fail_fast is not None:
+        spec.pop("fail_fast", None)
+    return spec
 
 
 class CodeExecutor:
-    def __init__(self):
-        try:
-            self.client = docker.from_env()
-        except Exception as e:
-            print(f"Docker not available: {e}")
-            self.client = None
-
-    async def run_code(self, code: str, task_id: str, task_spec: Dict) -> Dict[str, Any]:
-        if not self.client:
-            return {"status": "error", "error_message": "Docker not available"}
-        b64_code = base64.b64encode(code.encode('utf-8')).decode('utf-8')
-        b64_spec = base64.b64encode(json.dumps(task_spec).encode('utf-8')).decode('utf-8')
-        runner_script = f"""
-import sys
-import json
-import base64
-from pathlib import Path
-from backend.grader import grade_solution
-
-try:
-    # Декодируем код студента и пишем его во временный файл внутри контейнера
-    code_content = base64.b64decode('{b64_code}').decode('utf-8')
-    student_code_path = Path('/tmp/solution.py')
-    student_code_path.write_text(code_content, encoding='utf-8')
-
-    # Декодируем спецификацию задачи
-    spec_json = base64.b64decode('{b64_spec}').decode('utf-8')
-    spec_data = json.loads(spec_json)
-    
-    # Запускаем проверку
-    result = grade_solution(student_code_path, '{task_id}', spec_data)
-    print(json.dumps(result))
-except Exception as e:
-    import traceback
-    print(json.dumps({{"error": f"Grader failed: {{str(e)}}", "traceback": traceback.format_exc()}}))
-"""
+    def __init__(self, backend: Optional[SandboxBackend] = None):
+        self.backend = backend or create_backend(settings.EXECUTION_BACKEND)
+        self._low_risk_backend: Optional[SandboxBackend] = None
+        if settings.EXECUTION_LOW_RISK_BACKEND and settings.EXECUTION_LOW_RISK_BACKEND != self.backend.name:
+            self._low_risk_backend = create_backend(settings.EXECUTION_LOW_RISK_BACKEND)
 
-        try:
-            container = self.client.containers.run(
-                image="code-spirit-worker",
-                command=["python", "-c", runner_script],
-                working_dir="/workspace",
-                mem_limit=settings.EXECUTION_MEMORY_LIMIT,
-                network_disabled=True,
-                remove=True,
-                user="runner",
-            )
-            
-            logs = container.decode('utf-8').strip()
-
-            if not logs:
-                return {"status": "error", "error_message": "No output from grader"}
-
-            result_data = json.loads(logs)
-
-            summary = result_data.get("summary", {})
-            all_passed = summary.get("passed") == summary.get("total") and summary.get("total", 0) > 0
-
-            return {
-                "status": "success" if all_passed else "error",
-                "test_results": result_data.get("cases", []),
-                "error_message": result_data.get("error"),
-                "execution_time": 1.0
-            }
+    def backend_for(self, task_spec: Dict) -> SandboxBackend:
+        # Задачи, помеченные в спецификации как "risk": "low", можно гонять в более быстром бэкенде
+        if self._low_risk_backend and task_spec.get("risk") == "low":
+            return self._low_risk_backend
+        return self.backend
+
+    async def start(self):
+        await self.backend.start()
+        if self._low_risk_backend:
+            await self._low_risk_backend.start()
 
+    async def shutdown(self):
+        await self.backend.shutdown()
+        if self._low_risk_backend:
+            await self._low_risk_backend.shutdown()
+
+    async def run_code(self, code: str, task_id: str, task_spec: Dict, on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
+        try:
+            result_data = await self.backend_for(task_spec).run(code, task_id, task_spec, on_case=on_case)
+        except SandboxError as e:
+            return {"status": "error", "error_message": str(e)}
         except Exception as e:
             return {"status": "error", "error_message": f"System Error: {str(e)}"}
+        return self._to_result(result_data)
+
+    async def run_batch(
+        self,
+        task_id: str,
+        task_spec: Dict,
+        solutions: List[Dict[str, Any]],
+        on_result: Optional[Callable[[Any, Dict[str, Any]], None]] = None,
+    ) -> Dict[Any, Dict[str, Any]]:
+        def on_record(solution_id: Any, result_data: Dict[str, Any]) -> None:
+            if on_result:
+                on_result(solution_id, self._to_result(result_data))
+
+        raw = await self.backend_for(task_spec).run_batch(task_id, task_spec, solutions, on_record=on_record)
+
+        # Решения без записи (пачка не уложилась в дедлайн, сбой песочницы) не проверены: их прежний
+        # результат остается в базе, поэтому в ответ они не попадают
+        return {item["id"]: self._to_result(raw[item["id"]]) for item in solutions if item["id"] in raw}
+
+    @staticmethod
+    def _to_result(result_data: Dict[str, Any]) -> Dict[str, Any]:
+        summary = result_data.get("summary", {})
+        all_passed = summary.get("passed") == summary.get("total") and summary.get("total", 0) > 0
+
+        total_time = result_data.get("timing", {}).get("total", {})
+        usage = result_data.get("usage") or {}
+
+        return {
+            "status": "success" if all_passed else "error",
+            "test_results": result_data.get("cases", []),
+            "error_message": result_data.get("error"),
+            "execution_time": total_time.get("wall_time"),
+            "cpu_time": total_time.get("cpu_time"),
+            "timing": result_data.get("timing"),
+            "peak_memory": usage.get("peak_memory"),
+            "process_cpu_time": usage.get("cpu_time"),
+            "throttled_time": usage.get("throttled_time"),
+            "oom_killed": usage.get("oom_killed"),
+        }
 
 
-code_executor = CodeExecutor()
\ No newline at end of file
+code_executor = CodeExecutor()
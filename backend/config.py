@@ -24,6 +24,69 @@ class Settings(BaseSettings):
     # Execution
     EXECUTION_TIMEOUT: int = 5
     EXECUTION_MEMORY_LIMIT: str = "128m"
+    EXECUTION_CPUS: float = 0  # квота CPU контейнера (--cpus), 0 - без ограничения
+    EXECUTION_WORKER_IMAGE: str = "code-spirit-worker"
+    EXECUTION_BACKEND: str = "docker"
+    EXECUTION_LOW_RISK_BACKEND: str = ""
+    EXECUTION_ZYGOTE: bool = True
+    # Бэкенд "stub" не выполняет код: все кейсы проходят за столько секунд каждый (нагрузочные прогоны)
+    EXECUTION_STUB_CASE_DELAY: float = 0.05
+
+    # Local sandbox
+    LOCAL_SANDBOX_ADDRESS_SPACE: str = "512m"
+    LOCAL_SANDBOX_MAX_FILE_SIZE: str = "1m"
+    LOCAL_SANDBOX_MAX_PROCESSES: int = 1
+    LOCAL_SANDBOX_REQUIRE_NETNS: bool = True
+
+    # Execution pool
+    EXECUTION_POOL_MIN_SIZE: int = 2
+    EXECUTION_POOL_MAX_SIZE: int = 16
+    EXECUTION_POOL_IDLE_TIMEOUT: int = 120
+    EXECUTION_POOL_MAX_USES: int = 50
+
+    # Grading queue
+    GRADING_MODE: str = "inline"
+    GRADING_WORKERS: int = 4
+    GRADING_QUEUE_MAX_SIZE: int = 200
+    GRADING_MAX_IN_FLIGHT_PER_STUDENT: int = 1
+    # Предварительная проверка живого кода на паузах набора (только GRADING_MODE=inline)
+    SPECULATIVE_GRADING: bool = False
+    SPECULATIVE_IDLE_SECONDS: float = 2.0
+    SPECULATIVE_MAX_PER_SESSION: int = 2
+    RESULT_CACHE_MAX_ENTRIES: int = 2048
+
+    # Standalone grading workers (GRADING_MODE=worker)
+    WORKER_API_URL: str = "http://backend:8000"
+    WORKER_TOKEN: str = ""
+    WORKER_CONCURRENCY: int = 4
+    WORKER_POLL_INTERVAL: float = 1.0
+    WORKER_LEASE_SECONDS: int = 30
+    WORKER_HEARTBEAT_INTERVAL: int = 10
+    WORKER_MAX_ATTEMPTS: int = 3
+
+    # WebSocket
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 256
+    # memory - один процесс; postgres - LISTEN/NOTIFY между воркерами uvicorn и узлами
+    WEBSOCKET_BACKPLANE: str = "memory"
+    WEBSOCKET_BACKPLANE_CHANNEL: str = "ws_events"
+    LIVE_CODE_MAX_FPS: float = 10.0
+    # Кэш последних буферов live-кода: не больше стольких студентов и символов кода суммарно
+    LIVE_CODE_CACHE_SIZE: int = 5000
+    LIVE_CODE_CACHE_CHARS: int = 50_000_000
+    # Журнал правок кода по сессиям для воспроизведения (пустая строка отключает) и период записи
+    TIMELINE_DIR: str = "data/timelines"
+    TIMELINE_FLUSH_INTERVAL: float = 2.0
+    # Присутствие студентов: сброс в users, AFK без действий, обрыв без сообщений (клиент шлет ping раз в 25 с)
+    PRESENCE_FLUSH_INTERVAL: float = 5.0
+    PRESENCE_AFK_SECONDS: float = 300.0
+    PRESENCE_OFFLINE_SECONDS: float = 90.0
+    # Панель преподавателя получает изменения студентов одним кадром раз в столько секунд
+    DASHBOARD_TICK_INTERVAL: float = 0.5
+
+    # Batch regrade
+    REGRADE_BATCH_SIZE: int = 50
+    REGRADE_PARALLELISM: int = 2
+    REGRADE_PROGRESS_INTERVAL: float = 0.5
 
     @property
     def DATABASE_URL(self) -> str:
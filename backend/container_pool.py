@@ -0,0 +1,264 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, List, Optional, Set
+
+from backend.config import settings
+
+
+class ContainerPoolError(Exception):
+    pass
+
+
+class Ewma:
+    def __init__(self, initial: float, alpha: float = 0.2):
+        self.value = initial
+        self.alpha = alpha
+
+    def update(self, sample: float) -> float:
+        self.value = self.alpha * sample + (1 - self.alpha) * self.value
+        return self.value
+
+
+class PooledContainer:
+    def __init__(self, container: Any):
+        self.container = container
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # Постоянное подключение бэкенда к процессу контейнера, закрывается вместе с ним
+        self.channel: Any = None
+
+    @property
+    def id(self) -> str:
+        return self.container.id
+
+
+class ContainerPool:
+    # Контейнер выдается на одну проверку и затем возвращается в пул или уничтожается.
+    # Пул растет, когда ожидание в очереди дольше холодного старта, и сжимается по idle_timeout.
+
+    def __init__(
+        self,
+        client: Any,
+        image: str = settings.EXECUTION_WORKER_IMAGE,
+        min_size: int = settings.EXECUTION_POOL_MIN_SIZE,
+        max_size: int = settings.EXECUTION_POOL_MAX_SIZE,
+        idle_timeout: float = settings.EXECUTION_POOL_IDLE_TIMEOUT,
+        max_uses: int = settings.EXECUTION_POOL_MAX_USES,
+        maintain_interval: float = 1.0,
+        command: Optional[List[str]] = None,
+        stdin_open: bool = False,
+    ):
+        self.client = client
+        self.image = image
+        self.command = command or ["sleep", "infinity"]
+        self.stdin_open = stdin_open
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self.maintain_interval = maintain_interval
+
+        self.avg_grade_time = Ewma(initial=1.0)
+        self.avg_start_time = Ewma(initial=1.0)
+
+        self._idle: Deque[PooledContainer] = deque()
+        self._in_use: Set[PooledContainer] = set()
+        self._starting = 0
+        self._waiting = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._last_error: Optional[str] = None
+        self._maintainer: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._starting
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": len(self._in_use),
+            "starting": self._starting,
+            "waiting": self._waiting,
+            "avg_grade_time": round(self.avg_grade_time.value, 4),
+            "avg_start_time": round(self.avg_start_time.value, 4),
+        }
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def start(self) -> None:
+        if self._maintainer is None or self._maintainer.done():
+            self._closed = False
+            self._maintainer = asyncio.create_task(self._maintain())
+
+    async def shutdown(self) -> None:
+        self._closed = True
+        if self._maintainer:
+            self._maintainer.cancel()
+            try:
+                await self._maintainer
+            except asyncio.CancelledError:
+                pass
+            self._maintainer = None
+        while self._idle:
+            await self._destroy(self._idle.popleft())
+
+    async def lease(self) -> PooledContainer:
+        await self.start()
+        cond = self._condition()
+        async with cond:
+            self._waiting += 1
+            try:
+                while not self._idle:
+                    if self.size == 0 and self._last_error:
+                        raise ContainerPoolError(self._last_error)
+                    self._grow(self._desired_growth())
+                    if self.size == 0:
+                        raise ContainerPoolError("No worker containers available")
+                    await cond.wait()
+                pooled = self._idle.pop()
+            finally:
+                self._waiting -= 1
+            self._in_use.add(pooled)
+        pooled.uses += 1
+        return pooled
+
+    async def release(self, pooled: PooledContainer, *, healthy: bool = True, grade_time: Optional[float] = None) -> None:
+        if grade_time is not None:
+            self.avg_grade_time.update(grade_time)
+        self._in_use.discard(pooled)
+        pooled.last_used = time.monotonic()
+
+        recycle = healthy and not self._closed and pooled.uses < self.max_uses
+        if recycle:
+            recycle = await self._recycle(pooled)
+
+        cond = self._condition()
+        async with cond:
+            if recycle:
+                self._idle.append(pooled)
+            cond.notify()
+        if not recycle:
+            await self._destroy(pooled)
+
+    def _desired_growth(self) -> int:
+        headroom = self.max_size - self.size
+        if headroom <= 0:
+            return 0
+        if self.size < self.min_size:
+            return min(headroom, self.min_size - self.size)
+
+        uncovered = self._waiting - self._starting - len(self._idle)
+        if uncovered <= 0:
+            return 0
+        # Оцениваем, сколько придется ждать освобождения занятого контейнера.
+        # Если это дольше холодного старта, выгоднее поднять новый.
+        busy = max(len(self._in_use), 1)
+        expected_wait = self.avg_grade_time.value * math.ceil(self._waiting / busy)
+        if len(self._in_use) and expected_wait < self.avg_start_time.value:
+            return 0
+        return min(headroom, uncovered)
+
+    def _grow(self, count: int) -> None:
+        for _ in range(count):
+            self._starting += 1
+            asyncio.create_task(self._spawn())
+
+    async def _spawn(self) -> None:
+        started = time.monotonic()
+        pooled = None
+        try:
+            container = await asyncio.to_thread(self._create_container)
+            pooled = PooledContainer(container)
+            self.avg_start_time.update(time.monotonic() - started)
+            self._last_error = None
+        except Exception as e:
+            self._last_error = f"Failed to start worker container: {e}"
+            print(self._last_error)
+        cond = self._condition()
+        async with cond:
+            self._starting -= 1
+            if pooled is not None and not self._closed:
+                self._idle.append(pooled)
+                pooled = None
+            cond.notify()
+        if pooled is not None:
+            await self._destroy(pooled)
+
+    def _create_container(self) -> Any:
+        return self.client.containers.run(
+            image=self.image,
+            command=self.command,
+            stdin_open=self.stdin_open,
+            working_dir="/workspace",
+            mem_limit=settings.EXECUTION_MEMORY_LIMIT,
+            nano_cpus=int(settings.EXECUTION_CPUS * 1e9) or None,
+            network_disabled=True,
+            user="runner",
+            init=True,
+            detach=True,
+            # Вывод основного процесса бэкенд читает через attach, копить его в логах Docker незачем
+            log_config={"type": "none"},
+            labels={"code-spirit.pool": "worker"},
+        )
+
+    async def _recycle(self, pooled: PooledContainer) -> bool:
+        # Переиспользуем контейнер, только если после решения не осталось
+        # фоновых процессов: init + основной процесс (sleep или зигот).
+        try:
+            top = await asyncio.to_thread(pooled.container.top)
+            if len(top.get("Processes") or []) > 2:
+                return False
+            exit_code, _ = await asyncio.to_thread(
+                pooled.container.exec_run,
+                ["sh", "-c", "rm -rf /tmp/* /tmp/.[!.]* /workspace/* 2>/dev/null; true"],
+                user="runner",
+            )
+            return exit_code == 0
+        except Exception:
+            return False
+
+    async def _destroy(self, pooled: PooledContainer) -> None:
+        if pooled.channel is not None:
+            pooled.channel.close()
+        try:
+            await asyncio.to_thread(pooled.container.remove, force=True)
+        except Exception as e:
+            print(f"Failed to remove worker container {pooled.id}: {e}")
+
+    async def _reap_idle(self) -> None:
+        now = time.monotonic()
+        expired = []
+        cond = self._condition()
+        async with cond:
+            keep: Deque[PooledContainer] = deque()
+            surplus = self.size - self.min_size
+            for pooled in self._idle:
+                if surplus > 0 and now - pooled.last_used > self.idle_timeout:
+                    expired.append(pooled)
+                    surplus -= 1
+                else:
+                    keep.append(pooled)
+            self._idle = keep
+        for pooled in expired:
+            await self._destroy(pooled)
+
+    async def _maintain(self) -> None:
+        while not self._closed:
+            try:
+                await self._reap_idle()
+                self._grow(self._desired_growth())
+            except Exception as e:
+                print(f"Container pool maintenance failed: {e}")
+            await asyncio.sleep(self.maintain_interval)
@@ -0,0 +1,171 @@
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.models import User, UserStatus
+from backend.schemas import UserResponse
+from backend.websocket_manager import ConnectionManager, manager
+
+
+class Roster:
+    # Состояние студентов одной сессии для панели преподавателя. Изменения копятся в changed
+    # и уходят одним кадром dashboard_delta за тик; seq растет на единицу с каждым кадром.
+
+    def __init__(self):
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.changed: Dict[str, Dict[str, Any]] = {}
+        # Студенты, о которых пришло событие, но строки из базы еще нет (только что зарегистрировались)
+        self.missing: Set[str] = set()
+        self.seq = 0
+        self.loaded = False
+        self.ready: Optional[asyncio.Task] = None
+
+    def update(self, user_id: str, fields: Dict[str, Any]) -> None:
+        row = self.rows.get(user_id)
+        if row is None:
+            row = self.rows[user_id] = {"id": user_id}
+            if self.loaded:
+                self.missing.add(user_id)
+        row.update(fields)
+        self.changed.setdefault(user_id, {}).update(fields)
+
+    def load(self, rows: Iterable[Dict[str, Any]]) -> None:
+        # Живые изменения, пришедшие во время загрузки, новее строк из базы
+        for row in rows:
+            user_id = row["id"]
+            self.rows[user_id] = {**row, **self.rows.get(user_id, {})}
+            if user_id in self.changed:
+                self.changed[user_id] = dict(self.rows[user_id])
+            self.missing.discard(user_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "dashboard_snapshot", "seq": self.seq, "students": list(self.rows.values())}
+
+    def delta(self) -> Optional[Dict[str, Any]]:
+        if not self.changed:
+            return None
+        self.seq += 1
+        students = [{"id": user_id, **fields} for user_id, fields in self.changed.items()]
+        self.changed = {}
+        return {"type": "dashboard_delta", "seq": self.seq, "students": students}
+
+
+class DashboardHub:
+    # Вместо student_update на каждое событие админы сессии получают снимок при подключении
+    # и затем раз в tick_interval один кадр с теми студентами, чье состояние изменилось.
+    # Ростер живет в процессе, пока к нему подключен хотя бы один админ сессии; события
+    # с других процессов приходят через шину.
+
+    def __init__(self, connections: ConnectionManager, tick_interval: float = settings.DASHBOARD_TICK_INTERVAL):
+        self.manager = connections
+        self.tick_interval = tick_interval
+        self.rosters: Dict[str, Roster] = {}
+        self._task: Optional[asyncio.Task] = None
+        connections.handlers["roster"] = self._on_event
+
+    async def attach(self, websocket: Any, session_id: str) -> None:
+        roster = self.rosters.get(session_id)
+        if roster is None:
+            roster = self.rosters[session_id] = Roster()
+            roster.ready = asyncio.create_task(self._load(roster, session_id))
+        try:
+            await asyncio.shield(roster.ready)
+        except Exception:
+            if self.rosters.get(session_id) is roster:
+                del self.rosters[session_id]
+            raise
+        await self.send_snapshot(websocket, session_id)
+
+    async def _load(self, roster: Roster, session_id: str) -> None:
+        roster.load(await asyncio.to_thread(load_students, session_id))
+        roster.loaded = True
+        roster.missing = {user_id for user_id, row in roster.rows.items() if "name" not in row}
+        # Снимок уже содержит все, что пришло во время загрузки
+        roster.changed = {}
+
+    async def send_snapshot(self, websocket: Any, session_id: str) -> None:
+        roster = self.rosters.get(session_id)
+        if roster is not None and roster.loaded:
+            await self.manager.send_personal_message(roster.snapshot(), websocket)
+
+    def student_changed(self, session_id: str, user_id: str, **fields: Any) -> None:
+        if "status" in fields:
+            status = UserStatus(fields["status"])
+            fields.update(status=status.value, is_online=status != UserStatus.OFFLINE)
+        self._apply(session_id, user_id, fields)
+        self.manager.backplane.publish({"op": "roster", "session_id": session_id, "user_id": user_id, "fields": fields})
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        self._apply(event["session_id"], event["user_id"], event["fields"])
+
+    def _apply(self, session_id: str, user_id: str, fields: Dict[str, Any]) -> None:
+        roster = self.rosters.get(session_id)
+        if roster is not None:
+            roster.update(user_id, fields)
+
+    async def tick(self) -> None:
+        for session_id, roster in list(self.rosters.items()):
+            if not roster.loaded:
+                continue
+            if session_id not in self.manager.admin_connections:
+                # Последний админ сессии ушел: ростер соберется заново при следующем подключении
+                del self.rosters[session_id]
+                continue
+            if roster.missing:
+                await self._load_missing(roster, session_id)
+            delta = roster.delta()
+            if delta is not None:
+                self.manager.send_to_local_admins(session_id, delta)
+
+    async def _load_missing(self, roster: Roster, session_id: str) -> None:
+        user_ids, roster.missing = roster.missing, set()
+        try:
+            rows = await asyncio.to_thread(load_students, session_id, user_ids)
+        except Exception as e:
+            print(f"⚠️ Dashboard roster load failed for session {session_id}: {e}")
+            roster.missing |= user_ids
+            return
+        roster.load(rows)
+        for row in rows:
+            roster.changed[row["id"]] = dict(roster.rows[row["id"]])
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"⚠️ Dashboard tick failed: {e}")
+
+
+def load_students(session_id: str, user_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    # presence импортирует этот модуль, поэтому импорт здесь
+    from backend.presence import presence
+
+    db = SessionLocal()
+    try:
+        query = db.query(User).filter(User.session_id == session_id)
+        if user_ids is not None:
+            query = query.filter(User.id.in_(list(user_ids)))
+        users = query.order_by(User.created_at).all()
+        # Присутствие студентов этого процесса свежее, чем последний сброс в базу
+        return [presence.overlay(UserResponse.model_validate(user)).model_dump(mode="json") for user in users]
+    finally:
+        db.close()
+
+
+dashboard = DashboardHub(manager)
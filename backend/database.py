@@ -1,12 +1,14 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from backend.config import get_settings
+from backend.runtime_stats import TimedQueuePool
 
 settings = get_settings()
 
 engine = create_engine(
     settings.DATABASE_URL, 
-    pool_pre_ping=True
+    pool_pre_ping=True,
+    poolclass=TimedQueuePool
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,283 @@
+import asyncio
+import io
+import json
+import tarfile
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import docker
+from docker.utils.socket import STDOUT, frames_iter
+from backend.config import settings
+from backend.container_pool import ContainerPool, PooledContainer
+from backend.grader import CaseCallback, partial_result
+from backend.sandbox import SandboxBackend, SandboxError, parse_size
+
+
+ZYGOTE_COMMAND = ["python", "-m", "backend.zygote"]
+
+
+class ZygoteChannel:
+    # Постоянное подключение к stdin/stdout зигота. Контейнер выдается на одну проверку,
+    # поэтому в канале одновременно идет не больше одного задания.
+
+    def __init__(self, container: Any):
+        self.sock = container.attach_socket(params={"stdin": 1, "stdout": 1, "stream": 1})
+        self._frames = frames_iter(self.sock, False)
+        self._buffer = b""
+
+    def send(self, job: Dict[str, Any]) -> None:
+        getattr(self.sock, "_sock", self.sock).sendall(json.dumps(job, default=str).encode("utf-8") + b"\n")
+
+    def read_job(self, job_id: str, emit: Callable[[Dict[str, Any]], None]) -> None:
+        for stream, data in self._frames:
+            if stream != STDOUT:
+                continue
+            self._buffer += data
+            *lines, self._buffer = self._buffer.split(b"\n")
+            for line in lines:
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                # Хвосты предыдущих заданий, прерванных внешним таймаутом, пропускаем
+                if message.get("id") != job_id:
+                    continue
+                emit(message)
+                if "result" in message or "killed" in message:
+                    return
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class DockerSandbox(SandboxBackend):
+    name = "docker"
+
+    def __init__(self, zygote: bool = settings.EXECUTION_ZYGOTE):
+        try:
+            self.client = docker.from_env()
+        except Exception as e:
+            print(f"Docker not available: {e}")
+            self.client = None
+        self.zygote = zygote
+        self.limits = {
+            "cpu_seconds": settings.EXECUTION_TIMEOUT,
+            "file_size": parse_size(settings.LOCAL_SANDBOX_MAX_FILE_SIZE),
+            "max_processes": settings.LOCAL_SANDBOX_MAX_PROCESSES,
+        }
+        if not self.client:
+            self.pool = None
+        elif zygote:
+            self.pool = ContainerPool(self.client, command=ZYGOTE_COMMAND, stdin_open=True)
+        else:
+            self.pool = ContainerPool(self.client)
+
+    async def start(self) -> None:
+        if self.pool:
+            await self.pool.start()
+
+    async def shutdown(self) -> None:
+        if self.pool:
+            await self.pool.shutdown()
+
+    async def run(self, code: str, task_id: str, spec: Dict[str, Any], on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
+        if not self.client:
+            raise SandboxError("Docker not available")
+
+        pooled = await self.pool.lease()
+        started = time.monotonic()
+        cases: List[Dict[str, Any]] = []
+        result: Optional[Dict[str, Any]] = None
+        # Зигот сам убивает зависшего ребенка по дедлайну, внешний таймаут - страховка на случай, если завис он сам
+        deadline = settings.EXECUTION_TIMEOUT + (1 if self.zygote else 0)
+        records = self._zygote_records(pooled, code, task_id, spec) if self.zygote else self._exec_records(pooled, code, task_id, spec)
+        try:
+            async with asyncio.timeout(deadline):
+                async for message in records:
+                    if "case" in message:
+                        cases.append(message["case"])
+                        if on_case:
+                            on_case(message["case"])
+                    elif "result" in message:
+                        result = {**message["result"], "usage": message.get("usage")}
+                    elif "killed" in message:
+                        result = {**partial_result(task_id, spec, cases, message["killed"]), "usage": message.get("usage")}
+        except TimeoutError:
+            # Контейнер с зависшим решением убиваем сразу, пул заменит его свежим
+            await asyncio.to_thread(self._kill, pooled.container)
+            result = partial_result(task_id, spec, cases, f"Time limit exceeded ({settings.EXECUTION_TIMEOUT}s)")
+            await self.pool.release(pooled, healthy=False, grade_time=time.monotonic() - started)
+            return result
+        except BaseException:
+            await self.pool.release(pooled, healthy=False, grade_time=time.monotonic() - started)
+            raise
+
+        await self.pool.release(pooled, healthy=result is not None, grade_time=time.monotonic() - started)
+        if result is None:
+            raise SandboxError("No output from grader")
+        return result
+
+    async def _exec_records(self, pooled: PooledContainer, code: str, task_id: str, spec: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        # Код и спецификация едут tar-архивом, раннер - модуль из образа, поэтому размер тестов не упирается в argv
+        archive = self._make_archive({
+            "job/solution.py": code.encode("utf-8"),
+            "job/spec.json": json.dumps(spec, default=str).encode("utf-8"),
+        })
+        await asyncio.to_thread(pooled.container.put_archive, "/tmp", archive)
+        command = ["python", "-m", "backend.batch_grader", "--single", "/tmp/job/solution.py", task_id, "/tmp/job/spec.json"]
+        async for line in self._stream_exec(pooled.container, command):
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+    async def _zygote_records(self, pooled: PooledContainer, code: str, task_id: str, spec: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        if pooled.channel is None:
+            pooled.channel = await asyncio.to_thread(ZygoteChannel, pooled.container)
+        channel: ZygoteChannel = pooled.channel
+        job = {
+            "id": uuid.uuid4().hex,
+            "task_id": task_id,
+            "spec": spec,
+            "code": code,
+            "timeout": settings.EXECUTION_TIMEOUT,
+            "limits": self.limits,
+        }
+        loop = asyncio.get_running_loop()
+        messages: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def pump():
+            try:
+                channel.send(job)
+                channel.read_job(job["id"], lambda message: loop.call_soon_threadsafe(messages.put_nowait, message))
+            finally:
+                loop.call_soon_threadsafe(messages.put_nowait, done)
+
+        pumping = asyncio.create_task(asyncio.to_thread(pump))
+        try:
+            while True:
+                message = await messages.get()
+                if message is done:
+                    break
+                yield message
+        finally:
+            if not pumping.done():
+                pumping.add_done_callback(lambda task: task.cancelled() or task.exception())
+        await pumping
+
+    async def run_batch(
+        self,
+        task_id: str,
+        spec: Dict[str, Any],
+        solutions: List[Dict[str, Any]],
+        on_record: Optional[Callable[[Any, Dict[str, Any]], None]] = None,
+    ) -> Dict[Any, Dict[str, Any]]:
+        # Один контейнер на пачку решений, каждое решение проверяется в своем подпроцессе
+        if not self.client:
+            raise SandboxError("Docker not available")
+        batch = {
+            "task_id": task_id,
+            "spec": spec,
+            "solutions": solutions,
+            "timeout": settings.EXECUTION_TIMEOUT,
+            "workers": settings.REGRADE_PARALLELISM,
+        }
+        ids = {str(item["id"]): item["id"] for item in solutions}
+        results: Dict[Any, Dict[str, Any]] = {}
+
+        # Каждое решение ограничено своим таймаутом внутри контейнера, пачка целиком - суммой по волнам воркеров
+        waves = -(-len(solutions) // max(settings.REGRADE_PARALLELISM, 1))
+        batch_deadline = settings.EXECUTION_TIMEOUT * (waves + 1)
+
+        pooled = await self.pool.lease()
+        healthy = False
+        started = time.monotonic()
+        try:
+            archive = self._make_archive({"batch/jobs.json": json.dumps(batch, default=str).encode("utf-8")})
+            await asyncio.to_thread(pooled.container.put_archive, "/tmp", archive)
+            async with asyncio.timeout(batch_deadline):
+                async for line in self._stream_exec(pooled.container, ["python", "-m", "backend.batch_grader", "/tmp/batch/jobs.json"]):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    solution_id = ids.get(str(record.get("id")))
+                    if solution_id is None:
+                        continue
+                    results[solution_id] = record.get("result") or {}
+                    if on_record:
+                        on_record(solution_id, results[solution_id])
+            healthy = True
+        except TimeoutError:
+            await asyncio.to_thread(self._kill, pooled.container)
+        finally:
+            await self.pool.release(pooled, healthy=healthy, grade_time=(time.monotonic() - started) / max(len(solutions), 1))
+        return results
+
+    @staticmethod
+    def _kill(container: Any) -> None:
+        try:
+            container.kill()
+        except docker.errors.APIError:
+            pass
+
+    @staticmethod
+    def _make_archive(files: Dict[str, bytes]) -> bytes:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            # Каталоги создаем явно, иначе Docker распакует их от root и runner не сможет в них писать
+            for directory in sorted({name.rsplit("/", 1)[0] for name in files if "/" in name}):
+                info = tarfile.TarInfo(directory)
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                info.uid = info.gid = 1000
+                info.mtime = int(time.time())
+                tar.addfile(info)
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mode = 0o644
+                info.uid = info.gid = 1000
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+    async def _stream_exec(self, container: Any, cmd: List[str]) -> AsyncIterator[str]:
+        # exec_run(stream=True) блокирует на каждом чанке, поэтому читаем его в отдельном потоке
+        loop = asyncio.get_running_loop()
+        lines: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def pump():
+            try:
+                _, stream = container.exec_run(cmd, workdir="/workspace", user="runner", stream=True, demux=True)
+                buffer = b""
+                for stdout, _ in stream:
+                    if not stdout:
+                        continue
+                    buffer += stdout
+                    *complete, buffer = buffer.split(b"\n")
+                    for raw in complete:
+                        loop.call_soon_threadsafe(lines.put_nowait, raw.decode("utf-8"))
+                if buffer:
+                    loop.call_soon_threadsafe(lines.put_nowait, buffer.decode("utf-8"))
+            finally:
+                loop.call_soon_threadsafe(lines.put_nowait, done)
+
+        pumping = asyncio.create_task(asyncio.to_thread(pump))
+        try:
+            while True:
+                line = await lines.get()
+                if line is done:
+                    break
+                if line.strip():
+                    yield line
+        finally:
+            if not pumping.done():
+                # Чтение прервано по дедлайну: поток закончится сам, когда контейнер будет убит
+                pumping.add_done_callback(lambda task: task.cancelled() or task.exception())
+        await pumping
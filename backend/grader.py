@@ -1,14 +1,24 @@
 from __future__ import annotations
 
+import copy
+import ctypes
 import json
+import os
+import random
+import select
 import sys
 import types
 import importlib.util
 from pathlib import Path
-from typing import Any, Dict, List, Set
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from contextlib import contextmanager
 import inspect
 import math
 import ast
+import signal
+import threading
+import time
+import tracemalloc
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 TASKS_DIR = BASE_DIR / "backend" / "tasks"
@@ -16,6 +26,46 @@ TASKS_DIR = BASE_DIR / "backend" / "tasks"
 class GradingError(Exception):
     pass
 
+# BaseException, чтобы `except Exception` в коде студента не перехватил таймаут
+class CaseTimeout(BaseException):
+    pass
+
+CaseCallback = Callable[[Dict[str, Any]], None]
+
+@contextmanager
+def case_deadline(seconds: Optional[float]) -> Iterator[None]:
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_alarm(signum: int, frame: Any) -> None:
+        raise CaseTimeout()
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _timeout_message(seconds: Optional[float]) -> str:
+    return f"Time limit exceeded ({seconds}s)"
+
+class Stopwatch:
+    def __enter__(self) -> "Stopwatch":
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> bool:
+        self.wall = time.perf_counter() - self._wall_start
+        self.cpu = time.process_time() - self._cpu_start
+        return False
+
+def _timing(wall: float, cpu: float) -> Dict[str, float]:
+    return {"wall_time": round(wall, 6), "cpu_time": round(cpu, 6)}
+
 def load_task_spec(task_id: str, spec_data: Dict[str, Any] | None = None) -> Dict[str, Any]:
     if spec_data:
         return spec_data
@@ -110,7 +160,7 @@ def _get_test_args(t: Dict[str, Any]) -> List[Any]:
     return t.get("args") or t.get("input") or []
 
 
-def run_function_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+def run_function_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any], on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
     func_name = entry["name"]
     func = getattr(module, func_name, None)
     if not func:
@@ -120,7 +170,8 @@ def run_function_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Di
         _validate_parameter_names(func, entry["params"])
 
     tests = _ensure_tests_list(entry.get("tests") or spec.get("tests"), context="Function tests")
-    results, passed = [], 0
+    results, passed, wall, cpu = [], 0, 0.0, 0.0
+    limit, fail_fast = spec.get("case_time_limit"), spec.get("fail_fast")
 
     for idx, t in enumerate(tests, 1):
         args = _get_test_args(t)
@@ -130,16 +181,25 @@ def run_function_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Di
         case_res: Dict[str, Any] = {"index": idx, "input": args}
         
         try:
-            actual = func(*args, **kwargs)
+            with Stopwatch() as sw, case_deadline(limit):
+                actual = func(*args, **kwargs)
             ok = actual == expected
             if ok:
                 passed += 1
             case_res.update({"status": "passed" if ok else "failed", "expected": expected, "actual": to_jsonable(actual)})
+        except CaseTimeout:
+            case_res.update({"status": "timeout", "expected": expected, "error": _timeout_message(limit)})
         except Exception as e:
             case_res.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        case_res.update(_timing(sw.wall, sw.cpu))
+        wall, cpu = wall + sw.wall, cpu + sw.cpu
         results.append(case_res)
+        if on_case:
+            on_case(case_res)
+        if fail_fast and case_res["status"] != "passed":
+            break
 
-    return {"total": len(tests), "passed": passed, "details": results, "label": func_name}
+    return {"total": len(tests), "passed": passed, "details": results, "label": func_name, **_timing(wall, cpu)}
 
 def _resolve_class_from_module(module: types.ModuleType, class_name: str) -> type[Any]:
     cls = getattr(module, class_name, None)
@@ -147,14 +207,15 @@ def _resolve_class_from_module(module: types.ModuleType, class_name: str) -> typ
         raise GradingError(f"Class '{class_name}' not found")
     return cls
 
-def run_class_method_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+def run_class_method_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any], on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
     class_name, method_name = entry["class_name"], entry["method_name"]
     cls = _resolve_class_from_module(module, class_name)
     
     ctor_args, ctor_kwargs = entry.get("constructor_args", []), entry.get("constructor_kwargs", {})
     
     tests = _ensure_tests_list(entry.get("tests") or spec.get("tests"), context="Method tests")
-    results, passed = [], 0
+    results, passed, wall, cpu = [], 0, 0.0, 0.0
+    limit, fail_fast = spec.get("case_time_limit"), spec.get("fail_fast")
 
     for idx, t in enumerate(tests, 1):
         args = _get_test_args(t)
@@ -165,27 +226,37 @@ def run_class_method_tests(module: types.ModuleType, spec: Dict[str, Any], entry
         case_res: Dict[str, Any] = {"index": idx, "input": args}
         
         try:
-            instance = cls(*test_ctor_args, **test_ctor_kwargs)
-            target = getattr(instance, method_name)
-            actual = target(*args, **kwargs)
+            with Stopwatch() as sw, case_deadline(limit):
+                instance = cls(*test_ctor_args, **test_ctor_kwargs)
+                target = getattr(instance, method_name)
+                actual = target(*args, **kwargs)
             ok = actual == expected
             if ok:
                 passed += 1
             case_res.update({"status": "passed" if ok else "failed", "expected": expected, "actual": to_jsonable(actual)})
+        except CaseTimeout:
+            case_res.update({"status": "timeout", "expected": expected, "error": _timeout_message(limit)})
         except Exception as e:
             case_res.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        case_res.update(_timing(sw.wall, sw.cpu))
+        wall, cpu = wall + sw.wall, cpu + sw.cpu
         results.append(case_res)
+        if on_case:
+            on_case(case_res)
+        if fail_fast and case_res["status"] != "passed":
+            break
 
-    return {"total": len(tests), "passed": passed, "details": results, "label": f"{class_name}.{method_name}"}
+    return {"total": len(tests), "passed": passed, "details": results, "label": f"{class_name}.{method_name}", **_timing(wall, cpu)}
 
-def run_class_attribute_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+def run_class_attribute_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any], on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
     class_name, attribute_name = entry["class_name"], entry["attribute_name"]
     cls = _resolve_class_from_module(module, class_name)
 
     ctor_args, ctor_kwargs = entry.get("constructor_args", []), entry.get("constructor_kwargs", {})
     
     tests = _ensure_tests_list(entry.get("tests") or spec.get("tests"), context="Attribute tests")
-    results, passed = [], 0
+    results, passed, wall, cpu = [], 0, 0.0, 0.0
+    limit, fail_fast = spec.get("case_time_limit"), spec.get("fail_fast")
 
     for idx, t in enumerate(tests, 1):
         test_ctor_args, test_ctor_kwargs = t.get("constructor_args", ctor_args), t.get("constructor_kwargs", ctor_kwargs)
@@ -193,19 +264,368 @@ def run_class_attribute_tests(module: types.ModuleType, spec: Dict[str, Any], en
         
         case_res: Dict[str, Any] = {"index": idx}
         try:
-            instance = cls(*test_ctor_args, **test_ctor_kwargs)
-            if not hasattr(instance, attribute_name):
-                raise AttributeError(f"Attribute '{attribute_name}' not found")
-            actual = getattr(instance, attribute_name)
+            with Stopwatch() as sw, case_deadline(limit):
+                instance = cls(*test_ctor_args, **test_ctor_kwargs)
+                if not hasattr(instance, attribute_name):
+                    raise AttributeError(f"Attribute '{attribute_name}' not found")
+                actual = getattr(instance, attribute_name)
             ok = actual == expected
             if ok:
                 passed += 1
             case_res.update({"status": "passed" if ok else "failed", "expected": expected, "actual": to_jsonable(actual)})
+        except CaseTimeout:
+            case_res.update({"status": "timeout", "expected": expected, "error": _timeout_message(limit)})
         except Exception as e:
             case_res.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        case_res.update(_timing(sw.wall, sw.cpu))
+        wall, cpu = wall + sw.wall, cpu + sw.cpu
         results.append(case_res)
+        if on_case:
+            on_case(case_res)
+        if fail_fast and case_res["status"] != "passed":
+            break
+
+    return {"total": len(tests), "passed": passed, "details": results, "label": f"{class_name}.{attribute_name}", **_timing(wall, cpu)}
+
+# Задачи на эффективность: функция прогоняется по лестнице размеров входа, время и пиковая
+# аллокация (tracemalloc) сравниваются с эталонным решением, а рост времени - с заявленным классом сложности.
+
+COMPLEXITY_CLASSES: List[Tuple[str, Callable[[float], float]]] = [
+    ("1", lambda n: 1.0),
+    ("log n", lambda n: math.log2(n)),
+    ("n", lambda n: n),
+    ("n log n", lambda n: n * math.log2(n)),
+    ("n^2", lambda n: n ** 2),
+    ("n^3", lambda n: n ** 3),
+    ("2^n", lambda n: 2.0 ** min(n, 64)),
+]
+
+INPUT_GENERATORS: Dict[str, Callable[[int, random.Random, Dict[str, Any]], List[Any]]] = {
+    "int": lambda n, rng, opts: [n],
+    "int_list": lambda n, rng, opts: [[rng.randint(0, opts.get("max_value", n)) for _ in range(n)]],
+    "sorted_int_list": lambda n, rng, opts: [sorted(rng.randint(0, opts.get("max_value", n)) for _ in range(n))],
+    "string": lambda n, rng, opts: ["".join(rng.choice(opts.get("alphabet", "abcdefghijklmnopqrstuvwxyz")) for _ in range(n))],
+}
+
+def _complexity_key(name: str) -> str:
+    key = name.strip().lower().replace(" ", "").replace("**", "^").replace("²", "^2").replace("³", "^3")
+    if key.startswith("o(") and key.endswith(")"):
+        key = key[2:-1]
+    return key
+
+def _complexity_rank(name: str) -> int:
+    keys = [_complexity_key(label) for label, _ in COMPLEXITY_CLASSES]
+    key = _complexity_key(name)
+    if key not in keys:
+        raise GradingError(f"Unknown complexity class '{name}'. Supported: {[label for label, _ in COMPLEXITY_CLASSES]}")
+    return keys.index(key)
+
+def _log_slope(sizes: List[int], values: List[float]) -> float:
+    xs, ys = [math.log(n) for n in sizes], [math.log(max(v, 1e-12)) for v in values]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x if var_x else 0.0
+
+def fit_complexity(sizes: List[int], times: List[float]) -> str:
+    # Сравниваем наклон log t от log n с наклоном каждого класса на тех же размерах и берем ближайший.
+    # Наклон устойчивее подгонки по абсолютным значениям: постоянные накладные расходы и эффекты кеша
+    # сдвигают его не так сильно, чтобы O(n log n) превратилось в O(n^2)
+    observed = _log_slope(sizes, times)
+    distances = [(abs(observed - _log_slope(sizes, [f(n) for n in sizes])), rank) for rank, (_, f) in enumerate(COMPLEXITY_CLASSES)]
+    return COMPLEXITY_CLASSES[min(distances)[1]][0]
+
+def _make_inputs(entry: Dict[str, Any], size: int) -> List[Any]:
+    options = entry.get("input", {})
+    rng = random.Random(options.get("seed", 0) * 1_000_003 + size)
+    if "source" in options:
+        namespace: Dict[str, Any] = {}
+        exec(compile(options["source"], "<input generator>", "exec"), namespace)
+        return list(namespace["make_input"](size, rng))
+    generator = INPUT_GENERATORS.get(options.get("generator", "int_list"))
+    if generator is None:
+        raise GradingError(f"Unknown input generator '{options.get('generator')}'. Supported: {sorted(INPUT_GENERATORS)}")
+    return generator(size, rng, options)
+
+def _measure_call(func: Callable[..., Any], args: List[Any], repeats: int, limit: Optional[float]) -> Dict[str, Any]:
+    # Время - минимум по повторам без tracemalloc (он замедляет код), память - отдельным прогоном
+    best_wall, best_cpu, result = math.inf, math.inf, None
+    for _ in range(repeats):
+        call_args = copy.deepcopy(args)
+        with Stopwatch() as sw, case_deadline(limit):
+            result = func(*call_args)
+        best_wall, best_cpu = min(best_wall, sw.wall), min(best_cpu, sw.cpu)
+    call_args = copy.deepcopy(args)
+    tracemalloc.start()
+    try:
+        with case_deadline(limit):
+            func(*call_args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"wall": best_wall, "cpu": best_cpu, "peak": peak, "result": result}
+
+def _load_reference(entry: Dict[str, Any]) -> Optional[Callable[..., Any]]:
+    if not entry.get("reference"):
+        return None
+    reference = types.ModuleType("reference_solution")
+    exec(compile(entry["reference"], "<reference>", "exec"), reference.__dict__)
+    func = getattr(reference, entry["name"], None)
+    if not callable(func):
+        raise GradingError(f"Reference solution does not define '{entry['name']}'")
+    return func
+
+def performance_case_count(entry: Dict[str, Any]) -> int:
+    return len(entry.get("sizes") or []) + (1 if entry.get("complexity") else 0)
+
+def run_performance_tests(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any], on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
+    func_name = entry["name"]
+    func = getattr(module, func_name, None)
+    if not func:
+        raise GradingError(f"Function '{func_name}' not found")
+    if "params" in entry:
+        _validate_parameter_names(func, entry["params"])
 
-    return {"total": len(tests), "passed": passed, "details": results, "label": f"{class_name}.{attribute_name}"}
+    sizes = sorted(entry.get("sizes") or [])
+    if len(sizes) < (3 if entry.get("complexity") else 1):
+        raise GradingError("Performance entry needs 'sizes' (at least 3 to fit complexity)")
+    declared = entry.get("complexity")
+    declared_rank = _complexity_rank(declared) if declared else None
+    reference = _load_reference(entry)
+    repeats = max(int(entry.get("repeats", 3)), 1)
+    time_budget, memory_budget = entry.get("time_budget"), entry.get("memory_budget")
+    time_slack, memory_slack = entry.get("time_slack", 0.005), entry.get("memory_slack", 64 * 1024)
+    limit, fail_fast = spec.get("case_time_limit"), spec.get("fail_fast")
+
+    results, passed, wall, cpu = [], 0, 0.0, 0.0
+    timed_sizes, timings = [], []
+    stopped = False
+
+    def emit(case_res: Dict[str, Any]) -> bool:
+        nonlocal passed
+        passed += case_res["status"] == "passed"
+        results.append(case_res)
+        if on_case:
+            on_case(case_res)
+        return bool(fail_fast and case_res["status"] != "passed")
+
+    for idx, size in enumerate(sizes, 1):
+        case_res: Dict[str, Any] = {"index": idx, "input": [f"n={size}"]}
+        if stopped:
+            emit({**case_res, "status": "skipped"})
+            continue
+        try:
+            args = _make_inputs(entry, size)
+            ref = _measure_call(reference, args, repeats, limit) if reference else None
+            run = _measure_call(func, args, repeats, limit)
+        except CaseTimeout:
+            # Большие размеры тоже не уложатся, дальше лестницу не гоним
+            case_res.update({"status": "timeout", "error": _timeout_message(limit)})
+            stopped = emit(case_res) or True
+            continue
+        except GradingError:
+            raise
+        except Exception as e:
+            case_res.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+            stopped = emit(case_res)
+            continue
+
+        max_time = entry.get("max_time")
+        max_memory = entry.get("max_memory")
+        if ref and time_budget:
+            max_time = min(filter(None, [max_time, ref["wall"] * time_budget + time_slack]))
+        if ref and memory_budget:
+            max_memory = min(filter(None, [max_memory, ref["peak"] * memory_budget + memory_slack]))
+
+        errors = []
+        if ref and run["result"] != ref["result"]:
+            errors.append("Result differs from reference solution")
+        if max_time is not None and run["wall"] > max_time:
+            errors.append(f"Too slow: {run['wall'] * 1000:.1f} ms > {max_time * 1000:.1f} ms")
+        if max_memory is not None and run["peak"] > max_memory:
+            errors.append(f"Too much memory: {run['peak'] // 1024} KB > {int(max_memory) // 1024} KB")
+
+        budget = []
+        if max_time is not None:
+            budget.append(f"<= {max_time * 1000:.1f} ms")
+        if max_memory is not None:
+            budget.append(f"<= {int(max_memory) // 1024} KB")
+        case_res.update({
+            "status": "failed" if errors else "passed",
+            "expected": ", ".join(budget) or None,
+            "actual": f"{run['wall'] * 1000:.1f} ms, {run['peak'] // 1024} KB",
+            "peak_memory": run["peak"],
+        })
+        if ref:
+            case_res.update({"reference_time": round(ref["wall"], 6), "reference_memory": ref["peak"]})
+        if errors:
+            case_res["error"] = "; ".join(errors)
+        case_res.update(_timing(run["wall"], run["cpu"]))
+        wall, cpu = wall + run["wall"], cpu + run["cpu"]
+        timed_sizes.append(size)
+        timings.append(max(run["wall"], 1e-9))
+        stopped = emit(case_res)
+
+    if declared:
+        case_res = {"index": len(sizes) + 1, "input": ["complexity"], "expected": f"O({declared})"}
+        if stopped and len(timed_sizes) < len(sizes):
+            case_res["status"] = "skipped"
+        elif len(timed_sizes) < 3:
+            case_res.update({"status": "failed", "error": "Not enough timed sizes to fit complexity"})
+        else:
+            fitted = fit_complexity(timed_sizes, timings)
+            ok = _complexity_rank(fitted) <= declared_rank
+            case_res.update({"status": "passed" if ok else "failed", "actual": f"O({fitted})"})
+            if not ok:
+                case_res["error"] = f"Running time grows like O({fitted}), expected at most O({declared})"
+        emit(case_res)
+
+    return {"total": len(results), "passed": passed, "details": results, "label": func_name, **_timing(wall, cpu)}
+
+ENTRY_RUNNERS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "function": run_function_tests,
+    "class_method": run_class_method_tests,
+    "class_attribute": run_class_attribute_tests,
+    "performance": run_performance_tests,
+}
+
+def available_cpus() -> int:
+    # Ядра, доступные процессу, с учетом квоты cgroup v2 контейнера (--cpus)
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(int(quota) // int(period), 1))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def case_workers(spec: Dict[str, Any], cases: int) -> int:
+    requested = spec.get("parallel_cases")
+    if not requested or spec.get("fail_fast"):
+        return 1
+    # Замеры производительности в параллель с другими кейсами были бы недостоверны
+    entries = spec.get("entry")
+    if any(isinstance(entry, dict) and entry.get("type") == "performance" for entry in (entries if isinstance(entries, list) else [entries])):
+        return 1
+    limit = available_cpus() if requested is True else int(requested)
+    return max(min(limit, available_cpus(), cases), 1)
+
+def process_limit(spec: Dict[str, Any], max_processes: int) -> int:
+    # RLIMIT_NPROC песочницы: параллельным кейсам нужен процесс на каждый воркер плюс сама проверка
+    try:
+        workers = case_workers(spec, len(planned_cases(spec)))
+    except (TypeError, ValueError):
+        return max_processes
+    return max(max_processes, workers + 1) if workers > 1 else max_processes
+
+def _die_with_parent() -> None:
+    # Если проверку убили по дедлайну, дочерние процессы кейсов не должны ее пережить
+    try:
+        ctypes.CDLL(None).prctl(1, signal.SIGKILL)  # PR_SET_PDEATHSIG
+    except (OSError, AttributeError):
+        pass
+
+def _run_case(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any], test: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        runner = ENTRY_RUNNERS[entry.get("type", "function").lower()]
+        res = runner(module, spec, {**entry, "tests": [test]})
+        return {"detail": res["details"][0]}
+    except GradingError as e:
+        return {"grading_error": str(e)}
+    except BaseException as e:
+        return {"detail": {"status": "error", "error": f"{type(e).__name__}: {e}"}}
+
+def _run_case_in_child(module: types.ModuleType, spec: Dict[str, Any], entry: Dict[str, Any], test: Dict[str, Any], write_fd: int) -> None:
+    _die_with_parent()
+    payload = json.dumps(_run_case(module, spec, entry, test), default=str).encode("utf-8")
+    while payload:
+        payload = payload[os.write(write_fd, payload):]
+
+def _case_exit_reason(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f"Case process terminated by signal {signal.Signals(os.WTERMSIG(status)).name}"
+    return "Case process exited without result"
+
+def run_cases_parallel(
+    module: types.ModuleType,
+    spec: Dict[str, Any],
+    jobs: List[Tuple[int, Dict[str, Any], Dict[str, Any]]],
+    workers: int,
+    on_case: Optional[CaseCallback] = None,
+) -> Dict[int, Dict[str, Any]]:
+    # Каждый кейс выполняется в своем fork-е процесса, где решение уже импортировано:
+    # копия при записи дает каждому кейсу нетронутое состояние модуля, изменения в нем никуда не утекают.
+    # Одновременно работает не больше workers процессов; on_case вызывается строго по порядку индексов.
+    # Если fork упирается в лимит процессов, ждем уже запущенные кейсы, а без них выполняем кейс
+    # прямо в процессе проверки, как в последовательном режиме.
+    pending = list(reversed(jobs))
+    running: Dict[int, Tuple[int, int, Dict[str, Any]]] = {}
+    buffers: Dict[int, bytes] = {}
+    details: Dict[int, Dict[str, Any]] = {}
+    order = [index for index, _, _ in jobs]
+    next_emit = 0
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    def record(index: int, entry: Dict[str, Any], message: Dict[str, Any]) -> None:
+        if "grading_error" in message:
+            raise GradingError(message["grading_error"])
+        details[index] = {**message["detail"], "index": index, "entry": _entry_label(entry)}
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index, entry, test = pending.pop()
+                read_fd, write_fd = os.pipe()
+                try:
+                    pid = os.fork()
+                except OSError:
+                    os.close(read_fd)
+                    os.close(write_fd)
+                    if running:
+                        pending.append((index, entry, test))
+                        workers = len(running)
+                        break
+                    workers = 1
+                    record(index, entry, _run_case(module, spec, entry, test))
+                    continue
+                if pid == 0:
+                    os.close(read_fd)
+                    try:
+                        _run_case_in_child(module, spec, entry, test, write_fd)
+                    finally:
+                        os._exit(0)
+                os.close(write_fd)
+                running[read_fd] = (pid, index, entry)
+                buffers[read_fd] = b""
+
+            for fd in select.select(list(running), [], [])[0] if running else []:
+                chunk = os.read(fd, 65536)
+                if chunk:
+                    buffers[fd] += chunk
+                    continue
+                pid, index, entry = running.pop(fd)
+                os.close(fd)
+                _, status = os.waitpid(pid, 0)
+                try:
+                    message = json.loads(buffers.pop(fd))
+                except ValueError:
+                    message = {"detail": {"status": "error", "error": _case_exit_reason(status)}}
+                record(index, entry, message)
+
+            while next_emit < len(order) and order[next_emit] in details:
+                if on_case:
+                    on_case(details[order[next_emit]])
+                next_emit += 1
+    finally:
+        for fd, (pid, _, _) in running.items():
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            os.close(fd)
+    return details
 
 def _normalize_entry_list(raw_entry: Any) -> List[Dict[str, Any]]:
     if isinstance(raw_entry, list):
@@ -214,7 +634,46 @@ def _normalize_entry_list(raw_entry: Any) -> List[Dict[str, Any]]:
         return [raw_entry]
     raise GradingError("Task spec 'entry' must be an object or a list of objects")
 
-def grade_solution(solution_path: Path, task_id: str, spec_data: Dict[str, Any] | None = None) -> Dict[str, Any]:
+def _entry_label(entry: Dict[str, Any]) -> str:
+    entry_type = entry.get("type", "function").lower()
+    if entry_type in ("function", "performance"):
+        return entry.get("name", "")
+    if entry_type == "class_method":
+        return f"{entry.get('class_name')}.{entry.get('method_name')}"
+    if entry_type == "class_attribute":
+        return f"{entry.get('class_name')}.{entry.get('attribute_name')}"
+    return entry_type
+
+def planned_cases(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    planned, case_index = [], 1
+    try:
+        entries = _normalize_entry_list(spec.get("entry"))
+    except GradingError:
+        return planned
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        if entry.get("type", "function").lower() == "performance":
+            tests = range(performance_case_count(entry))
+        else:
+            tests = entry.get("tests") or spec.get("tests") or []
+        for _ in tests if isinstance(tests, (list, range)) else []:
+            planned.append({"index": case_index, "entry": _entry_label(entry)})
+            case_index += 1
+    return planned
+
+def partial_result(task_id: str, spec: Dict[str, Any], cases: List[Dict[str, Any]], reason: str) -> Dict[str, Any]:
+    # Прогон прерван целиком: готовые кейсы оставляем, остальные помечаем как timeout
+    done = {case["index"]: case for case in cases}
+    merged = [done.get(p["index"]) or {**p, "status": "timeout", "error": reason} for p in planned_cases(spec)]
+    return {
+        "task_id": task_id,
+        "summary": {"passed": sum(1 for case in merged if case["status"] == "passed"), "total": len(merged)},
+        "cases": merged,
+        "error": reason,
+    }
+
+def grade_solution(solution_path: Path, task_id: str, spec_data: Dict[str, Any] | None = None, on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
     spec = load_task_spec(task_id, spec_data)
     
     try:
@@ -225,32 +684,69 @@ def grade_solution(solution_path: Path, task_id: str, spec_data: Dict[str, Any]
     if "allowed_imports" in spec:
         enforce_allowed_imports_if_configured(source, spec)
 
-    module = load_solution_module(solution_path)
+    import_limit = spec.get("case_time_limit")
+    try:
+        with Stopwatch() as import_sw, case_deadline(import_limit):
+            module = load_solution_module(solution_path)
+    except CaseTimeout:
+        raise GradingError(f"{_timeout_message(import_limit)} while importing solution")
     entries = _normalize_entry_list(spec["entry"])
     
     overall_cases, total_passed, total_tests, case_index = [], 0, 0, 1
-
-    for entry in entries:
-        entry_type = entry.get("type", "function").lower()
-        if entry_type == "function":
-            tests_res = run_function_tests(module, spec, entry)
-        elif entry_type == "class_method":
-            tests_res = run_class_method_tests(module, spec, entry)
-        elif entry_type == "class_attribute":
-            tests_res = run_class_attribute_tests(module, spec, entry)
-        else:
-            raise GradingError(f"Unsupported entry type: {entry_type}")
-
-        for detail in tests_res.get("details", []):
-            case = {**detail, "index": case_index, "entry": tests_res.get("label")}
-            overall_cases.append(case)
-            case_index += 1
+    tests_wall, tests_cpu = 0.0, 0.0
+
+    workers = case_workers(spec, len(planned_cases(spec)))
+    if workers > 1:
+        jobs = []
+        for entry in entries:
+            entry_type = entry.get("type", "function").lower()
+            if entry_type not in ENTRY_RUNNERS:
+                raise GradingError(f"Unsupported entry type: {entry_type}")
+            for test in _ensure_tests_list(entry.get("tests") or spec.get("tests"), context="Entry tests"):
+                jobs.append((len(jobs) + 1, entry, test))
+        with Stopwatch() as tests_sw:
+            details = run_cases_parallel(module, spec, jobs, workers, on_case)
+        overall_cases = [details[index] for index, _, _ in jobs]
+        total_passed = sum(1 for case in overall_cases if case["status"] == "passed")
+        total_tests = len(overall_cases)
+        # Кейсы шли параллельно: wall - реальное время фазы, CPU - сумма по кейсам
+        tests_wall, tests_cpu = tests_sw.wall, sum(case.get("cpu_time", 0.0) for case in overall_cases)
+    else:
+        for entry in entries:
+            entry_type = entry.get("type", "function").lower()
+            emit = None
+            if on_case:
+                base, label = case_index - 1, _entry_label(entry)
+                emit = lambda detail, base=base, label=label: on_case({**detail, "index": base + detail["index"], "entry": label})
+            runner = ENTRY_RUNNERS.get(entry_type)
+            if runner is None:
+                raise GradingError(f"Unsupported entry type: {entry_type}")
+            tests_res = runner(module, spec, entry, emit)
+
+            for detail in tests_res.get("details", []):
+                case = {**detail, "index": case_index, "entry": tests_res.get("label")}
+                overall_cases.append(case)
+                case_index += 1
         
-        total_passed += tests_res.get("passed", 0)
-        total_tests += tests_res.get("total", 0)
+            total_passed += tests_res.get("passed", 0)
+            total_tests += tests_res.get("total", 0)
+            tests_wall += tests_res.get("wall_time", 0.0)
+            tests_cpu += tests_res.get("cpu_time", 0.0)
+            if spec.get("fail_fast") and tests_res.get("passed", 0) < tests_res.get("total", 0):
+                break
+
+    if spec.get("fail_fast"):
+        # Непроверенные после первой ошибки кейсы попадают в отчет как пропущенные
+        overall_cases += [{**case, "status": "skipped"} for case in planned_cases(spec)[len(overall_cases):]]
+        total_tests = len(overall_cases)
 
     return {
         "task_id": task_id,
         "summary": {"passed": total_passed, "total": total_tests},
         "cases": overall_cases,
+        "timing": {
+            "import": _timing(import_sw.wall, import_sw.cpu),
+            "tests": _timing(tests_wall, tests_cpu),
+            "total": _timing(import_sw.wall + tests_wall, import_sw.cpu + tests_cpu),
+        },
     }
\ No newline at end of file
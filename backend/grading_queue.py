@@ -0,0 +1,448 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.models import User, AssignedTask, Submission, SubmissionStatus
+from backend.schemas import SubmissionResponse
+from backend.websocket_manager import manager
+from backend.presence import presence
+from backend.dashboard import dashboard
+from backend.code_executor import code_executor, RESOURCE_FIELDS
+from backend.result_cache import result_cache
+from backend.grader import planned_cases
+
+
+WAITING_STATUSES = (SubmissionStatus.PENDING, SubmissionStatus.QUEUED)
+SUPERSEDED_MESSAGE = "Superseded by a newer submission"
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class GradingJob:
+    def __init__(
+        self,
+        submission_id: Any,
+        user_id: str,
+        task_id: str,
+        code: str,
+        spec: Dict,
+        session_id: Optional[str] = None,
+        speculative: bool = False,
+    ):
+        self.submission_id = submission_id
+        self.user_id = user_id
+        self.task_id = task_id
+        self.code = code
+        self.spec = spec
+        self.session_id = session_id
+        # Предварительная проверка живого кода: без строки в БД, результат нужен только кешу
+        self.speculative = speculative
+
+
+class ProgressRelay:
+    # Пересылает результаты кейсов студенту и преподавателям, открывшим его карточку.
+    # push синхронный и не ждет сокетов, порядок сохраняет единственная задача-отправитель.
+
+    def __init__(self, job: GradingJob):
+        self.job = job
+        self.total = len(planned_cases(job.spec))
+        self.done = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._sender = asyncio.create_task(self._send_all())
+
+    def push(self, case: Dict[str, Any]) -> None:
+        self.done += 1
+        self._queue.put_nowait({
+            "type": "submission_progress",
+            "submission_id": str(self.job.submission_id),
+            "user_id": self.job.user_id,
+            "case": case,
+            "done": self.done,
+            "total": self.total,
+        })
+
+    async def close(self) -> None:
+        self._queue.put_nowait(None)
+        await self._sender
+
+    async def _send_all(self) -> None:
+        while True:
+            message = await self._queue.get()
+            if message is None:
+                return
+            await send_progress(self.job.user_id, self.job.session_id, message)
+
+
+async def send_progress(user_id: str, session_id: Optional[str], message: Dict[str, Any]) -> None:
+    await manager.send_to_student(user_id, message)
+    if session_id:
+        await manager.send_to_admins_viewing_student(session_id, user_id, message)
+
+
+class GradingQueue:
+    # Честный планировщик проверок: взвешенный round-robin сначала по сессиям, затем по студентам
+    # внутри сессии, поэтому один студент или одна большая группа не забивает воркеров.
+    # У студента не больше max_per_student проверок одновременно, а новое решение той же задачи
+    # вытесняет старое из очереди или прерывает его проверку. При переполнении submit получает отказ.
+    # Предварительные (speculative) проверки идут отдельной полосой: только когда реальных заданий нет,
+    # не больше max_speculative_per_session на сессию и с вытеснением, если реальному заданию не хватило воркера.
+
+    def __init__(
+        self,
+        handler: Callable[[GradingJob], Awaitable[None]],
+        workers: int = settings.GRADING_WORKERS,
+        max_size: int = settings.GRADING_QUEUE_MAX_SIZE,
+        max_per_student: int = settings.GRADING_MAX_IN_FLIGHT_PER_STUDENT,
+        max_speculative_per_session: int = settings.SPECULATIVE_MAX_PER_SESSION,
+        on_cancel: Optional[Callable[[GradingJob], Awaitable[None]]] = None,
+    ):
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.max_size = max_size
+        self.max_per_student = max(max_per_student, 1)
+        self.max_speculative_per_session = max_speculative_per_session
+        self.on_cancel = on_cancel
+        self.weights: Dict[Optional[str], int] = {}
+        # session_id -> user_id -> очередь заданий; порядок ключей и есть порядок обхода
+        self._sessions: "OrderedDict[Optional[str], OrderedDict[str, Deque[GradingJob]]]" = OrderedDict()
+        self._credit: Dict[Optional[str], int] = {}
+        # (user_id, task_id) -> последний снимок кода; новый снимок заменяет старый
+        self._speculative: "OrderedDict[Tuple[str, str], GradingJob]" = OrderedDict()
+        self._running: Dict[Any, Tuple[GradingJob, asyncio.Task]] = {}
+        self._per_student: Dict[str, int] = {}
+        self._ready: Optional[asyncio.Condition] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._size = 0
+        self._unfinished = 0
+        self.in_flight = 0
+
+    @property
+    def depth(self) -> int:
+        return self._size
+
+    def set_weight(self, session_id: Optional[str], weight: int) -> None:
+        # Сессия с весом N получает до N заданий подряд за один круг обхода
+        self.weights[session_id] = max(weight, 1)
+
+    def _get_ready(self) -> asyncio.Condition:
+        if self._ready is None:
+            self._ready = asyncio.Condition()
+            self._idle = asyncio.Event()
+            self._idle.set()
+        return self._ready
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._get_ready()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job: GradingJob, supersede: bool = True) -> None:
+        # supersede=False оставляет старые проверки задачи студента: вызывающий снимет их сам через
+        # cancel(..., keep=job), когда отмена будет записана в базу
+        self._get_ready()
+        # Место проверяем до снятия старых проверок: отклоненное решение не должно отменять прежнее
+        replaced = sum(1 for students in self._sessions.values() for queued in students.get(job.user_id, ()) if queued.task_id == job.task_id)
+        if self._size - replaced >= self.max_size:
+            raise QueueFullError("Grading queue is full, try again later")
+        if supersede:
+            self.cancel(job.user_id, job.task_id)
+        students = self._sessions.setdefault(job.session_id, OrderedDict())
+        students.setdefault(job.user_id, deque()).append(job)
+        self._size += 1
+        self._unfinished += 1
+        self._idle.clear()
+        if self.in_flight >= self.workers:
+            self._preempt(job)
+        self._wake()
+
+    def submit_speculative(self, job: GradingJob) -> bool:
+        self._get_ready()
+        key = (job.user_id, job.task_id)
+        stale = self._speculative.pop(key, None)
+        if stale is not None:
+            self._finish_one()
+        for running, task in list(self._running.values()):
+            if running.speculative and (running.user_id, running.task_id) == key and running.code != job.code:
+                task.cancel()
+        if self._speculative_count(job.session_id) >= self.max_speculative_per_session:
+            return False
+        self._speculative[key] = job
+        self._unfinished += 1
+        self._idle.clear()
+        self._wake()
+        return True
+
+    def cancel(self, user_id: str, task_id: str, keep: Optional[GradingJob] = None) -> List[GradingJob]:
+        # Снимает ожидающие и прерывает идущие проверки задачи студента, кроме keep
+        cancelled = []
+        for students in self._sessions.values():
+            queued = students.get(user_id)
+            if not queued:
+                continue
+            for job in [job for job in queued if job.task_id == task_id and job is not keep]:
+                queued.remove(job)
+                self._size -= 1
+                cancelled.append(job)
+                self._notify_cancelled(job)
+                self._finish_one()
+        self._prune()
+        for job, task in list(self._running.values()):
+            if not job.speculative and job.user_id == user_id and job.task_id == task_id and job is not keep:
+                task.cancel()
+                cancelled.append(job)
+        return cancelled
+
+    async def join(self) -> None:
+        self._get_ready()
+        await self._idle.wait()
+
+    def _speculative_count(self, session_id: Optional[str]) -> int:
+        queued = sum(1 for job in self._speculative.values() if job.session_id == session_id)
+        running = sum(1 for job, task in self._running.values() if job.speculative and job.session_id == session_id and not task.cancelling())
+        return queued + running
+
+    def _preempt(self, job: GradingJob) -> None:
+        # Прогон того же кода не трогаем: реальная проверка возьмет его результат из кеша
+        for running, task in self._running.values():
+            if running.speculative and not task.cancelling() and (running.user_id, running.task_id, running.code) != (job.user_id, job.task_id, job.code):
+                task.cancel()
+                return
+
+    def _wake(self) -> None:
+        ready = self._get_ready()
+
+        async def notify() -> None:
+            async with ready:
+                ready.notify_all()
+
+        asyncio.get_running_loop().create_task(notify())
+
+    def _notify_cancelled(self, job: GradingJob) -> None:
+        if self.on_cancel:
+            asyncio.get_running_loop().create_task(self.on_cancel(job))
+
+    def _finish_one(self) -> None:
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._idle.set()
+
+    def _prune(self) -> None:
+        for session_id in list(self._sessions):
+            students = self._sessions[session_id]
+            for user_id in [user_id for user_id, queued in students.items() if not queued]:
+                del students[user_id]
+            if not students:
+                del self._sessions[session_id]
+                self._credit.pop(session_id, None)
+
+    def _pick(self) -> Optional[GradingJob]:
+        for _ in range(len(self._sessions)):
+            session_id, students = next(iter(self._sessions.items()))
+            job = self._pick_student(students)
+            if job is None:
+                self._sessions.move_to_end(session_id)
+                self._credit.pop(session_id, None)
+                continue
+            credit = self._credit.get(session_id, self.weights.get(session_id, 1)) - 1
+            if credit > 0:
+                self._credit[session_id] = credit
+            else:
+                self._credit.pop(session_id, None)
+                self._sessions.move_to_end(session_id)
+            self._size -= 1
+            self._prune()
+            return job
+        if self._size == 0 and self._speculative:
+            return self._speculative.popitem(last=False)[1]
+        return None
+
+    def _pick_student(self, students: "OrderedDict[str, Deque[GradingJob]]") -> Optional[GradingJob]:
+        for user_id in list(students):
+            if self._per_student.get(user_id, 0) >= self.max_per_student:
+                continue
+            students.move_to_end(user_id)
+            return students[user_id].popleft()
+        return None
+
+    async def _next_job(self) -> GradingJob:
+        ready = self._get_ready()
+        async with ready:
+            while True:
+                job = self._pick()
+                if job is not None:
+                    return job
+                await ready.wait()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._next_job()
+            self.in_flight += 1
+            if not job.speculative:
+                self._per_student[job.user_id] = self._per_student.get(job.user_id, 0) + 1
+            task = asyncio.create_task(self.handler(job))
+            self._running[id(job)] = (job, task)
+            try:
+                # wait не отменяет задачу вместе с собой, поэтому отмену воркера и вытеснение различаем явно
+                await asyncio.wait({task})
+                if task.cancelled():
+                    if not job.speculative:
+                        self._notify_cancelled(job)
+                elif task.exception():
+                    print(f"Grading job {job.submission_id} failed: {task.exception()}")
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                self._running.pop(id(job), None)
+                self.in_flight -= 1
+                if not job.speculative:
+                    self._per_student[job.user_id] -= 1
+                    if not self._per_student[job.user_id]:
+                        del self._per_student[job.user_id]
+                self._finish_one()
+                self._wake()
+
+
+def describe_submission(db: Any, submission: Submission) -> Dict[str, Any]:
+    user = db.query(User).filter(User.id == submission.user_id).first()
+    return {
+        "session_id": str(user.session_id) if user else None,
+        "user_status": presence.status_of(str(submission.user_id), user.status) if user else None,
+        "submission": SubmissionResponse.model_validate(submission).model_dump(mode="json"),
+    }
+
+
+def store_result(submission_id: Any, result: Dict[str, Any], lease_owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        # Вытесненное новым решением не воскрешаем, даже если проверка успела закончиться
+        query = db.query(Submission).filter(Submission.id == submission_id, Submission.status != SubmissionStatus.CANCELLED)
+        if lease_owner is not None:
+            # Воркер, у которого аренду уже перехватили, не должен перезаписать чужой результат
+            query = query.filter(Submission.worker_id == lease_owner, Submission.status == SubmissionStatus.RUNNING)
+        submission = query.first()
+        if not submission:
+            return None
+
+        submission.status = SubmissionStatus(result.get("status", "error"))
+        submission.test_results = result.get("test_results")
+        submission.error_message = result.get("error_message")
+        submission.execution_time = result.get("execution_time")
+        submission.cpu_time = result.get("cpu_time")
+        for field in RESOURCE_FIELDS:
+            setattr(submission, field, result.get(field))
+        submission.lease_expires_at = None
+
+        if submission.status == SubmissionStatus.SUCCESS:
+            assignment = db.query(AssignedTask).filter(AssignedTask.user_id == submission.user_id, AssignedTask.task_id == submission.task_id).first()
+            if assignment:
+                assignment.is_completed = True
+
+        db.commit()
+        return describe_submission(db, submission)
+    finally:
+        db.close()
+
+
+def mark_running(submission_id: Any) -> bool:
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(Submission)
+            .filter(Submission.id == submission_id, Submission.status.in_(WAITING_STATUSES))
+            .update({Submission.status: SubmissionStatus.RUNNING}, synchronize_session=False)
+        )
+        db.commit()
+        return updated > 0
+    finally:
+        db.close()
+
+
+def cancel_superseded(user_id: str, task_id: str, keep_id: Any) -> int:
+    # Новое решение той же задачи делает ожидающие и идущие проверки старых бессмысленными
+    db = SessionLocal()
+    try:
+        updated = (
+            db.query(Submission)
+            .filter(
+                Submission.user_id == user_id,
+                Submission.task_id == task_id,
+                Submission.id != keep_id,
+                Submission.status.in_(WAITING_STATUSES + (SubmissionStatus.RUNNING,)),
+            )
+            .update({
+                Submission.status: SubmissionStatus.CANCELLED,
+                Submission.error_message: SUPERSEDED_MESSAGE,
+                Submission.lease_expires_at: None,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        return updated
+    finally:
+        db.close()
+
+
+def load_stored_result(submission_id: Any) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        submission = db.query(Submission).filter(Submission.id == submission_id).first()
+        return describe_submission(db, submission) if submission else None
+    finally:
+        db.close()
+
+
+async def announce_result(user_id: str, stored: Dict[str, Any]) -> None:
+    submission = stored["submission"]
+    await manager.send_to_student(user_id, {"type": "submission_result", "submission": submission})
+
+    if stored["session_id"]:
+        fields = {"submission_status": submission["status"]}
+        if stored["user_status"]:
+            fields["status"] = stored["user_status"]
+        dashboard.student_changed(stored["session_id"], user_id, **fields)
+
+
+async def finish_submission(submission_id: Any, user_id: str, result: Dict[str, Any]) -> None:
+    stored = await asyncio.to_thread(store_result, submission_id, result)
+    if stored:
+        await announce_result(user_id, stored)
+
+
+async def announce_cancelled(job: GradingJob) -> None:
+    stored = await asyncio.to_thread(load_stored_result, job.submission_id)
+    if stored:
+        await announce_result(job.user_id, stored)
+
+
+async def process_submission(job: GradingJob) -> None:
+    if job.speculative:
+        await result_cache.get_or_run(job.code, job.task_id, job.spec, code_executor.run_code)
+        return
+    if not await asyncio.to_thread(mark_running, job.submission_id):
+        return  # решение отменили, пока оно ждало в очереди
+
+    relay = ProgressRelay(job)
+
+    async def run_with_progress(code: str, task_id: str, spec: Dict) -> Dict[str, Any]:
+        return await code_executor.run_code(code, task_id, spec, on_case=relay.push)
+
+    try:
+        result = await result_cache.get_or_run(job.code, job.task_id, job.spec, run_with_progress)
+    finally:
+        await relay.close()
+    await finish_submission(job.submission_id, job.user_id, result)
+
+
+grading_queue = GradingQueue(process_submission, on_cancel=announce_cancelled)
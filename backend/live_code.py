@@ -0,0 +1,210 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from backend.config import settings
+
+# Канонический буфер кода каждого студента для live-просмотра. Клиент присылает не весь код,
+# а правки {"p": позиция, "d": сколько удалить, "i": что вставить}, применяемые по очереди.
+# Позиции считаются в UTF-16, как в CodeMirror и строках JS. Каждая пачка правок ссылается
+# на версию буфера, к которой применима; при расхождении клиент присылает полный снимок.
+
+
+class LiveCodeError(ValueError):
+    pass
+
+
+def _utf16_index(text: str, units: int, start: int = 0) -> int:
+    if text.isascii():
+        index = start + units
+        if index > len(text):
+            raise LiveCodeError("Position out of range")
+        return index
+    index, count = start, 0
+    while count < units:
+        if index >= len(text):
+            raise LiveCodeError("Position out of range")
+        count += 2 if ord(text[index]) > 0xFFFF else 1
+        index += 1
+    if count != units:
+        raise LiveCodeError("Position splits a surrogate pair")
+    return index
+
+
+def apply_ops(code: str, ops: List[Dict[str, Any]]) -> str:
+    for op in ops:
+        if not isinstance(op, dict):
+            raise LiveCodeError("Malformed op")
+        pos, delete, insert = op.get("p", 0), op.get("d", 0), op.get("i", "")
+        if not isinstance(pos, int) or not isinstance(delete, int) or not isinstance(insert, str) or pos < 0 or delete < 0:
+            raise LiveCodeError("Malformed op")
+        start = _utf16_index(code, pos)
+        end = _utf16_index(code, delete, start)
+        code = code[:start] + insert + code[end:]
+    return code
+
+
+class LiveBuffer:
+    def __init__(self, code: str, version: int):
+        self.code = code
+        self.version = version
+
+
+def snapshot_message(user_id: str, buffer: LiveBuffer) -> Dict[str, Any]:
+    return {"type": "live_code_update", "user_id": user_id, "code": buffer.code, "version": buffer.version}
+
+
+class LiveCodeStore:
+    # Последние буферы студентов переживают отключение, чтобы view_student сразу получал снимок.
+    # Кэш ограничен числом буферов и суммарной длиной кода; дольше всех не менявшиеся вытесняются.
+    # Если вытеснен буфер подключенного студента, следующая дельта не применится и он пришлет снимок.
+
+    def __init__(self, max_entries: int = settings.LIVE_CODE_CACHE_SIZE, max_chars: int = settings.LIVE_CODE_CACHE_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._buffers: "OrderedDict[str, LiveBuffer]" = OrderedDict()
+        self._chars = 0
+        # Студенты, у которых уже попросили снимок: до его прихода правки отбрасываем и не просим повторно
+        self._resync: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def get(self, user_id: str) -> Optional[LiveBuffer]:
+        return self._buffers.get(user_id)
+
+    def snapshot(self, user_id: str, code: str, version: int) -> LiveBuffer:
+        if not isinstance(code, str) or not isinstance(version, int):
+            raise LiveCodeError("Malformed snapshot")
+        self._resync.discard(user_id)
+        self._drop(user_id)
+        buffer = self._buffers[user_id] = LiveBuffer(code, version)
+        self._chars += len(code)
+        self._evict()
+        return buffer
+
+    def apply(self, user_id: str, base: int, ops: List[Dict[str, Any]]) -> LiveBuffer:
+        buffer = self._buffers.get(user_id)
+        if buffer is None or user_id in self._resync or buffer.version != base:
+            raise LiveCodeError("Version mismatch")
+        if not isinstance(ops, list):
+            raise LiveCodeError("Malformed ops")
+        code = apply_ops(buffer.code, ops)
+        self._chars += len(code) - len(buffer.code)
+        buffer.code = code
+        buffer.version += 1
+        self._buffers.move_to_end(user_id)
+        self._evict()
+        return buffer
+
+    def _drop(self, user_id: str) -> None:
+        buffer = self._buffers.pop(user_id, None)
+        if buffer is not None:
+            self._chars -= len(buffer.code)
+
+    def _evict(self) -> None:
+        # Самый свежий буфер не вытесняем, даже если он один больше лимита
+        while len(self._buffers) > 1 and (len(self._buffers) > self.max_entries or self._chars > self.max_chars):
+            _, buffer = self._buffers.popitem(last=False)
+            self._chars -= len(buffer.code)
+
+    def request_resync(self, user_id: str) -> bool:
+        if user_id in self._resync:
+            return False
+        self._resync.add(user_id)
+        return True
+
+    def forget(self, user_id: str) -> None:
+        self._drop(user_id)
+        self._resync.discard(user_id)
+
+
+class LiveCodeFeed:
+    # Поток live-кода к одному админу. Отправляем не чаще max_fps кадров в секунду: правки,
+    # пришедшие между кадрами, склеиваются в одну дельту, а если склеить нельзя (снимок, разрыв версий,
+    # правок больше самого буфера) - уходит снимок текущего буфера. Последнее состояние доходит
+    # не позже чем через один кадр, а push не ждет сети.
+
+    def __init__(self, send: Callable[[Dict[str, Any]], Awaitable[Any]], store: LiveCodeStore, max_fps: float = settings.LIVE_CODE_MAX_FPS):
+        self.send = send
+        self.store = store
+        self.interval = 1 / max_fps if max_fps > 0 else 0.0
+        self.student_id: Optional[str] = None
+        self._base: Optional[int] = None
+        self._version: Optional[int] = None
+        self._ops: List[Dict[str, Any]] = []
+        self._ops_size = 0
+        self._snapshot = False
+        self._last_sent = float("-inf")
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> bool:
+        return self._snapshot or self._base is not None
+
+    def push(self, student_id: str, buffer: Optional[LiveBuffer] = None, ops: Optional[List[Dict[str, Any]]] = None) -> None:
+        # Без ops - нужен снимок; с ops - дельта, переводящая buffer в его текущую версию
+        if student_id != self.student_id:
+            self._reset()
+            self.student_id = student_id
+            ops = None
+        if ops is None or self._snapshot or (self._version is not None and self._version != buffer.version - 1):
+            self._reset()
+            self._snapshot = True
+        else:
+            if self._base is None:
+                self._base = buffer.version - 1
+            self._version = buffer.version
+            self._ops.extend(ops)
+            self._ops_size += sum(len(op.get("i", "")) + 1 for op in ops)
+            if self._ops_size > len(buffer.code):
+                self._reset()
+                self._snapshot = True
+        self._schedule()
+
+    def close(self) -> None:
+        self._reset()
+        self.student_id = None
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _reset(self) -> None:
+        self._base = self._version = None
+        self._ops, self._ops_size, self._snapshot = [], 0, False
+
+    def _schedule(self) -> None:
+        if self._timer or self._sending or not self.pending:
+            return
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, self._last_sent + self.interval - time.monotonic())
+        self._timer = loop.call_later(delay, self._flush)
+
+    def _flush(self) -> None:
+        self._timer = None
+        message = self._message()
+        self._reset()
+        if message is None:
+            return
+        self._last_sent = time.monotonic()
+        self._sending = asyncio.get_running_loop().create_task(self.send(message))
+        self._sending.add_done_callback(self._sent)
+
+    def _sent(self, task: asyncio.Task) -> None:
+        self._sending = None
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ Live code send failed: {task.exception()}")
+        self._schedule()
+
+    def _message(self) -> Optional[Dict[str, Any]]:
+        if self._snapshot:
+            buffer = self.store.get(self.student_id)
+            return snapshot_message(self.student_id, buffer) if buffer is not None else None
+        if self._base is None:
+            return None
+        return {"type": "live_code_delta", "user_id": self.student_id, "base": self._base, "version": self._version, "ops": self._ops}
+
+
+live_code = LiveCodeStore()
@@ -1,29 +1,41 @@
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Body
+from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Body, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from typing import List, Dict, Optional
 import json
-from datetime import datetime
+import asyncio
 import uuid
 
 from backend.config import get_settings
 from backend.database import engine, Base, get_db
-from backend.models import User, Session as DbSession, Task, AssignedTask, Submission, UserStatus, SubmissionStatus
+from backend.models import User, Session as DbSession, Task, AssignedTask, Submission, SubmissionStatus
 from backend.schemas import (
     UserCreate, UserResponse, 
     SessionCreate, SessionResponse,
     TaskResponse, SubmissionCreate, SubmissionResponse,
     StudentDetail,
-    TaskCreate, TaskUpdate, ManualAssignRequest
+    TaskCreate, TaskUpdate, ManualAssignRequest, GradingEvent
 )
 from backend.auth import (
     get_password_hash, verify_password, create_access_token, 
-    get_current_admin_session
+    get_current_admin_session, verify_worker_token
 )
 from backend.websocket_manager import manager
+from backend.wire import receive_message
 from backend.task_manager import TaskManager
-from backend.code_executor import code_executor
+from backend.code_executor import code_executor, grading_spec
+from backend.speculative import speculative_grader
+from backend.live_code import live_code, LiveCodeError
+from backend.timeline import timeline
+from backend.runtime_stats import runtime_stats
+from backend.presence import presence, student_session
+from backend.dashboard import dashboard
+from backend.grading_queue import grading_queue, GradingJob, QueueFullError, finish_submission, cancel_superseded, announce_result, load_stored_result, send_progress
+from backend.result_cache import result_cache
+from backend.regrade import regrade_task
 
 Base.metadata.create_all(bind=engine)
 
@@ -32,7 +44,8 @@ settings = get_settings()
 app = FastAPI(
     title="Code Spirit API",
     description="Real-time Python learning platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -43,6 +56,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    await runtime_stats.start()
+    await code_executor.start()
+    await manager.start()
+    await presence.start()
+    await dashboard.start()
+    await timeline.start()
+    if settings.GRADING_MODE == "inline":
+        await grading_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await speculative_grader.stop()
+    await grading_queue.shutdown()
+    await dashboard.stop()
+    await timeline.stop()
+    await presence.stop()
+    await manager.stop()
+    await code_executor.shutdown()
+    await runtime_stats.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "Code Spirit API is running 🚀"}
@@ -80,7 +115,7 @@ def get_students(
     current_session: DbSession = Depends(get_current_admin_session),
     db: Session = Depends(get_db)
 ):
-    return db.query(User).filter(User.session_id == current_session.id).all()
+    return [presence.overlay(UserResponse.model_validate(user)) for user in db.query(User).filter(User.session_id == current_session.id).all()]
 
 @app.get("/api/admin/student/{student_id}", response_model=StudentDetail)
 def get_student_detail(
@@ -96,12 +131,71 @@ def get_student_detail(
     current_task = db.query(Task).filter(Task.id == current_assignment.task_id).first() if current_assignment else None
     last_submission = db.query(Submission).filter(Submission.user_id == student.id).order_by(Submission.submitted_at.desc()).first()
 
-    response = StudentDetail.model_validate(student)
+    response = presence.overlay(StudentDetail.model_validate(student))
     response.current_task = current_task
     response.last_submission = last_submission
     
     return response
 
+@app.get("/api/admin/student/{student_id}/timeline")
+def get_student_timeline(
+    student_id: str,
+    until: Optional[float] = None,
+    current_session: DbSession = Depends(get_current_admin_session),
+    db: Session = Depends(get_db)
+):
+    # Кадры для воспроизведения набора: снимки и дельты по порядку версий, время в секундах Unix
+    student = db.query(User).filter(User.id == student_id, User.session_id == current_session.id).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return {"student_id": str(student.id), "frames": timeline.read(str(current_session.id), str(student.id), until)}
+
+@app.get("/api/admin/stats/runtime")
+def get_runtime_stats(current_session: DbSession = Depends(get_current_admin_session)):
+    # Метрики процесса, обслужившего запрос: задержка цикла событий и ожидание пула базы
+    return runtime_stats.summary(engine.pool)
+
+@app.post("/api/admin/stats/runtime/reset", status_code=204)
+def reset_runtime_stats(current_session: DbSession = Depends(get_current_admin_session)):
+    runtime_stats.reset()
+
+@app.get("/api/admin/stats/execution")
+def get_execution_stats(
+    current_session: DbSession = Depends(get_current_admin_session),
+    db: Session = Depends(get_db)
+):
+    timed = db.query(Submission).join(User, User.id == Submission.user_id).filter(
+        User.session_id == current_session.id, Submission.execution_time.isnot(None)
+    )
+    per_task = timed.with_entities(
+        Submission.task_id,
+        func.count(Submission.id),
+        func.avg(Submission.execution_time),
+        func.max(Submission.execution_time),
+        func.avg(Submission.cpu_time),
+        func.avg(Submission.peak_memory),
+        func.max(Submission.peak_memory),
+        func.sum(Submission.throttled_time),
+        func.count(Submission.id).filter(Submission.oom_killed == True),
+    ).group_by(Submission.task_id).all()
+    slowest = timed.with_entities(
+        Submission.id, Submission.task_id, User.id, User.name, Submission.execution_time, Submission.cpu_time
+    ).order_by(Submission.execution_time.desc()).limit(10).all()
+
+    return {
+        "tasks": [
+            {
+                "task_id": task_id, "submissions": count, "avg_execution_time": avg_wall, "max_execution_time": max_wall, "avg_cpu_time": avg_cpu,
+                "avg_peak_memory": avg_mem, "max_peak_memory": max_mem, "total_throttled_time": throttled, "oom_kills": oom_kills,
+            }
+            for task_id, count, avg_wall, max_wall, avg_cpu, avg_mem, max_mem, throttled, oom_kills in per_task
+        ],
+        "slowest_submissions": [
+            {"submission_id": str(sub_id), "task_id": task_id, "user_id": str(user_id), "name": name, "execution_time": wall, "cpu_time": cpu}
+            for sub_id, task_id, user_id, name, wall, cpu in slowest
+        ],
+    }
+
 @app.post("/api/admin/tasks/assign")
 async def assign_tasks(
     current_session: DbSession = Depends(get_current_admin_session),
@@ -111,12 +205,10 @@ async def assign_tasks(
     assigned_students_with_tasks = tm.assign_tasks_to_all(str(current_session.id))
     
     for student, task in assigned_students_with_tasks:
-        student_socket = manager.active_connections.get(str(student.id))
-        if student_socket:
-            await manager.send_personal_message({
-                "type": "task_assigned",
-                "task": TaskResponse.model_validate(task).model_dump()
-            }, student_socket)
+        await manager.send_to_student(str(student.id), {
+            "type": "task_assigned",
+            "task": TaskResponse.model_validate(task).model_dump()
+        })
 
     return {"assigned_count": len(assigned_students_with_tasks)}
 
@@ -135,17 +227,28 @@ def create_task(task: TaskCreate, db: Session = Depends(get_db), current_session
     return new_task
 
 @app.put("/api/admin/tasks/{task_id}", response_model=TaskResponse)
-def update_task(task_id: str, task_update: TaskUpdate, db: Session = Depends(get_db), current_session: DbSession = Depends(get_current_admin_session)):
+def update_task(task_id: str, task_update: TaskUpdate, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_session: DbSession = Depends(get_current_admin_session)):
     db_task = db.query(Task).filter(Task.id == task_id).first()
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     update_data = task_update.model_dump(exclude_unset=True)
+    grading_changed = any(key in update_data and update_data[key] != getattr(db_task, key) for key in ("spec", "time_limit"))
     for key, value in update_data.items():
         setattr(db_task, key, value)
     db.commit()
     db.refresh(db_task)
+    result_cache.invalidate_task(task_id)
+    if grading_changed:
+        background_tasks.add_task(regrade_task, task_id, str(current_session.id))
     return db_task
 
+@app.post("/api/admin/tasks/{task_id}/regrade")
+def start_regrade(task_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_session: DbSession = Depends(get_current_admin_session)):
+    if not db.query(Task).filter(Task.id == task_id).first():
+        raise HTTPException(status_code=404, detail="Task not found")
+    background_tasks.add_task(regrade_task, task_id, str(current_session.id))
+    return {"status": "started", "task_id": task_id}
+
 @app.delete("/api/admin/tasks/{task_id}")
 def delete_task(task_id: str, db: Session = Depends(get_db), current_session: DbSession = Depends(get_current_admin_session)):
     db_task = db.query(Task).filter(Task.id == task_id).first()
@@ -155,6 +258,7 @@ def delete_task(task_id: str, db: Session = Depends(get_db), current_session: Db
     db.query(Submission).filter(Submission.task_id == task_id).delete()
     db.delete(db_task)
     db.commit()
+    result_cache.invalidate_task(task_id)
     return {"message": "Task deleted"}
 
 @app.post("/api/admin/student/assign_manual")
@@ -163,9 +267,7 @@ async def assign_manual_task(req: ManualAssignRequest, db: Session = Depends(get
     task = tm.assign_specific_task(req.student_id, req.task_id, str(current_session.id)) if req.task_id else tm.assign_task_to_student(req.student_id, str(current_session.id)).task
     if not task:
         raise HTTPException(status_code=400, detail="Could not assign task")
-    student_socket = manager.active_connections.get(req.student_id)
-    if student_socket:
-        await manager.send_personal_message({"type": "task_assigned", "task": TaskResponse.model_validate(task).model_dump()}, student_socket)
+    await manager.send_to_student(req.student_id, {"type": "task_assigned", "task": TaskResponse.model_validate(task).model_dump()})
     return {"status": "assigned", "task_id": task.id}
 
 # ==========================================
@@ -194,69 +296,135 @@ async def submit_solution(submission: SubmissionCreate, user_id: str = Body(...,
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    new_submission = Submission(user_id=user_id, task_id=task.id, code=submission.code, status=SubmissionStatus.RUNNING)
+    new_submission = Submission(user_id=user_id, task_id=task.id, code=submission.code, fail_fast=submission.fail_fast, status=SubmissionStatus.QUEUED)
     db.add(new_submission)
     db.commit()
     db.refresh(new_submission)
 
-    result = await code_executor.run_code(submission.code, task.id, task.spec)
-
-    new_submission.status = SubmissionStatus(result.get("status", "error"))
-    new_submission.test_results = result.get("test_results")
-    new_submission.error_message = result.get("error_message")
-    new_submission.execution_time = result.get("execution_time")
-
-    if new_submission.status == SubmissionStatus.SUCCESS:
-        assignment = db.query(AssignedTask).filter(AssignedTask.user_id == user_id, AssignedTask.task_id == task.id).first()
-        if assignment:
-            assignment.is_completed = True
-            
-    db.commit()
-
-    user = db.query(User).filter(User.id == user_id).first()
-    await manager.broadcast_to_admins(str(user.session_id), {"type": "student_update", "user_id": str(user.id), "status": user.status, "submission_status": new_submission.status})
-    
+    spec = grading_spec(task.spec, task.time_limit, submission.fail_fast)
+    cached = result_cache.lookup(submission.code, task.id, spec)
+    job = None
+    if not cached and settings.GRADING_MODE != "worker":
+        try:
+            user = db.query(User).filter(User.id == user_id).first()
+            session_id = str(user.session_id) if user else None
+            job = GradingJob(new_submission.id, user_id, task.id, submission.code, spec, session_id)
+            grading_queue.submit(job, supersede=False)
+        except QueueFullError as e:
+            new_submission.status = SubmissionStatus.ERROR
+            new_submission.error_message = str(e)
+            db.commit()
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    # Старые непроверенные решения этой задачи больше не нужны, но снимаем их только после того,
+    # как новое принято: при полной очереди у студента остается прежняя проверка. Сначала отмена
+    # в базе, потом в очереди: очередь сразу сообщает студенту статус, он должен быть уже записан
+    await asyncio.to_thread(cancel_superseded, user_id, task.id, new_submission.id)
+    grading_queue.cancel(user_id, task.id, keep=job)
+    if cached:
+        await finish_submission(new_submission.id, user_id, cached)
+        db.refresh(new_submission)
+    # В режиме worker решение уже лежит в БД со статусом queued, его заберет один из воркеров
     return new_submission
 
+@app.get("/api/submissions/{submission_id}", response_model=SubmissionResponse)
+def get_submission(submission_id: str, db: Session = Depends(get_db)):
+    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return submission
+
+@app.post("/api/internal/grading-events", status_code=204, dependencies=[Depends(verify_worker_token)])
+async def grading_event(event: GradingEvent):
+    if event.type == "progress":
+        await send_progress(event.user_id, event.session_id, {
+            "type": "submission_progress",
+            "submission_id": event.submission_id,
+            "user_id": event.user_id,
+            "case": event.case,
+            "done": event.done,
+            "total": event.total,
+        })
+    elif event.type == "finished":
+        stored = await asyncio.to_thread(load_stored_result, event.submission_id)
+        if stored:
+            await announce_result(event.user_id, stored)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown event type: {event.type}")
+
 # ==========================================
 # WEBSOCKETS
 # ==========================================
 
 @app.websocket("/ws/student/{user_id}")
-async def websocket_student(websocket: WebSocket, user_id: str, db: Session = Depends(get_db)):
+async def websocket_student(websocket: WebSocket, user_id: str):
+    # Соединение с базой нужно только на время поиска студента: присутствие пишет PresenceTable пачками
     await manager.connect_student(websocket, user_id)
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    session_id = await asyncio.to_thread(student_session, user_id)
+    if not session_id:
+        manager.disconnect_student(user_id, websocket)
         await websocket.close(); return
 
-    user.is_online, user.status, user.last_seen = True, UserStatus.ONLINE, datetime.utcnow()
-    db.commit()
-    await manager.broadcast_to_admins(str(user.session_id), {"type": "student_update", "user_id": user_id, "status": "online"})
+    if presence.connected(user_id, session_id):
+        dashboard.student_changed(session_id, user_id, status="online")
 
     try:
         while True:
-            data = await websocket.receive_json()
+            try:
+                data = await receive_message(websocket)
+            except ValueError:
+                # Испорченный кадр пропускаем: из-за одного сообщения сессия не обрывается
+                continue
             msg_type = data.get("type")
-            user.last_seen = datetime.utcnow()
-            if msg_type == "code_update":
-                await manager.send_to_admins_viewing_student(str(user.session_id), user_id, {"type": "live_code_update", "user_id": user_id, "code": data.get("code")})
+            presence.seen(user_id, active=msg_type != "ping")
+            if msg_type in ("code_snapshot", "code_update"):
+                # code_update - старый формат полного буфера без версии
+                try:
+                    buffer = live_code.snapshot(user_id, data.get("code"), data.get("version", 0))
+                except LiveCodeError:
+                    continue
+                manager.publish_live_code(session_id, user_id, buffer)
+                timeline.record(session_id, user_id, buffer)
+                speculative_grader.code_changed(user_id, session_id, buffer.code)
+            elif msg_type == "code_delta":
+                try:
+                    buffer = live_code.apply(user_id, data.get("base"), data.get("ops"))
+                except LiveCodeError:
+                    if live_code.request_resync(user_id):
+                        await manager.send_personal_message({"type": "code_resync"}, websocket)
+                    continue
+                manager.publish_live_code(session_id, user_id, buffer, data["ops"])
+                timeline.record(session_id, user_id, buffer, data["ops"])
+                speculative_grader.code_changed(user_id, session_id, buffer.code)
             elif msg_type == "status_update":
-                user.status = data.get("status")
-                db.commit()
-                await manager.broadcast_to_admins(str(user.session_id), {"type": "student_update", "user_id": user_id, "status": user.status})
+                if presence.set_status(user_id, data.get("status")):
+                    dashboard.student_changed(session_id, user_id, status=data.get("status"))
     except WebSocketDisconnect:
-        manager.disconnect_student(user_id)
-        user.is_online, user.status = False, UserStatus.OFFLINE
-        db.commit()
-        await manager.broadcast_to_admins(str(user.session_id), {"type": "student_update", "user_id": user_id, "status": "offline"})
+        pass
+    finally:
+        # И при любой другой ошибке: сокет и его очередь отправки не должны остаться в менеджере,
+        # а студент - числиться онлайн
+        manager.disconnect_student(user_id, websocket)
+        speculative_grader.forget(user_id)
+        if presence.disconnected(user_id):
+            dashboard.student_changed(session_id, user_id, status="offline")
 
 @app.websocket("/ws/admin/{session_id}")
 async def websocket_admin(websocket: WebSocket, session_id: str):
     await manager.connect_admin(websocket, session_id)
     try:
+        await dashboard.attach(websocket, session_id)
         while True:
-            data = await websocket.receive_json()
-            if data.get("type") == "view_student":
+            try:
+                data = await receive_message(websocket)
+            except ValueError:
+                continue
+            if data.get("type") in ("view_student", "resync_student"):
                 manager.set_admin_viewing(websocket, data.get("student_id"))
+            elif data.get("type") == "dashboard_resync":
+                await dashboard.send_snapshot(websocket, session_id)
     except WebSocketDisconnect:
+        pass
+    finally:
+        # И при ошибке загрузки ростера: сокет не должен остаться в рассылках
         manager.disconnect_admin(websocket, session_id)
\ No newline at end of file
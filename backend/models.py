@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Integer, Float, JSON, Enum
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Integer, BigInteger, Float, JSON, Enum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -15,9 +15,11 @@ class UserStatus(str, enum.Enum):
 
 class SubmissionStatus(str, enum.Enum):
     PENDING = "pending"
+    QUEUED = "queued"
     RUNNING = "running"
     SUCCESS = "success"
     ERROR = "error"
+    CANCELLED = "cancelled"
 
 class Session(Base):
     __tablename__ = "sessions"
@@ -85,6 +87,18 @@ class Submission(Base):
     error_message = Column(Text, nullable=True)
     submitted_at = Column(DateTime, default=datetime.utcnow)
     execution_time = Column(Float, nullable=True)
+    cpu_time = Column(Float, nullable=True)
+    # Ресурсы всего процесса проверки (rusage и счетчики cgroup), а не только тест-кейсов
+    peak_memory = Column(BigInteger, nullable=True)
+    process_cpu_time = Column(Float, nullable=True)
+    throttled_time = Column(Float, nullable=True)
+    oom_killed = Column(Boolean, nullable=True)
+    fail_fast = Column(Boolean, nullable=True)
+
+    # Аренда проверки отдельным воркером: кто взял, до какого времени и с какой попытки
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
 
     user = relationship("User", back_populates="submissions")
     task = relationship("Task", back_populates="submissions")
\ No newline at end of file
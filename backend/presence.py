@@ -0,0 +1,211 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import Boolean, DateTime, String, cast, column, update, values
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.dashboard import dashboard
+from backend.models import User, UserStatus
+from backend.websocket_manager import manager
+
+
+class Presence:
+    __slots__ = ("user_id", "session_id", "status", "last_seen", "seen_at", "active_at", "connections")
+
+    def __init__(self, user_id: str, session_id: str):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.status = UserStatus.OFFLINE
+        self.last_seen = datetime.utcnow()
+        # seen_at - любое сообщение, включая ping; active_at - правки кода и смена статуса
+        self.seen_at = self.active_at = time.monotonic()
+        self.connections = 0
+
+    @property
+    def is_online(self) -> bool:
+        return self.status != UserStatus.OFFLINE
+
+
+class PresenceTable:
+    # Присутствие студентов (online, typing, afk, last_seen) живет в памяти процесса, к которому
+    # подключен сокет. В users изменения уходят одним UPDATE раз в flush_interval секунд.
+    # Сокет без сообщений дольше offline_seconds считается оборванным, без действий дольше
+    # afk_seconds - студент AFK. Запись удаляется, когда офлайн-статус сохранен в базе.
+
+    def __init__(
+        self,
+        on_change: Optional[Callable[[Presence], Awaitable[None]]] = None,
+        flush_interval: float = settings.PRESENCE_FLUSH_INTERVAL,
+        afk_seconds: float = settings.PRESENCE_AFK_SECONDS,
+        offline_seconds: float = settings.PRESENCE_OFFLINE_SECONDS,
+    ):
+        self.on_change = on_change
+        self.flush_interval = flush_interval
+        self.afk_seconds = afk_seconds
+        self.offline_seconds = offline_seconds
+        self._entries: Dict[str, Presence] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, user_id: str) -> Optional[Presence]:
+        return self._entries.get(user_id)
+
+    def connected(self, user_id: str, session_id: str) -> bool:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = self._entries[user_id] = Presence(user_id, session_id)
+        entry.connections += 1
+        self.seen(user_id, active=True)
+        return self._set(entry, UserStatus.ONLINE)
+
+    def seen(self, user_id: str, active: bool = False) -> None:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        entry.last_seen = datetime.utcnow()
+        entry.seen_at = time.monotonic()
+        if active:
+            entry.active_at = entry.seen_at
+        self._dirty.add(user_id)
+
+    def set_status(self, user_id: str, status: Any) -> bool:
+        entry = self._entries.get(user_id)
+        try:
+            status = UserStatus(status)
+        except ValueError:
+            return False
+        if entry is None or not entry.connections or status == UserStatus.OFFLINE:
+            return False
+        return self._set(entry, status)
+
+    def disconnected(self, user_id: str) -> bool:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False
+        entry.connections = max(entry.connections - 1, 0)
+        return not entry.connections and self._set(entry, UserStatus.OFFLINE)
+
+    def _set(self, entry: Presence, status: UserStatus) -> bool:
+        if entry.status == status:
+            return False
+        entry.status = status
+        self._dirty.add(entry.user_id)
+        return True
+
+    def reap(self, now: Optional[float] = None) -> List[Presence]:
+        now = time.monotonic() if now is None else now
+        changed = []
+        for entry in self._entries.values():
+            if entry.status == UserStatus.OFFLINE:
+                continue
+            if now - entry.seen_at > self.offline_seconds:
+                entry.connections = 0
+                self._set(entry, UserStatus.OFFLINE)
+                changed.append(entry)
+            elif entry.status in (UserStatus.ONLINE, UserStatus.TYPING) and now - entry.active_at > self.afk_seconds:
+                self._set(entry, UserStatus.AFK)
+                changed.append(entry)
+        return changed
+
+    def overlay(self, response: Any) -> Any:
+        # Ответы админских ручек берут присутствие из памяти, если студент подключен к этому процессу
+        entry = self._entries.get(str(response.id))
+        if entry is not None:
+            response.is_online, response.status, response.last_seen = entry.is_online, entry.status, entry.last_seen
+        return response
+
+    def status_of(self, user_id: str, default: Any = None) -> Any:
+        entry = self._entries.get(user_id)
+        return entry.status if entry is not None else default
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        user_ids, self._dirty = self._dirty, set()
+        rows = [self._row(self._entries[user_id]) for user_id in user_ids if user_id in self._entries]
+        try:
+            await asyncio.to_thread(write_presence, rows)
+        except Exception as e:
+            print(f"⚠️ Presence flush failed ({len(rows)} users): {e}")
+            self._dirty |= user_ids
+            return
+        for user_id in user_ids:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.status == UserStatus.OFFLINE and user_id not in self._dirty:
+                del self._entries[user_id]
+
+    @staticmethod
+    def _row(entry: Presence) -> Dict[str, Any]:
+        return {"id": entry.user_id, "status": entry.status.name, "is_online": entry.is_online, "last_seen": entry.last_seen}
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            for entry in self.reap():
+                await self._notify(entry)
+            await self.flush()
+
+    async def _notify(self, entry: Presence) -> None:
+        if self.on_change is None:
+            return
+        try:
+            await self.on_change(entry)
+        except Exception as e:
+            print(f"⚠️ Presence notification failed for {entry.user_id}: {e}")
+
+
+def write_presence(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    # UPDATE users ... FROM (VALUES ...): одна инструкция на всю пачку
+    data = values(
+        column("id", String), column("status", String), column("is_online", Boolean), column("last_seen", DateTime),
+        name="presence",
+    ).data([(row["id"], row["status"], row["is_online"], row["last_seen"]) for row in rows])
+    statement = (
+        update(User)
+        .where(User.id == cast(data.c.id, User.id.type))
+        .values(status=cast(data.c.status, User.status.type), is_online=data.c.is_online, last_seen=data.c.last_seen)
+    )
+    db = SessionLocal()
+    try:
+        db.execute(statement, execution_options={"synchronize_session": False})
+        db.commit()
+    finally:
+        db.close()
+
+
+def student_session(user_id: str) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        return str(user.session_id) if user else None
+    finally:
+        db.close()
+
+
+async def announce_presence(entry: Presence) -> None:
+    dashboard.student_changed(entry.session_id, entry.user_id, status=entry.status)
+    if entry.status == UserStatus.OFFLINE:
+        # Сокет молчит дольше таймаута: закрываем, цикл приема завершится сам
+        manager.close_student(entry.user_id)
+
+
+presence = PresenceTable(on_change=announce_presence)
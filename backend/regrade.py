@@ -0,0 +1,151 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import update
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.models import Task, AssignedTask, Submission, SubmissionStatus
+from backend.websocket_manager import manager
+from backend.code_executor import code_executor, grading_spec, RESOURCE_FIELDS
+
+
+def load_submissions(task_id: str) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        task = db.query(Task).filter(Task.id == task_id).first()
+        if not task:
+            return None
+        # Только завершенные проверки: отмененные (вытесненные) не оживляем, а ожидающие и идущие
+        # принадлежат очереди или воркеру с арендой
+        rows = (
+            db.query(Submission.id, Submission.code)
+            .filter(Submission.task_id == task_id, Submission.status.in_([SubmissionStatus.SUCCESS, SubmissionStatus.ERROR]))
+            .all()
+        )
+        return {"spec": grading_spec(task.spec, task.time_limit), "solutions": [{"id": row.id, "code": row.code} for row in rows]}
+    finally:
+        db.close()
+
+
+def store_batch(results: Dict[Any, Dict[str, Any]]) -> None:
+    db = SessionLocal()
+    try:
+        db.bulk_update_mappings(Submission, [
+            {
+                "id": submission_id,
+                "status": SubmissionStatus(result.get("status", "error")),
+                "test_results": result.get("test_results"),
+                "error_message": result.get("error_message"),
+                "execution_time": result.get("execution_time"),
+                "cpu_time": result.get("cpu_time"),
+                **{field: result.get(field) for field in RESOURCE_FIELDS},
+            }
+            for submission_id, result in results.items()
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def sync_assignments(task_id: str) -> None:
+    # Задача считается решенной, если после перепроверки у студента есть хотя бы одно успешное решение;
+    # вытесненные решения отменены и в подсчет не входят
+    db = SessionLocal()
+    try:
+        solved = db.query(Submission.user_id).filter(Submission.task_id == task_id, Submission.status == SubmissionStatus.SUCCESS).distinct()
+        db.execute(
+            update(AssignedTask)
+            .where(AssignedTask.task_id == task_id)
+            .values(is_completed=AssignedTask.user_id.in_(solved.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class RegradeJob:
+    def __init__(self, task_id: str, session_id: str):
+        self.task_id = task_id
+        self.session_id = session_id
+        self.total = 0
+        self.done = 0
+        # Решения, для которых песочница не вернула результат: их прежняя оценка не тронута
+        self.skipped = 0
+        self._last_report = 0.0
+
+    async def report(self, state: str, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_report < settings.REGRADE_PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        await manager.broadcast_to_admins(self.session_id, {
+            "type": "regrade_progress",
+            "task_id": self.task_id,
+            "state": state,
+            "done": self.done,
+            "total": self.total,
+            "skipped": self.skipped,
+        })
+
+    async def run(self) -> None:
+        loaded = await asyncio.to_thread(load_submissions, self.task_id)
+        if loaded is None:
+            return
+        solutions: List[Dict[str, Any]] = loaded["solutions"]
+        self.total = len(solutions)
+        started = time.monotonic()
+        await self.report("running", force=True)
+
+        size = max(settings.REGRADE_BATCH_SIZE, 1)
+        chunks = [solutions[i:i + size] for i in range(0, len(solutions), size)]
+        # Пачки идут параллельно, но занимают не больше половины пула контейнеров
+        limit = asyncio.Semaphore(max(settings.EXECUTION_POOL_MAX_SIZE // 2, 1))
+        pending_reports: List[asyncio.Task] = []
+
+        def on_result(solution_id: Any, result: Dict[str, Any]) -> None:
+            self.done += 1
+            pending_reports.append(asyncio.create_task(self.report("running")))
+
+        async def run_chunk(chunk: List[Dict[str, Any]]) -> None:
+            async with limit:
+                results = await code_executor.run_batch(self.task_id, loaded["spec"], chunk, on_result=on_result)
+            self.skipped += len(chunk) - len(results)
+            if results:
+                await asyncio.to_thread(store_batch, results)
+
+        try:
+            await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+            await asyncio.to_thread(sync_assignments, self.task_id)
+        except Exception as e:
+            print(f"❌ Regrade of task {self.task_id} failed: {e}")
+            await self.report("failed", force=True)
+            return
+        finally:
+            await asyncio.gather(*pending_reports, return_exceptions=True)
+
+        elapsed = time.monotonic() - started
+        rate = self.total / elapsed if elapsed > 0 else 0.0
+        print(f"♻️ Regraded {self.total - self.skipped} of {self.total} submissions of task {self.task_id} in {elapsed:.2f}s ({rate:.1f} submissions/s)")
+        await self.report("completed", force=True)
+
+
+_active_regrades: Dict[str, asyncio.Task] = {}
+
+
+async def regrade_task(task_id: str, session_id: str) -> None:
+    # Повторный запуск для той же задачи отменяет предыдущий: его результаты уже устарели
+    previous = _active_regrades.get(task_id)
+    if previous and not previous.done():
+        previous.cancel()
+    current = asyncio.create_task(RegradeJob(task_id, session_id).run())
+    _active_regrades[task_id] = current
+    try:
+        await current
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if _active_regrades.get(task_id) is current:
+            del _active_regrades[task_id]
@@ -0,0 +1,62 @@
+import resource
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Учет ресурсов одной проверки. Пиковая память и CPU берутся из rusage процесса с решением,
+# троттлинг и OOM - из счетчиков cgroup контейнера (разница до и после прогона).
+# Вне контейнера счетчиков cgroup может не быть, тогда эти поля остаются пустыми.
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _read_keyed(path: Path) -> Dict[str, int]:
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return {}
+    values = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 2 and parts[1].isdigit():
+            values[parts[0]] = int(parts[1])
+    return values
+
+
+def cgroup_counters(root: Optional[Path] = None) -> Dict[str, int]:
+    root = root or CGROUP_ROOT
+    counters = {}
+    # cgroup v2: единая иерархия, время в микросекундах
+    cpu = _read_keyed(root / "cpu.stat")
+    if "throttled_usec" in cpu:
+        counters["throttled_usec"] = cpu["throttled_usec"]
+    else:
+        # cgroup v1: время в наносекундах
+        throttled = _read_keyed(root / "cpu" / "cpu.stat").get("throttled_time")
+        if throttled is not None:
+            counters["throttled_usec"] = throttled // 1000
+    oom = _read_keyed(root / "memory.events").get("oom_kill")
+    if oom is None:
+        oom = _read_keyed(root / "memory" / "memory.oom_control").get("oom_kill")
+    if oom is not None:
+        counters["oom_kill"] = oom
+    return counters
+
+
+def measure(usage: Any, before: Dict[str, int], after: Dict[str, int]) -> Dict[str, Any]:
+    # usage - struct_rusage процесса (os.wait4 или resource.getrusage), ru_maxrss в Linux в килобайтах
+    throttled = None
+    if "throttled_usec" in before and "throttled_usec" in after:
+        throttled = (after["throttled_usec"] - before["throttled_usec"]) / 1_000_000
+    oom_killed = None
+    if "oom_kill" in before and "oom_kill" in after:
+        oom_killed = after["oom_kill"] > before["oom_kill"]
+    return {
+        "peak_memory": usage.ru_maxrss * 1024,
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "throttled_time": throttled,
+        "oom_killed": oom_killed,
+    }
+
+
+def self_usage(before: Dict[str, int]) -> Dict[str, Any]:
+    return measure(resource.getrusage(resource.RUSAGE_SELF), before, cgroup_counters())
@@ -0,0 +1,149 @@
+import ast
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from backend.config import settings
+
+# Ошибки инфраструктуры не зависят от кода студента, такие результаты не кешируем
+LOAD_DEPENDENT_CASE_ERRORS = ("Too slow", "Running time grows")
+UNCACHEABLE_ERRORS = ("System Error", "Docker not available", "No output from grader", "Time limit exceeded", "CPU time limit exceeded", "Solution was killed", "Out of memory")
+
+
+def normalize_source(code: str) -> str:
+    try:
+        return ast.dump(ast.parse(code), annotate_fields=False)
+    except (SyntaxError, ValueError):
+        return code
+
+
+def cache_key(code: str, task_id: str, spec: Dict[str, Any]) -> str:
+    digest = hashlib.sha256()
+    digest.update(task_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(spec, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_source(code).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    error = result.get("error_message") or ""
+    if error.startswith(UNCACHEABLE_ERRORS):
+        return False
+    # Таймаут и провал по бюджету времени зависят от нагрузки на машину, при повторной отправке решение может уложиться
+    return not any(
+        case.get("status") == "timeout" or (case.get("error") or "").startswith(LOAD_DEPENDENT_CASE_ERRORS)
+        for case in result.get("test_results") or []
+    )
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = settings.RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._entry_task: Dict[str, str] = {}
+        self._task_keys: Dict[str, Set[str]] = {}
+        self._generations: Dict[str, int] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def lookup(self, code: str, task_id: str, spec: Dict[str, Any]) -> Dict[str, Any] | None:
+        cached = self.get(cache_key(code, task_id, spec))
+        if cached is None:
+            return None
+        self.hits += 1
+        return {**cached, "cached": True}
+
+    def put(self, key: str, task_id: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            self._entry_task[key] = task_id
+            self._task_keys.setdefault(task_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget(old_key)
+
+    def _forget(self, key: str) -> None:
+        task_id = self._entry_task.pop(key, None)
+        keys = self._task_keys.get(task_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._task_keys[task_id]
+
+    def invalidate_task(self, task_id: str) -> None:
+        with self._lock:
+            self._generations[task_id] = self._generations.get(task_id, 0) + 1
+            for key in self._task_keys.pop(task_id, set()):
+                self._entries.pop(key, None)
+                self._entry_task.pop(key, None)
+
+    async def get_or_run(
+        self,
+        code: str,
+        task_id: str,
+        spec: Dict[str, Any],
+        runner: Callable[[str, str, Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        key = cache_key(code, task_id, spec)
+
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return {**cached, "cached": True}
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            try:
+                result = await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                # Отменили чужой прогон, а не нас: запускаем проверку сами
+                if in_flight.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+            self.hits += 1
+            return {**result, "cached": True}
+
+        self.misses += 1
+        generation = self._generations.get(task_id, 0)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await runner(code, task_id, spec)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим, гасим предупреждение "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if is_cacheable(result) and self._generations.get(task_id, 0) == generation:
+                self.put(key, task_id, result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+
+result_cache = ResultCache()
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from sqlalchemy.pool import Pool, QueuePool
+
+# Метрики процесса API для нагрузочных прогонов (GET /api/admin/stats/runtime): задержка цикла
+# событий и ожидание соединения из пула базы. Хранятся последние значения, считаются перцентили.
+# Каждый процесс uvicorn считает свои метрики.
+
+
+class Samples:
+    def __init__(self, size: int = 20000):
+        self.values: deque = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.values.append(value)
+        self.count += 1
+
+    def reset(self) -> None:
+        self.values.clear()
+        self.count = 0
+
+    def summary(self) -> Dict[str, Any]:
+        # Миллисекунды; перцентили по последним size значениям
+        values = sorted(self.values)
+        if not values:
+            return {"count": self.count, "p50_ms": None, "p99_ms": None, "max_ms": None}
+        def pick(q: float) -> float:
+            return round(values[min(int(q * len(values)), len(values) - 1)] * 1000, 3)
+        return {"count": self.count, "p50_ms": pick(0.5), "p99_ms": pick(0.99), "max_ms": round(values[-1] * 1000, 3)}
+
+
+pool_waits = Samples()
+
+
+class TimedQueuePool(QueuePool):
+    # Сколько поток ждал соединение, включая открытие нового, если пул еще не заполнен
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_waits.add(time.perf_counter() - started)
+
+
+class RuntimeStats:
+    def __init__(self, probe_interval: float = 0.05):
+        self.probe_interval = probe_interval
+        self.loop_lag = Samples()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _probe(self) -> None:
+        # Насколько позже запланированного просыпается sleep: столько ждал бы любой колбэк в цикле
+        while True:
+            expected = time.monotonic() + self.probe_interval
+            await asyncio.sleep(self.probe_interval)
+            self.loop_lag.add(max(time.monotonic() - expected, 0.0))
+
+    def reset(self) -> None:
+        self.loop_lag.reset()
+        pool_waits.reset()
+
+    def summary(self, pool: Pool) -> Dict[str, Any]:
+        stats = {"event_loop_lag": self.loop_lag.summary(), "db_pool_wait": pool_waits.summary()}
+        if isinstance(pool, QueuePool):
+            stats["db_pool"] = {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+        return stats
+
+
+runtime_stats = RuntimeStats()
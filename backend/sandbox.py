@@ -0,0 +1,265 @@
+import asyncio
+import ctypes
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.config import settings
+from backend.grader import CaseCallback, partial_result, planned_cases, process_limit
+from backend.resource_usage import self_usage
+
+MAX_RESULT_BYTES = 16 * 1024 * 1024
+
+# Переменные окружения, которые видит решение; остальное (SECRET_KEY, пароль базы) процесс API не передает
+SANDBOX_ENV = ("PATH", "LANG", "LC_ALL")
+
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+
+class SandboxError(Exception):
+    pass
+
+
+class SandboxBackend:
+    # Бэкенд возвращает "сырой" результат grade_solution, а инфраструктурные сбои сообщает через SandboxError
+    name = "base"
+
+    async def start(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def run(self, code: str, task_id: str, spec: Dict[str, Any], on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
+        # on_case вызывается в цикле событий для каждого кейса по мере его завершения
+        raise NotImplementedError
+
+    async def run_batch(
+        self,
+        task_id: str,
+        spec: Dict[str, Any],
+        solutions: List[Dict[str, Any]],
+        on_record: Optional[Callable[[Any, Dict[str, Any]], None]] = None,
+    ) -> Dict[Any, Dict[str, Any]]:
+        limit = asyncio.Semaphore(max(settings.REGRADE_PARALLELISM, 1))
+        results: Dict[Any, Dict[str, Any]] = {}
+
+        async def grade(item: Dict[str, Any]) -> None:
+            async with limit:
+                try:
+                    results[item["id"]] = await self.run(item["code"], task_id, spec)
+                except SandboxError as e:
+                    # Сбой инфраструктуры ничего не говорит о решении: записи нет, прежняя оценка остается
+                    print(f"⚠️ Batch grading of {item['id']} failed: {e}")
+                    return
+            if on_record:
+                on_record(item["id"], results[item["id"]])
+
+        await asyncio.gather(*(grade(item) for item in solutions))
+        return results
+
+
+def parse_size(value: str) -> int:
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def _isolate_network(required: bool) -> None:
+    # Новый сетевой namespace без интерфейсов, кроме выключенного lo.
+    # Без прав root пробуем через user namespace.
+    libc = ctypes.CDLL(None, use_errno=True)
+    for flags in (CLONE_NEWNET, CLONE_NEWUSER | CLONE_NEWNET):
+        if libc.unshare(flags) == 0:
+            return
+    if required:
+        raise SandboxError(f"Cannot isolate network: {os.strerror(ctypes.get_errno())}")
+
+
+def _apply_rlimits(limits: Dict[str, int], spec: Dict[str, Any]) -> None:
+    cpu = limits["cpu_seconds"]
+    processes = process_limit(spec, limits["max_processes"])
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (limits["address_space"], limits["address_space"]))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (limits["file_size"], limits["file_size"]))
+    resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+
+
+def _sandbox_main(conn: Any, work_dir: str, code: str, task_id: str, spec: Dict[str, Any], limits: Dict[str, Any]) -> None:
+    # Выполняется в дочернем процессе forkserver: память процесса API не наследует,
+    # а окружение наследует, поэтому чистим его до того, как появится код студента
+    def send(message: Dict[str, Any]) -> None:
+        conn.send_bytes(json.dumps(message).encode("utf-8"))
+
+    try:
+        from backend.grader import grade_solution
+
+        kept = {name: os.environ[name] for name in SANDBOX_ENV if name in os.environ}
+        os.environ.clear()
+        os.environ.update(kept)
+        os.chdir(work_dir)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        _isolate_network(limits["require_netns"])
+
+        solution_path = Path(work_dir) / "solution.py"
+        solution_path.write_text(code, encoding="utf-8")
+        _apply_rlimits(limits, spec)
+
+        # Кейсы отправляются по мере готовности, чтобы при срыве дедлайна родитель знал, что успело пройти
+        result = grade_solution(solution_path, task_id, spec, on_case=lambda case: send({"case": case}))
+    except SandboxError as e:
+        result = {"sandbox_error": str(e)}
+    except (Exception, SystemExit) as e:
+        result = {"error": f"Grader failed: {str(e)}", "traceback": traceback.format_exc()}
+    # Процесс проверки делит cgroup с API, поэтому здесь учитываем только его собственный rusage
+    send({"result": result, "usage": self_usage({})})
+    conn.close()
+
+
+class StubSandbox(SandboxBackend):
+    # Для нагрузочных прогонов (scripts/load_simulator.py): код не выполняется, каждый кейс
+    # "проходит" за case_delay секунд. Нагружает очередь, базу и рассылки без затрат на песочницу.
+    name = "stub"
+
+    def __init__(self, case_delay: float = settings.EXECUTION_STUB_CASE_DELAY):
+        self.case_delay = case_delay
+
+    async def run(self, code: str, task_id: str, spec: Dict[str, Any], on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        cases = []
+        for planned in planned_cases(spec):
+            await asyncio.sleep(self.case_delay)
+            case = {**planned, "status": "passed", "time": self.case_delay}
+            cases.append(case)
+            if on_case:
+                on_case(case)
+        wall_time = time.perf_counter() - started
+        return {
+            "task_id": task_id,
+            "summary": {"passed": len(cases), "total": len(cases)},
+            "cases": cases,
+            "timing": {"total": {"wall_time": wall_time, "cpu_time": 0.0}},
+        }
+
+
+class LocalSandbox(SandboxBackend):
+    name = "local"
+
+    def __init__(
+        self,
+        cpu_seconds: int = settings.EXECUTION_TIMEOUT,
+        address_space: str = settings.LOCAL_SANDBOX_ADDRESS_SPACE,
+        file_size: str = settings.LOCAL_SANDBOX_MAX_FILE_SIZE,
+        max_processes: int = settings.LOCAL_SANDBOX_MAX_PROCESSES,
+        require_netns: bool = settings.LOCAL_SANDBOX_REQUIRE_NETNS,
+        wall_timeout: float = settings.EXECUTION_TIMEOUT,
+    ):
+        self.limits = {
+            "cpu_seconds": cpu_seconds,
+            "address_space": parse_size(address_space),
+            "file_size": parse_size(file_size),
+            "max_processes": max_processes,
+            "require_netns": require_netns,
+        }
+        # Дедлайн всего прогона тот же, что у Docker-бэкенда: EXECUTION_TIMEOUT на проверку целиком
+        self.wall_timeout = wall_timeout
+        # forkserver заранее импортирует грейдер, поэтому запуск проверки стоит одного fork
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._ctx.set_forkserver_preload(["backend.grader", "backend.sandbox"])
+
+    async def run(self, code: str, task_id: str, spec: Dict[str, Any], on_case: Optional[CaseCallback] = None) -> Dict[str, Any]:
+        relay = None
+        if on_case:
+            loop = asyncio.get_running_loop()
+            relay = lambda case: loop.call_soon_threadsafe(on_case, case)
+        handle: Dict[str, Any] = {}
+        try:
+            return await asyncio.to_thread(self._run_sync, code, task_id, spec, relay, handle)
+        except asyncio.CancelledError:
+            # Поток не прервать, поэтому убиваем сам процесс, иначе вытесненная проверка дожигает CPU до дедлайна
+            handle["cancelled"] = True
+            if "proc" in handle:
+                handle["proc"].kill()
+            raise
+
+    def _run_sync(
+        self,
+        code: str,
+        task_id: str,
+        spec: Dict[str, Any],
+        on_case: Optional[CaseCallback] = None,
+        handle: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        cases: List[Dict[str, Any]] = []
+        with tempfile.TemporaryDirectory(prefix="code-spirit-") as work_dir:
+            parent_conn, child_conn = self._ctx.Pipe(duplex=False)
+            proc = self._ctx.Process(
+                target=_sandbox_main,
+                args=(child_conn, work_dir, code, task_id, spec, self.limits),
+                daemon=True,
+            )
+            proc.start()
+            child_conn.close()
+            if handle is not None:
+                handle["proc"] = proc
+                if handle.get("cancelled"):
+                    proc.kill()
+            deadline = time.monotonic() + self.wall_timeout
+            try:
+                while True:
+                    if not parent_conn.poll(max(deadline - time.monotonic(), 0)):
+                        # Дедлайн всего прогона: убиваем процесс сразу, кейсы без ответа считаем timeout
+                        proc.kill()
+                        return partial_result(task_id, spec, cases, f"Time limit exceeded ({self.wall_timeout}s)")
+                    message = self._decode(parent_conn.recv_bytes(MAX_RESULT_BYTES))
+                    if "case" in message:
+                        cases.append(message["case"])
+                        if on_case:
+                            on_case(message["case"])
+                        continue
+                    result = {**(message.get("result") or {}), "usage": message.get("usage")}
+                    break
+            except (EOFError, OSError):
+                proc.join(1)
+                if proc.exitcode is not None and proc.exitcode < 0:
+                    return partial_result(task_id, spec, cases, self._exit_reason(proc.exitcode))
+                raise SandboxError(self._exit_reason(proc.exitcode))
+            finally:
+                if proc.is_alive():
+                    proc.kill()
+                proc.join(1)
+                parent_conn.close()
+
+        if "sandbox_error" in result:
+            raise SandboxError(f"System Error: {result['sandbox_error']}")
+        return result
+
+    @staticmethod
+    def _decode(payload: bytes) -> Dict[str, Any]:
+        try:
+            return json.loads(payload)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise SandboxError("Malformed grader output")
+
+    @staticmethod
+    def _exit_reason(exitcode: Optional[int]) -> str:
+        if exitcode is not None and exitcode < 0:
+            sig = -exitcode
+            if sig == signal.SIGXCPU:
+                return "CPU time limit exceeded"
+            if sig == signal.SIGKILL:
+                return "Solution was killed"
+            return f"Solution terminated by signal {signal.Signals(sig).name}"
+        return "No output from grader"
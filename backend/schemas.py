@@ -54,6 +54,7 @@ class SessionResponse(BaseModel):
 class SubmissionCreate(BaseModel):
     task_id: str
     code: str
+    fail_fast: Optional[bool] = None
 
 class SubmissionResponse(BaseModel):
     id: UUID4
@@ -63,6 +64,12 @@ class SubmissionResponse(BaseModel):
     test_results: Optional[List[Dict]] = None
     error_message: Optional[str] = None
     submitted_at: datetime
+    execution_time: Optional[float] = None
+    cpu_time: Optional[float] = None
+    peak_memory: Optional[int] = None
+    process_cpu_time: Optional[float] = None
+    throttled_time: Optional[float] = None
+    oom_killed: Optional[bool] = None
     
     class Config:
         from_attributes = True
@@ -71,12 +78,22 @@ class StudentDetail(UserResponse):
     current_task: Optional[TaskResponse] = None
     last_submission: Optional[SubmissionResponse] = None
 
+class GradingEvent(BaseModel):
+    type: str
+    submission_id: str
+    user_id: str
+    session_id: Optional[str] = None
+    case: Optional[Dict[str, Any]] = None
+    done: Optional[int] = None
+    total: Optional[int] = None
+
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     difficulty: Optional[str] = None
     time_limit: Optional[int] = None
     template: Optional[str] = None
+    spec: Optional[Dict] = None
     test_cases: Optional[List[TestCase]] = None
 
 class ManualAssignRequest(BaseModel):
@@ -0,0 +1,90 @@
+import ast
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.models import AssignedTask, Task
+from backend.code_executor import grading_spec
+from backend.grading_queue import GradingJob, GradingQueue, grading_queue
+from backend.result_cache import result_cache
+
+
+def current_task(user_id: str) -> Optional[Tuple[str, Dict]]:
+    db = SessionLocal()
+    try:
+        assignment = db.query(AssignedTask).filter(AssignedTask.user_id == user_id, AssignedTask.is_completed == False).first()
+        task = db.query(Task).filter(Task.id == assignment.task_id).first() if assignment else None
+        # Как у отправки из редактора, где fail_fast по умолчанию выключен: иначе кеш не совпадет
+        return (task.id, grading_spec(task.spec, task.time_limit, fail_fast=False)) if task else None
+    finally:
+        db.close()
+
+
+class SpeculativeGrader:
+    # Когда студент перестает печатать, а код разбирается без ошибок, проверяем последний снимок
+    # в свободных воркерах. Результат попадает только в кеш: если студент отправит этот же код,
+    # submit ответит сразу. Приоритет и лимиты на сессию обеспечивает GradingQueue.
+
+    def __init__(
+        self,
+        queue: GradingQueue,
+        enabled: bool = settings.SPECULATIVE_GRADING and settings.GRADING_MODE == "inline",
+        idle_seconds: float = settings.SPECULATIVE_IDLE_SECONDS,
+    ):
+        self.queue = queue
+        self.enabled = enabled
+        self.idle_seconds = idle_seconds
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # Ссылки на запущенные проверки: задачу без ссылки сборщик мусора может удалить посреди работы
+        self._tasks: Set[asyncio.Task] = set()
+
+    def code_changed(self, user_id: str, session_id: str, code: Optional[str]) -> None:
+        if not self.enabled or not code:
+            return
+        self.forget(user_id)
+        self._timers[user_id] = asyncio.get_running_loop().call_later(self.idle_seconds, self._start, user_id, session_id, code)
+
+    def _start(self, user_id: str, session_id: str, code: str) -> None:
+        task = asyncio.get_running_loop().create_task(self._speculate(user_id, session_id, code))
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"⚠️ Speculative grading failed: {task.exception()}")
+
+    def forget(self, user_id: str) -> None:
+        timer = self._timers.pop(user_id, None)
+        if timer:
+            timer.cancel()
+
+    async def stop(self) -> None:
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _speculate(self, user_id: str, session_id: str, code: str) -> None:
+        self._timers.pop(user_id, None)
+        try:
+            ast.parse(code)
+        except (SyntaxError, ValueError):
+            return
+        try:
+            task = await asyncio.to_thread(current_task, user_id)
+        except Exception as e:
+            print(f"⚠️ Speculative grading skipped for {user_id}: {e}")
+            return
+        if not task:
+            return
+        task_id, spec = task
+        if result_cache.lookup(code, task_id, spec) is not None:
+            return
+        self.queue.submit_speculative(GradingJob(None, user_id, task_id, code, spec, session_id, speculative=True))
+
+
+speculative_grader = SpeculativeGrader(grading_queue)
@@ -0,0 +1,147 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional
+
+import msgpack
+
+from backend.config import settings
+from backend.live_code import LiveBuffer, LiveCodeError, apply_ops
+
+# Журнал правок live-кода для воспроизведения после занятия: по файлу на сессию, только дописывание.
+# Файл - последовательность блоков: заголовок (длина сжатых данных, число событий, время первого
+# и последнего события) и zlib-сжатый MessagePack-список событий [время, студент, версия, "s", код]
+# для снимка или [время, студент, версия, "d", правки] для дельты. Блок пишется одним write
+# в файл с O_APPEND, так что процессы API одного узла пишут в общий файл, не перемешивая блоки.
+# Читатель отображает файл в память и пропускает оборванный хвост и испорченные блоки.
+
+BLOCK_HEADER = struct.Struct("<IIdd")
+SNAPSHOT, DELTA = "s", "d"
+
+
+def append_block(path: str, events: List[List[Any]]) -> None:
+    data = zlib.compress(msgpack.packb(events), 6)
+    block = BLOCK_HEADER.pack(len(data), len(events), events[0][0], events[-1][0]) + data
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, block)
+    finally:
+        os.close(fd)
+
+
+def read_events(path: str, user_id: Optional[str] = None, until: Optional[float] = None) -> List[List[Any]]:
+    try:
+        if os.path.getsize(path) == 0:
+            return []
+    except FileNotFoundError:
+        return []
+    events: List[List[Any]] = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offset = 0
+        while offset + BLOCK_HEADER.size <= len(data):
+            size, _, first, _ = BLOCK_HEADER.unpack_from(data, offset)
+            start, offset = offset + BLOCK_HEADER.size, offset + BLOCK_HEADER.size + size
+            if offset > len(data):
+                break
+            # Блоки разных процессов идут не строго по времени, поэтому пропускаем, а не останавливаемся
+            if until is not None and first > until:
+                continue
+            try:
+                block = msgpack.unpackb(zlib.decompress(data[start:offset]))
+            except (zlib.error, ValueError) as e:
+                print(f"⚠️ Skipping damaged timeline block in {path}: {e}")
+                continue
+            events.extend(event for event in block if (user_id is None or event[1] == user_id) and (until is None or event[0] <= until))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def replay(events: List[List[Any]]) -> List[Dict[str, Any]]:
+    # Оставляет события, которые складываются в цепочку версий. Дельты после потерянного блока
+    # отбрасываются до следующего снимка (клиент присылает его раз в 100 правок)
+    frames: List[Dict[str, Any]] = []
+    code: Optional[str] = None
+    version: Optional[int] = None
+    for t, _, event_version, kind, payload in events:
+        if kind == SNAPSHOT:
+            code, version = payload, event_version
+            frames.append({"t": t, "version": version, "code": code})
+            continue
+        if code is None or event_version != version + 1:
+            code = None
+            continue
+        try:
+            code = apply_ops(code, payload)
+        except LiveCodeError:
+            code = None
+            continue
+        version = event_version
+        frames.append({"t": t, "version": version, "ops": payload})
+    return frames
+
+
+class TimelineLog:
+    # Правки копятся в памяти и раз в flush_interval секунд уходят в файлы сессий одним блоком
+    # на сессию. Блок, который не удалось записать, теряется: воспроизведение продолжится
+    # со следующего снимка. Пустой directory отключает журнал.
+
+    def __init__(self, directory: str = settings.TIMELINE_DIR, flush_interval: float = settings.TIMELINE_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, List[List[Any]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def path(self, session_id: str) -> str:
+        # Имя файла только из UUID сессии
+        return os.path.join(self.directory, f"{uuid.UUID(str(session_id))}.timeline")
+
+    def record(self, session_id: str, user_id: str, buffer: LiveBuffer, ops: Optional[List[Dict[str, Any]]] = None) -> None:
+        if not self.directory:
+            return
+        event = [time.time(), user_id, buffer.version, SNAPSHOT, buffer.code] if ops is None else [time.time(), user_id, buffer.version, DELTA, ops]
+        self._pending.setdefault(session_id, []).append(event)
+
+    def read(self, session_id: str, user_id: str, until: Optional[float] = None) -> List[Dict[str, Any]]:
+        if not self.directory:
+            return []
+        return replay(read_events(self.path(session_id), user_id, until))
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write, pending)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Timeline write failed ({sum(map(len, pending.values()))} events): {e}")
+
+    def _write(self, pending: Dict[str, List[List[Any]]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for session_id, events in pending.items():
+            append_block(self.path(session_id), events)
+
+    async def start(self) -> None:
+        if self._task is None and self.directory:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+timeline = TimelineLog()
@@ -1,64 +1,268 @@
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket
-import json
 import asyncio
-from datetime import datetime
+
+from backend.backplane import Backplane, create_backplane
+from backend.config import settings
+from backend.live_code import LiveBuffer, LiveCodeError, LiveCodeFeed, LiveCodeStore, live_code
+from backend.wire import Frame, accept
+
+
+class Connection:
+    # У каждого сокета своя ограниченная очередь и свой писатель: медленный клиент не задерживает
+    # остальных. Переполнение очереди или ошибка отправки отключают клиента, фронтенд переподключится.
+
+    def __init__(self, websocket: WebSocket, on_evict: Callable[[WebSocket], None], max_queue: int, codec: Optional[str] = None):
+        self.websocket = websocket
+        self.codec = codec
+        self.on_evict = on_evict
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.writer = asyncio.get_running_loop().create_task(self._write())
+
+    def send(self, frame: Frame) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame.encoded(self.codec))
+        except asyncio.QueueFull:
+            self.evict("send queue overflow")
+            return False
+        return True
+
+    async def _write(self):
+        try:
+            while True:
+                data = await self.queue.get()
+                if isinstance(data, bytes):
+                    await self.websocket.send_bytes(data)
+                else:
+                    await self.websocket.send_text(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.evict(f"send failed: {e}")
+
+    def evict(self, reason: str):
+        if self.closed:
+            return
+        print(f"⚠️ Dropping websocket client ({reason})")
+        self.close()
+        self.on_evict(self.websocket)
+        # Закрываем сокет, чтобы цикл приема в обработчике завершился через WebSocketDisconnect
+        asyncio.get_running_loop().create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close(code=1013)
+        except Exception:
+            pass
+
+    def close(self):
+        self.closed = True
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
 
 class ConnectionManager:
-    def __init__(self):
+    # Сокеты локальны для процесса. Рассылки сначала доставляются своим сокетам, затем уходят
+    # в шину (backplane), откуда их доставляют своим сокетам остальные процессы API.
+
+    def __init__(self, max_queue: int = settings.WEBSOCKET_SEND_QUEUE_SIZE, backplane: Optional[Backplane] = None, store: LiveCodeStore = live_code):
+        self.max_queue = max_queue
+        self.backplane = backplane or create_backplane()
+        self.live_code = store
         self.active_connections: Dict[str, WebSocket] = {}
-        self.admin_connections: Dict[str, List[WebSocket]] = {}
+        self.admin_connections: Dict[str, Set[WebSocket]] = {}
         self.admin_viewing: Dict[WebSocket, str] = {}
+        self.live_feeds: Dict[WebSocket, LiveCodeFeed] = {}
+        # Обратный индекс (сессия, студент) -> сокеты админов, которые его смотрят
+        self.viewers: Dict[Tuple[str, str], Set[WebSocket]] = {}
+        self._admin_sessions: Dict[WebSocket, str] = {}
+        self._student_ids: Dict[WebSocket, str] = {}
+        self._connections: Dict[WebSocket, Connection] = {}
+        # Обработчики событий шины, которые ведут другие модули (op -> обработчик)
+        self.handlers: Dict[str, Callable[[dict], None]] = {}
+
+    async def start(self):
+        await self.backplane.start(self._on_event)
+
+    async def stop(self):
+        await self.backplane.stop()
+
+    def _on_event(self, event: dict):
+        op = event.get("op")
+        if op == "student":
+            self._send_local_student(event["user_id"], Frame(event["message"]))
+        elif op == "admins":
+            self._send_local(self.admin_connections.get(event["session_id"]), Frame(event["message"]))
+        elif op == "viewers":
+            self._send_local(self.viewers.get((event["session_id"], event["student_id"])), Frame(event["message"]))
+        elif op == "live":
+            self._mirror_live_code(event)
+        elif op == "live_resync":
+            self._resync_live_code(event["session_id"], event["student_id"])
+        elif op in self.handlers:
+            self.handlers[op](event)
+
+    async def _register(self, websocket: WebSocket):
+        codec = await accept(websocket)
+        self._connections[websocket] = Connection(websocket, self._forget, self.max_queue, codec)
 
     async def connect_student(self, websocket: WebSocket, user_id: str):
-        await websocket.accept()
+        await self._register(websocket)
         self.active_connections[user_id] = websocket
+        self._student_ids[websocket] = user_id
         print(f"🔌 Student connected: {user_id}")
 
-    def disconnect_student(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    def disconnect_student(self, user_id: str, websocket: Optional[WebSocket] = None):
+        websocket = websocket or self.active_connections.get(user_id)
+        if websocket is not None:
+            self._forget(websocket)
             print(f"🔌 Student disconnected: {user_id}")
 
+    def close_student(self, user_id: str):
+        connection = self._connections.get(self.active_connections.get(user_id))
+        if connection:
+            connection.evict("idle timeout")
+
     async def connect_admin(self, websocket: WebSocket, session_id: str):
-        await websocket.accept()
-        if session_id not in self.admin_connections:
-            self.admin_connections[session_id] = []
-        self.admin_connections[session_id].append(websocket)
+        await self._register(websocket)
+        self.admin_connections.setdefault(session_id, set()).add(websocket)
+        self._admin_sessions[websocket] = session_id
+        self.live_feeds[websocket] = LiveCodeFeed(lambda message: self.send_personal_message(message, websocket), self.live_code)
         print(f"👑 Admin connected to session: {session_id}")
 
-    def disconnect_admin(self, websocket: WebSocket, session_id: str):
-        if session_id in self.admin_connections:
-            if websocket in self.admin_connections[session_id]:
-                self.admin_connections[session_id].remove(websocket)
+    def disconnect_admin(self, websocket: WebSocket, session_id: Optional[str] = None):
+        self._forget(websocket)
+
+    def _forget(self, websocket: WebSocket):
+        # Идемпотентно: вызывается и при штатном отключении, и при вытеснении медленного клиента
+        connection = self._connections.pop(websocket, None)
+        if connection:
+            connection.close()
+        user_id = self._student_ids.pop(websocket, None)
+        # Студент мог уже переподключиться новым сокетом, его не трогаем
+        if user_id is not None and self.active_connections.get(user_id) is websocket:
+            del self.active_connections[user_id]
+        session_id = self._admin_sessions.pop(websocket, None)
+        if session_id is not None:
+            admins = self.admin_connections.get(session_id)
+            if admins is not None:
+                admins.discard(websocket)
+                if not admins:
+                    del self.admin_connections[session_id]
+            self._stop_viewing(websocket, session_id)
+            feed = self.live_feeds.pop(websocket, None)
+            if feed:
+                feed.close()
 
-        if websocket in self.admin_viewing:
-            del self.admin_viewing[websocket]
+    def _stop_viewing(self, websocket: WebSocket, session_id: str):
+        student_id = self.admin_viewing.pop(websocket, None)
+        if student_id is None:
+            return
+        key = (session_id, student_id)
+        viewers = self.viewers.get(key)
+        if viewers is not None:
+            viewers.discard(websocket)
+            if not viewers:
+                del self.viewers[key]
 
     def set_admin_viewing(self, websocket: WebSocket, student_id: str):
+        session_id = self._admin_sessions.get(websocket)
+        if session_id is None:
+            return
+        self._stop_viewing(websocket, session_id)
         self.admin_viewing[websocket] = student_id
+        self.viewers.setdefault((session_id, student_id), set()).add(websocket)
+        # Новый зритель начинает со снимка текущего буфера; если студент подключен к другому
+        # процессу и копии буфера здесь нет, просим его процесс разослать снимок
+        if self.live_code.get(student_id) is not None:
+            self.live_feeds[websocket].push(student_id)
+        elif student_id not in self.active_connections:
+            self.backplane.publish({"op": "live_resync", "session_id": session_id, "student_id": student_id})
+        else:
+            # Буфер подключенного студента вытеснен из кэша: просим у него снимок
+            self._resync_live_code(session_id, student_id)
+
+    def _send_frame(self, websocket: WebSocket, frame: Frame):
+        connection = self._connections.get(websocket)
+        if connection:
+            connection.send(frame)
+
+    def _send_local(self, sockets: Optional[Set[WebSocket]], frame: Frame):
+        # Сериализуем один раз на формат, а не на каждый сокет
+        for connection in list(sockets or ()):
+            self._send_frame(connection, frame)
+
+    def _send_local_student(self, user_id: str, frame: Frame):
+        websocket = self.active_connections.get(user_id)
+        if websocket is not None:
+            self._send_frame(websocket, frame)
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        try:
-            await websocket.send_json(message)
-        except Exception as e:
-            print(f"Error sending message: {e}")
+        # Только ставит сообщение в очередь сокета, сеть не ждет
+        self._send_frame(websocket, Frame(message))
+
+    async def send_to_student(self, user_id: str, message: dict):
+        self._send_local_student(user_id, Frame(message))
+        self.backplane.publish({"op": "student", "user_id": user_id, "message": message})
 
     async def broadcast_to_admins(self, session_id: str, message: dict):
         if session_id in self.admin_connections:
-            for connection in self.admin_connections[session_id][:]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    pass
+            self._send_local(self.admin_connections[session_id], Frame(message))
+        self.backplane.publish({"op": "admins", "session_id": session_id, "message": message})
+
+    def send_to_local_admins(self, session_id: str, message: dict):
+        # Без шины: кадр собирается в каждом процессе из его собственного состояния
+        self._send_local(self.admin_connections.get(session_id), Frame(message))
 
     async def send_to_admins_viewing_student(self, session_id: str, student_id: str, message: dict):
-        if session_id in self.admin_connections:
-            for connection in self.admin_connections[session_id]:
-                if self.admin_viewing.get(connection) == student_id:
-                    try:
-                        await connection.send_json(message)
-                    except Exception:
-                        pass
-
-manager = ConnectionManager()
\ No newline at end of file
+        if (session_id, student_id) in self.viewers:
+            self._send_local(self.viewers[(session_id, student_id)], Frame(message))
+        self.backplane.publish({"op": "viewers", "session_id": session_id, "student_id": student_id, "message": message})
+
+    def publish_live_code(self, session_id: str, student_id: str, buffer: LiveBuffer, ops: Optional[List[dict]] = None):
+        # Не ждет сети: кадры уходят из LiveCodeFeed каждого зрителя
+        self._push_live_code(session_id, student_id, buffer, ops)
+        event = {"op": "live", "session_id": session_id, "student_id": student_id, "version": buffer.version}
+        if ops is None:
+            event["code"] = buffer.code
+        else:
+            event["ops"] = ops
+        self.backplane.publish(event)
+
+    def _push_live_code(self, session_id: str, student_id: str, buffer: LiveBuffer, ops: Optional[List[dict]]):
+        for connection in self.viewers.get((session_id, student_id), ()):
+            self.live_feeds[connection].push(student_id, buffer, ops)
+
+    def _mirror_live_code(self, event: dict):
+        # Копию чужого буфера ведем, только пока его смотрят наши админы
+        session_id, student_id = event["session_id"], event["student_id"]
+        if (session_id, student_id) not in self.viewers:
+            if student_id not in self.active_connections:
+                self.live_code.forget(student_id)
+            return
+        ops = event.get("ops")
+        if ops is None:
+            buffer = self.live_code.snapshot(student_id, event["code"], event["version"])
+        else:
+            try:
+                buffer = self.live_code.apply(student_id, event["version"] - 1, ops)
+            except LiveCodeError:
+                if self.live_code.request_resync(student_id):
+                    self.backplane.publish({"op": "live_resync", "session_id": session_id, "student_id": student_id})
+                return
+        self._push_live_code(session_id, student_id, buffer, ops)
+
+    def _resync_live_code(self, session_id: str, student_id: str):
+        # Отвечает процесс, к которому подключен студент: у него канонический буфер
+        if student_id not in self.active_connections:
+            return
+        buffer = self.live_code.get(student_id)
+        if buffer is not None:
+            self.backplane.publish({"op": "live", "session_id": session_id, "student_id": student_id, "version": buffer.version, "code": buffer.code})
+        elif self.live_code.request_resync(student_id):
+            self._send_local_student(student_id, Frame({"type": "code_resync"}))
+
+manager = ConnectionManager()
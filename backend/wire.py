@@ -0,0 +1,65 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Union
+from uuid import UUID
+
+import msgpack
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+
+# Формат кадров вебсокета выбирается при рукопожатии через Sec-WebSocket-Protocol:
+# клиент предлагает ["msgpack", "json"], сервер берет первый знакомый. Клиенты без подпротокола
+# получают JSON, как раньше. Принимаем оба формата независимо от выбора: бинарный кадр - MessagePack.
+
+SUBPROTOCOLS = ("msgpack", "json")
+
+
+def _msgpack_default(value: Any) -> Any:
+    # Те же правила, что у orjson: даты в ISO 8601, UUID и Decimal строкой
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"Type is not msgpack serializable: {type(value).__name__}")
+
+
+def encode(message: Dict[str, Any], codec: Optional[str]) -> Union[str, bytes]:
+    if codec == "msgpack":
+        return msgpack.packb(message, default=_msgpack_default)
+    return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def decode(frame: Union[str, bytes]) -> Any:
+    if isinstance(frame, bytes):
+        return msgpack.unpackb(frame)
+    return orjson.loads(frame)
+
+
+class Frame:
+    # Сообщение для рассылки: сериализуется не больше одного раза на каждый формат
+    __slots__ = ("message", "_encoded")
+
+    def __init__(self, message: Dict[str, Any]):
+        self.message = message
+        self._encoded: Dict[Optional[str], Union[str, bytes]] = {}
+
+    def encoded(self, codec: Optional[str]) -> Union[str, bytes]:
+        data = self._encoded.get(codec)
+        if data is None:
+            data = self._encoded[codec] = encode(self.message, codec)
+        return data
+
+
+async def accept(websocket: WebSocket) -> Optional[str]:
+    offered = websocket.scope.get("subprotocols") or []
+    codec = next((name for name in SUBPROTOCOLS if name in offered), None)
+    await websocket.accept(subprotocol=codec)
+    return codec
+
+
+async def receive_message(websocket: WebSocket) -> Dict[str, Any]:
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    data = decode(message["bytes"] if message.get("bytes") is not None else message["text"])
+    return data if isinstance(data, dict) else {}
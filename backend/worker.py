@@ -0,0 +1,251 @@
+import asyncio
+import signal
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+from sqlalchemy import and_, or_
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.models import User, Task, Submission, SubmissionStatus
+from backend.code_executor import code_executor, grading_spec
+from backend.grader import planned_cases
+from backend.grading_queue import GradingJob, store_result
+from backend.result_cache import result_cache
+
+# Отдельный процесс проверки: забирает решения из Postgres через FOR UPDATE SKIP LOCKED,
+# гоняет их через CodeExecutor своего хоста, пишет результат в БД и сообщает API, чтобы тот
+# разослал его по WebSocket. Запуск: python -m backend.worker (при GRADING_MODE=worker).
+
+
+def claim_jobs(worker_id: str, limit: int) -> Tuple[List[GradingJob], List[Dict[str, Any]]]:
+    # Берем новые решения и те, чья аренда истекла (воркер упал или завис).
+    # Решения, исчерпавшие попытки, закрываем ошибкой, чтобы они не крутились бесконечно.
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        rows = (
+            db.query(Submission)
+            .filter(or_(
+                Submission.status.in_((SubmissionStatus.PENDING, SubmissionStatus.QUEUED)),
+                and_(Submission.status == SubmissionStatus.RUNNING, Submission.lease_expires_at < now),
+            ))
+            .order_by(Submission.submitted_at)
+            .with_for_update(skip_locked=True)
+            .limit(limit)
+            .all()
+        )
+
+        claimed: List[Submission] = []
+        abandoned: List[Dict[str, Any]] = []
+        for submission in rows:
+            if submission.attempts >= settings.WORKER_MAX_ATTEMPTS:
+                submission.status = SubmissionStatus.ERROR
+                submission.error_message = f"System Error: grading was abandoned after {submission.attempts} attempts"
+                submission.lease_expires_at = None
+                abandoned.append({"submission_id": str(submission.id), "user_id": str(submission.user_id)})
+                continue
+            submission.status = SubmissionStatus.RUNNING
+            submission.worker_id = worker_id
+            submission.attempts += 1
+            submission.lease_expires_at = now + timedelta(seconds=settings.WORKER_LEASE_SECONDS)
+            claimed.append(submission)
+        db.commit()
+
+        jobs = []
+        for submission in claimed:
+            task = db.query(Task).filter(Task.id == submission.task_id).first()
+            user = db.query(User).filter(User.id == submission.user_id).first()
+            if not task:
+                store_result(submission.id, {"status": "error", "error_message": "Task not found"}, lease_owner=worker_id)
+                continue
+            spec = grading_spec(task.spec, task.time_limit, submission.fail_fast)
+            session_id = str(user.session_id) if user else None
+            jobs.append(GradingJob(str(submission.id), str(submission.user_id), task.id, submission.code, spec, session_id))
+        return jobs, abandoned
+    finally:
+        db.close()
+
+
+def extend_leases(worker_id: str, submission_ids: List[str]) -> Set[str]:
+    # Продлеваем аренду своих проверок и узнаем, какие из них у нас уже перехватили
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Submission)
+            .filter(Submission.id.in_(submission_ids), Submission.worker_id == worker_id, Submission.status == SubmissionStatus.RUNNING)
+            .all()
+        )
+        expires = datetime.utcnow() + timedelta(seconds=settings.WORKER_LEASE_SECONDS)
+        for submission in rows:
+            submission.lease_expires_at = expires
+        db.commit()
+        return {str(submission.id) for submission in rows}
+    finally:
+        db.close()
+
+
+def release_jobs(worker_id: str, submission_ids: List[str]) -> None:
+    # При штатной остановке возвращаем незаконченные проверки в очередь без штрафной попытки
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Submission)
+            .filter(Submission.id.in_(submission_ids), Submission.worker_id == worker_id, Submission.status == SubmissionStatus.RUNNING)
+            .all()
+        )
+        for submission in rows:
+            submission.status = SubmissionStatus.QUEUED
+            submission.worker_id = None
+            submission.lease_expires_at = None
+            submission.attempts = max(submission.attempts - 1, 0)
+        db.commit()
+    finally:
+        db.close()
+
+
+class ApiNotifier:
+    # События уходят в API по порядку одной фоновой задачей, проверка их не ждет
+    def __init__(self, base_url: str = settings.WORKER_API_URL, token: str = settings.WORKER_TOKEN):
+        self.url = base_url.rstrip("/") + "/api/internal/grading-events"
+        self.token = token
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._sender: Optional[asyncio.Task] = None
+
+    def send(self, event: Dict[str, Any]) -> None:
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_all())
+        self._queue.put_nowait(event)
+
+    async def close(self) -> None:
+        if self._sender:
+            self._queue.put_nowait(None)
+            await self._sender
+            self._sender = None
+
+    async def _send_all(self) -> None:
+        async with httpx.AsyncClient(timeout=5.0, headers={"X-Worker-Token": self.token}) as client:
+            while True:
+                event = await self._queue.get()
+                if event is None:
+                    return
+                try:
+                    response = await client.post(self.url, json=event)
+                    response.raise_for_status()
+                except httpx.HTTPError as e:
+                    # Результат уже в БД: клиент без уведомления заберет его опросом
+                    print(f"⚠️ Failed to notify API about {event.get('submission_id')}: {e}")
+
+
+class GradingWorker:
+    def __init__(self, worker_id: Optional[str] = None, concurrency: int = settings.WORKER_CONCURRENCY, notifier: Optional[ApiNotifier] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.concurrency = max(concurrency, 1)
+        self.notifier = notifier or ApiNotifier()
+        self.active: Dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        print(f"👷 Grading worker {self.worker_id} started (concurrency {self.concurrency})")
+        await code_executor.start()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not self._stopping.is_set():
+                claimed = 0
+                free = self.concurrency - len(self.active)
+                if free > 0:
+                    jobs, abandoned = await asyncio.to_thread(claim_jobs, self.worker_id, free)
+                    for item in abandoned:
+                        self.notifier.send({"type": "finished", **item})
+                    for job in jobs:
+                        self.active[job.submission_id] = asyncio.create_task(self._process(job))
+                    claimed = len(jobs)
+                # Пока есть работа и свободные слоты, забираем следующую пачку без паузы
+                if claimed == 0 or len(self.active) >= self.concurrency:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), timeout=settings.WORKER_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            heartbeat.cancel()
+            await self._shutdown()
+
+    async def _shutdown(self) -> None:
+        in_flight = list(self.active.values())
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        if self.active:
+            await asyncio.to_thread(release_jobs, self.worker_id, list(self.active))
+        await self.notifier.close()
+        await code_executor.shutdown()
+        print(f"👷 Grading worker {self.worker_id} stopped")
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WORKER_HEARTBEAT_INTERVAL)
+            if not self.active:
+                continue
+            try:
+                owned = await asyncio.to_thread(extend_leases, self.worker_id, list(self.active))
+            except Exception as e:
+                print(f"⚠️ Heartbeat failed: {e}")
+                continue
+            # Аренду перехватил другой воркер или решение вытеснено новым: результат все равно не запишется, освобождаем слот
+            for submission_id in set(self.active) - owned:
+                self.active.pop(submission_id).cancel()
+
+    async def _process(self, job: GradingJob) -> None:
+        total = len(planned_cases(job.spec))
+        done = 0
+
+        def on_case(case: Dict[str, Any]) -> None:
+            nonlocal done
+            done += 1
+            self.notifier.send({
+                "type": "progress",
+                "submission_id": job.submission_id,
+                "user_id": job.user_id,
+                "session_id": job.session_id,
+                "case": case,
+                "done": done,
+                "total": total,
+            })
+
+        async def run_with_progress(code: str, task_id: str, spec: Dict) -> Dict[str, Any]:
+            return await code_executor.run_code(code, task_id, spec, on_case=on_case)
+
+        try:
+            result = await result_cache.get_or_run(job.code, job.task_id, job.spec, run_with_progress)
+            stored = await asyncio.to_thread(store_result, job.submission_id, result, self.worker_id)
+            if stored:
+                self.notifier.send({"type": "finished", "submission_id": job.submission_id, "user_id": job.user_id})
+            self.active.pop(job.submission_id, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Аренду не трогаем: по истечении ее подберет этот или другой воркер
+            print(f"❌ Grading of {job.submission_id} failed: {e}")
+            self.active.pop(job.submission_id, None)
+
+
+async def main() -> None:
+    worker = GradingWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+if __name__ == "__main__":
+    if settings.GRADING_MODE != "worker":
+        print("GRADING_MODE is not 'worker': the API grades submissions itself, refusing to start a competing worker.", file=sys.stderr)
+        sys.exit(2)
+    asyncio.run(main())
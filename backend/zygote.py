@@ -0,0 +1,131 @@
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+# Зигот worker-контейнера: долгоживущий процесс, который один раз импортирует грейдер,
+# читает задания построчно (JSON) из stdin и на каждое делает fork. Ребенок получает
+# свои rlimits, проверяет одно решение и завершается. Записи кейсов и итог уходят в stdout
+# с id задания, print() студента - в /dev/null. К итогу добавляется учет ресурсов ребенка ("usage").
+from backend.grader import grade_solution, process_limit
+from backend.resource_usage import cgroup_counters, measure
+
+Emit = Callable[[Dict[str, Any]], None]
+
+
+def _apply_limits(limits: Dict[str, int], spec: Dict[str, Any]) -> None:
+    cpu = limits["cpu_seconds"]
+    processes = process_limit(spec, limits["max_processes"])
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (limits["file_size"], limits["file_size"]))
+    resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+
+
+def _exit_reason(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        if sig == signal.SIGXCPU:
+            return "CPU time limit exceeded"
+        if sig == signal.SIGKILL:
+            return "Solution was killed"
+        return f"Solution terminated by signal {signal.Signals(sig).name}"
+    return "No output from grader"
+
+
+def _child(job: Dict[str, Any], write_fd: int) -> None:
+    out = os.fdopen(write_fd, "wb", buffering=0)
+
+    def send(message: Dict[str, Any]) -> None:
+        out.write(json.dumps(message).encode("utf-8") + b"\n")
+
+    try:
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        work_dir = Path(tempfile.mkdtemp(prefix="job-"))
+        os.chdir(work_dir)
+        solution_path = work_dir / "solution.py"
+        solution_path.write_text(job["code"], encoding="utf-8")
+        _apply_limits(job["limits"], job["spec"])
+
+        result = grade_solution(solution_path, job["task_id"], job["spec"], on_case=lambda case: send({"case": case}))
+    except (Exception, SystemExit) as e:
+        result = {"error": f"Grader failed: {str(e)}", "traceback": traceback.format_exc()}
+    send({"result": result})
+
+
+def run_job(job: Dict[str, Any], emit: Emit) -> None:
+    counters = cgroup_counters()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            _child(job, write_fd)
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+
+    timeout = job["timeout"]
+    deadline = time.monotonic() + timeout
+    reason: Optional[str] = None
+    final: Optional[Dict[str, Any]] = None
+    buffer = b""
+    with os.fdopen(read_fd, "rb", buffering=0) as pipe:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([pipe], [], [], remaining)[0]:
+                # Дедлайн убивает только ребенка: контейнер и зигот остаются пригодны для следующей проверки
+                os.kill(pid, signal.SIGKILL)
+                reason = f"Time limit exceeded ({timeout}s)"
+                break
+            chunk = pipe.read(65536)
+            if not chunk:
+                break
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "result" in message:
+                    # Итог отправляем после wait4, когда известны ресурсы ребенка
+                    final = message
+                else:
+                    emit(message)
+
+    _, status, rusage = os.wait4(pid, 0)
+    usage = measure(rusage, counters, cgroup_counters())
+    if final is None:
+        if usage["oom_killed"] and reason is None:
+            reason = "Out of memory"
+        final = {"killed": reason or _exit_reason(status)}
+    emit({**final, "usage": usage})
+
+
+def serve(jobs: BinaryIO, out: BinaryIO) -> None:
+    for line in jobs:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+        def emit(message: Dict[str, Any], job_id: Any = job.get("id")) -> None:
+            out.write(json.dumps({"id": job_id, **message}).encode("utf-8") + b"\n")
+            out.flush()
+
+        run_job(job, emit)
+
+
+if __name__ == "__main__":
+    serve(sys.stdin.buffer, sys.stdout.buffer)
@@ -1,8 +1,8 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { QRCodeSVG } from 'qrcode.react';
 import { api } from '../utils/api';
-import { useWebSocket } from '../hooks/useWebSocket';
+import { useWebSocket, acceptDashboardFrame } from '../hooks/useWebSocket';
 import { Users, Share2, Play, LogOut, Copy, Check, Settings } from 'lucide-react';
 import StudentCard from './StudentCard';
 import TasksManager from './TasksManager';
@@ -15,6 +15,9 @@ const AdminDashboard = () => {
   const [copied, setCopied] = useState(false);
   const [assigning, setAssigning] = useState(false);
   const [showTaskManager, setShowTaskManager] = useState(false);
+  // Номер последнего примененного кадра панели; null - ждем снимок
+  const dashboardSeqRef = useRef(null);
+  const sendMessageRef = useRef(null);
 
   const token = localStorage.getItem('admin_token');
   const joinUrl = `${window.location.origin}/register?session_id=${sessionId}`;
@@ -40,25 +43,28 @@ const AdminDashboard = () => {
   }, [fetchStudents, token, navigate]);
 
   const handleWsMessage = useCallback((data) => {
-    if (data.type === 'student_update') {
-      setStudents(prev => {
-        const index = prev.findIndex(s => s.id === data.user_id);
-        if (index === -1) {
-          fetchStudents();
-          return prev;
-        }
-        const newStudents = [...prev];
-        newStudents[index] = {
-          ...newStudents[index],
-          status: data.status,
-          is_online: data.status !== 'offline',
-        };
-        return newStudents;
-      });
+    if (data.type !== 'dashboard_snapshot' && data.type !== 'dashboard_delta') return;
+    if (!acceptDashboardFrame(dashboardSeqRef, data, sendMessageRef.current)) return;
+    if (data.type === 'dashboard_snapshot') {
+      setStudents(data.students);
+      setLoading(false);
+      return;
     }
-  }, [fetchStudents]);
+    // Один кадр за тик - одна перерисовка, сколько бы студентов ни изменилось
+    setStudents(prev => {
+      const changes = new Map(data.students.map(s => [s.id, s]));
+      const next = prev.map(s => (changes.has(s.id) ? { ...s, ...changes.get(s.id) } : s));
+      const known = new Set(prev.map(s => s.id));
+      // Новые студенты приходят полной строкой
+      data.students.forEach(s => {
+        if (!known.has(s.id) && s.name) next.push(s);
+      });
+      return next;
+    });
+  }, []);
 
-  useWebSocket(`/ws/admin/${sessionId}`, handleWsMessage);
+  const { sendMessage } = useWebSocket(`/ws/admin/${sessionId}`, handleWsMessage);
+  sendMessageRef.current = sendMessage;
 
   const handleAssignTasks = async () => {
     setAssigning(true);
@@ -1,9 +1,27 @@
-import React from 'react';
+import React, { useCallback } from 'react';
 import CodeMirror from '@uiw/react-codemirror';
 import { python } from '@codemirror/lang-python';
 import { tokyoNight } from '@uiw/codemirror-theme-tokyo-night';
 
+// Переводит изменения CodeMirror в правки {p, d, i}, которые применяются по очереди:
+// позиция fromB уже учитывает предыдущие правки той же транзакции
+const changeOps = (changes) => {
+  const ops = [];
+  changes.iterChanges((fromA, toA, fromB, toB, inserted) => {
+    const op = { p: fromB };
+    if (toA > fromA) op.d = toA - fromA;
+    if (inserted.length) op.i = inserted.toString();
+    ops.push(op);
+  });
+  return ops;
+};
+
 const CodeEditor = ({ code, onChange, readOnly = false }) => {
+  const handleChange = useCallback(
+    (value, viewUpdate) => onChange(value, changeOps(viewUpdate.changes)),
+    [onChange]
+  );
+
   return (
     <div className="h-full w-full overflow-hidden bg-[#1a1b26] text-sm">
       <CodeMirror
@@ -11,7 +29,7 @@ const CodeEditor = ({ code, onChange, readOnly = false }) => {
         height="100%"
         theme={tokyoNight}
         extensions={[python()]}
-        onChange={onChange}
+        onChange={handleChange}
         readOnly={readOnly}
         basicSetup={{
           lineNumbers: true,
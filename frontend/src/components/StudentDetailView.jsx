@@ -1,8 +1,8 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef, useMemo } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { api } from '../utils/api';
-import { useWebSocket } from '../hooks/useWebSocket';
-import { ArrowLeft, Terminal, Wifi } from 'lucide-react';
+import { useWebSocket, applyCodeOps, acceptDashboardFrame } from '../hooks/useWebSocket';
+import { ArrowLeft, Terminal, Wifi, History } from 'lucide-react';
 import CodeEditor from './CodeEditor';
 import TestResults from './TestResults';
 
@@ -14,6 +14,13 @@ const StudentDetailView = () => {
   const [liveCode, setLiveCode] = useState('');
   const [tasks, setTasks] = useState([]);
   const [sessionId, setSessionId] = useState(null);
+  // Версия live-буфера; null, пока не пришел снимок или после пропуска дельты
+  const liveVersionRef = useRef(null);
+  const sendMessageRef = useRef(null);
+  const dashboardSeqRef = useRef(null);
+  // Воспроизведение набора из журнала правок: null - показываем live-буфер
+  const [timelineFrames, setTimelineFrames] = useState(null);
+  const [timelinePosition, setTimelinePosition] = useState(0);
 
   const token = localStorage.getItem('admin_token');
 
@@ -40,20 +47,52 @@ const StudentDetailView = () => {
 
   const handleWsMessage = useCallback((data) => {
     if (data.type === 'live_code_update' && data.user_id === studentId) {
+      liveVersionRef.current = data.version ?? null;
       setLiveCode(data.code);
-    } else if (data.type === 'student_update' && data.user_id === studentId) {
+    } else if (data.type === 'live_code_delta' && data.user_id === studentId) {
+      if (liveVersionRef.current === data.base) {
+        liveVersionRef.current = data.version;
+        setLiveCode((prev) => applyCodeOps(prev, data.ops));
+      } else if (liveVersionRef.current !== null) {
+        // Пропустили дельту: просим у сервера канонический буфер
+        liveVersionRef.current = null;
+        sendMessageRef.current?.({ type: 'resync_student', student_id: studentId });
+      }
+    } else if (data.type === 'dashboard_snapshot' || data.type === 'dashboard_delta') {
+      if (!acceptDashboardFrame(dashboardSeqRef, data, sendMessageRef.current)) return;
+      const change = data.students.find(s => s.id === studentId);
+      if (!change) return;
       setStudent(prev => ({
         ...prev,
-        status: data.status,
-        is_online: data.status !== 'offline'
+        status: change.status ?? prev.status,
+        is_online: change.is_online ?? prev.is_online,
       }));
+      if (data.type === 'dashboard_delta' && change.submission_status) {
+        fetchStudentData();
+      }
+    } else if (data.type === 'submission_progress' && data.user_id === studentId) {
+      // Кейсы идущей проверки показываем по мере прихода, итог подтянет fetchStudentData
+      setStudent(prev => {
+        const current = prev.last_submission?.id === data.submission_id
+          ? prev.last_submission
+          : { id: data.submission_id, status: 'running', submitted_at: new Date().toISOString(), test_results: [] };
+        return {
+          ...prev,
+          last_submission: {
+            ...current,
+            test_results: [...(current.test_results || []), data.case],
+            progress: { done: data.done, total: data.total },
+          },
+        };
+      });
     }
-  }, [studentId]);
+  }, [studentId, fetchStudentData]);
 
   const { sendMessage } = useWebSocket(
     sessionId ? `/ws/admin/${sessionId}` : null, 
     handleWsMessage
   );
+  sendMessageRef.current = sendMessage;
 
   useEffect(() => {
     if (sessionId) {
@@ -67,6 +106,30 @@ const StudentDetailView = () => {
     }
   }, [sessionId, studentId, sendMessage]);
 
+  // Код на каждом кадре журнала: снимок задает буфер, дельта правит предыдущий
+  const timelineCodes = useMemo(() => {
+    if (!timelineFrames) return [];
+    const codes = [];
+    timelineFrames.forEach((frame, i) => {
+      codes.push(frame.code ?? applyCodeOps(codes[i - 1] ?? '', frame.ops));
+    });
+    return codes;
+  }, [timelineFrames]);
+
+  const toggleTimeline = async () => {
+    if (timelineFrames) {
+      setTimelineFrames(null);
+      return;
+    }
+    try {
+      const data = await api.getStudentTimeline(token, studentId);
+      setTimelineFrames(data.frames);
+      setTimelinePosition(Math.max(data.frames.length - 1, 0));
+    } catch (error) {
+      console.error('Error fetching timeline:', error);
+    }
+  };
+
   const handleManualAssign = async (taskId) => {
     if (!taskId) {
         if (!confirm('Выдать новую случайную задачу? Прогресс текущей будет сброшен.')) return;
@@ -132,18 +195,44 @@ const StudentDetailView = () => {
       <div className="flex-1 grid grid-cols-1 lg:grid-cols-3 overflow-hidden h-full">
         <div className="lg:col-span-2 h-full border-r border-slate-700 flex flex-col">
           <div className="bg-slate-900 px-4 py-2 text-xs text-slate-400 border-b border-slate-800 flex justify-between">
-            <span>LIVE PREVIEW (READ ONLY)</span>
-            {student.status === 'typing' && (
-              <span className="text-blue-400 animate-pulse">Typing...</span>
-            )}
+            <span>{timelineFrames ? 'HISTORY (READ ONLY)' : 'LIVE PREVIEW (READ ONLY)'}</span>
+            <div className="flex items-center gap-3">
+              {!timelineFrames && student.status === 'typing' && (
+                <span className="text-blue-400 animate-pulse">Typing...</span>
+              )}
+              <button onClick={toggleTimeline} className="flex items-center gap-1 hover:text-white transition-colors">
+                <History className="w-3 h-3" /> {timelineFrames ? 'Live' : 'История'}
+              </button>
+            </div>
           </div>
+          {timelineFrames && (
+            <div className="bg-slate-900 px-4 py-2 border-b border-slate-800 flex items-center gap-3 text-xs text-slate-400">
+              {timelineFrames.length ? (
+                <>
+                  <input
+                    type="range"
+                    min={0}
+                    max={timelineFrames.length - 1}
+                    value={timelinePosition}
+                    onChange={(e) => setTimelinePosition(Number(e.target.value))}
+                    className="flex-1"
+                  />
+                  <span className="font-mono">
+                    {new Date(timelineFrames[timelinePosition].t * 1000).toLocaleTimeString()}
+                  </span>
+                </>
+              ) : (
+                <span>Правок пока нет</span>
+              )}
+            </div>
+          )}
           <div className="flex-1 overflow-hidden relative">
             <CodeEditor 
-              code={liveCode} 
+              code={timelineFrames ? (timelineCodes[timelinePosition] ?? '') : liveCode} 
               readOnly={true} 
               onChange={() => {}}
             />
-            {!student.is_online && (
+            {!timelineFrames && !student.is_online && (
               <div className="absolute inset-0 bg-background/50 backdrop-blur-[1px] flex items-center justify-center z-10 pointer-events-none">
                 <div className="bg-surface border border-slate-600 px-4 py-2 rounded-lg shadow-xl flex items-center gap-2">
                   <Wifi className="w-4 h-4 text-slate-400" />
@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams } from 'react-router-dom';
 import { api } from '../utils/api';
-import { useWebSocket } from '../hooks/useWebSocket';
+import { useWebSocket, useLiveCode } from '../hooks/useWebSocket';
 import { Play, Loader2, Wifi, WifiOff } from 'lucide-react';
 import CodeEditor from './CodeEditor';
 import TaskDisplay from './TaskDisplay';
@@ -13,20 +13,66 @@ const StudentWorkspace = () => {
   const [code, setCode] = useState('');
   const [submission, setSubmission] = useState(null);
   const [isRunning, setIsRunning] = useState(false);
+  const [failFast, setFailFast] = useState(false);
   const [loading, setLoading] = useState(true);
 
   const typingTimeoutRef = useRef(null);
   const lastActivityRef = useRef(Date.now());
+  const pendingSubmissionRef = useRef(null);
+  const earlyResultsRef = useRef({});
+  const earlyProgressRef = useRef({});
+  // Код, который сервер уже знает; любое изменение мимо редактора уходит полным снимком
+  const syncedCodeRef = useRef(null);
+  const [resyncCount, setResyncCount] = useState(0);
+
+  const finishSubmission = useCallback((result) => {
+    pendingSubmissionRef.current = null;
+    setSubmission(result);
+    setIsRunning(false);
+  }, []);
 
   const handleWsMessage = useCallback((data) => {
     console.log('WS Message:', data);
-    if (data.type === 'task_assigned') {
+    if (data.type === 'code_resync') {
+      syncedCodeRef.current = null;
+      setResyncCount((count) => count + 1);
+    } else if (data.type === 'task_assigned') {
       setTask(data.task);
       setCode(data.task.template || '');
+    } else if (data.type === 'submission_result') {
+      if (data.submission.id === pendingSubmissionRef.current) {
+        finishSubmission(data.submission);
+      } else {
+        // Результат может прийти раньше, чем ответ на POST /submit
+        earlyResultsRef.current[data.submission.id] = data.submission;
+      }
+    } else if (data.type === 'submission_progress') {
+      if (data.submission_id === pendingSubmissionRef.current) {
+        setSubmission((prev) => ({
+          ...prev,
+          test_results: [...(prev?.test_results || []), data.case],
+          progress: { done: data.done, total: data.total },
+        }));
+      } else {
+        const early = earlyProgressRef.current[data.submission_id] || [];
+        earlyProgressRef.current[data.submission_id] = [...early, data.case];
+      }
     }
-  }, []);
+  }, [finishSubmission]);
 
   const { isConnected, sendMessage } = useWebSocket(`/ws/student/${userId}`, handleWsMessage);
+  const { sendChange, sendSnapshot } = useLiveCode(sendMessage);
+
+  useEffect(() => {
+    if (!isConnected) {
+      syncedCodeRef.current = null;
+      return;
+    }
+    if (code !== syncedCodeRef.current) {
+      syncedCodeRef.current = code;
+      sendSnapshot(code);
+    }
+  }, [code, isConnected, resyncCount, sendSnapshot]);
 
   useEffect(() => {
     const fetchTask = async () => {
@@ -46,15 +92,14 @@ const StudentWorkspace = () => {
     fetchTask();
   }, [userId]);
 
-  const handleCodeChange = useCallback((value) => {
+  const handleCodeChange = useCallback((value, ops) => {
+    if (syncedCodeRef.current !== null) {
+      syncedCodeRef.current = value;
+      sendChange(value, ops);
+    }
     setCode(value);
     lastActivityRef.current = Date.now();
 
-    sendMessage({
-      type: 'code_update',
-      code: value
-    });
-
     sendMessage({ type: 'status_update', status: 'typing' });
 
     if (typingTimeoutRef.current) clearTimeout(typingTimeoutRef.current);
@@ -62,7 +107,7 @@ const StudentWorkspace = () => {
     typingTimeoutRef.current = setTimeout(() => {
       sendMessage({ type: 'status_update', status: 'online' });
     }, 2000);
-  }, [sendMessage]);
+  }, [sendMessage, sendChange]);
 
   useEffect(() => {
     const afkInterval = setInterval(() => {
@@ -74,6 +119,26 @@ const StudentWorkspace = () => {
     return () => clearInterval(afkInterval);
   }, [sendMessage]);
 
+  // Если сокет отвалился, результат забираем опросом
+  useEffect(() => {
+    if (!isRunning || isConnected) return;
+
+    const pollInterval = setInterval(async () => {
+      const submissionId = pendingSubmissionRef.current;
+      if (!submissionId) return;
+      try {
+        const result = await api.getSubmission(submissionId);
+        if (!['pending', 'queued', 'running'].includes(result.status)) {
+          finishSubmission(result);
+        }
+      } catch (error) {
+        console.error('Failed to poll submission:', error);
+      }
+    }, 2000);
+
+    return () => clearInterval(pollInterval);
+  }, [isRunning, isConnected, finishSubmission]);
+
   const handleSubmit = async () => {
     if (!task) return;
     
@@ -81,15 +146,24 @@ const StudentWorkspace = () => {
     setSubmission({ status: 'running' });
 
     try {
-      const result = await api.submitSolution(userId, task.id, code);
-      setSubmission(result);
+      const result = await api.submitSolution(userId, task.id, code, failFast);
+      const earlyResult = earlyResultsRef.current[result.id];
+      const earlyCases = earlyProgressRef.current[result.id] || [];
+      earlyResultsRef.current = {};
+      earlyProgressRef.current = {};
+      if (!['pending', 'queued', 'running'].includes(result.status)) {
+        finishSubmission(result);
+      } else if (earlyResult) {
+        finishSubmission(earlyResult);
+      } else {
+        pendingSubmissionRef.current = result.id;
+        setSubmission({ ...result, test_results: earlyCases });
+      }
     } catch (error) {
-      setSubmission({
+      finishSubmission({
         status: 'error',
         error_message: error.message
       });
-    } finally {
-      setIsRunning(false);
     }
   };
 
@@ -117,20 +191,32 @@ const StudentWorkspace = () => {
           </div>
         </div>
 
-        <button
-          onClick={handleSubmit}
-          disabled={isRunning || !task}
-          className={`btn btn-primary flex items-center gap-2 ${
-            isRunning ? 'opacity-70 cursor-wait' : ''
-          }`}
-        >
-          {isRunning ? (
-            <Loader2 className="w-4 h-4 animate-spin" />
-          ) : (
-            <Play className="w-4 h-4 fill-current" />
-          )}
-          Запустить
-        </button>
+        <div className="flex items-center gap-4">
+          <label className="flex items-center gap-2 text-sm text-slate-400 cursor-pointer select-none">
+            <input
+              type="checkbox"
+              checked={failFast}
+              onChange={(e) => setFailFast(e.target.checked)}
+              className="accent-primary"
+            />
+            До первой ошибки
+          </label>
+
+          <button
+            onClick={handleSubmit}
+            disabled={isRunning || !task}
+            className={`btn btn-primary flex items-center gap-2 ${
+              isRunning ? 'opacity-70 cursor-wait' : ''
+            }`}
+          >
+            {isRunning ? (
+              <Loader2 className="w-4 h-4 animate-spin" />
+            ) : (
+              <Play className="w-4 h-4 fill-current" />
+            )}
+            Запустить
+          </button>
+        </div>
       </header>
 
       <div className="flex-1 grid grid-cols-12 overflow-hidden">
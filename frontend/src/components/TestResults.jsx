@@ -4,9 +4,11 @@ import { CheckCircle2, XCircle, AlertTriangle, Terminal } from 'lucide-react';
 const TestResults = ({ submission }) => {
   if (!submission) return null;
 
-  const { status, test_results, error_message, execution_time } = submission;
+  const { status, test_results, error_message, execution_time, peak_memory, progress } = submission;
   const isError = status === 'error';
   const isSuccess = status === 'success';
+  const isCancelled = status === 'cancelled';
+  const isRunning = status === 'pending' || status === 'queued' || status === 'running';
 
   return (
     <div className="bg-surface border-t border-slate-700 h-64 flex flex-col">
@@ -15,9 +17,17 @@ const TestResults = ({ submission }) => {
           <Terminal className="w-4 h-4 text-slate-400" />
           <span className="text-sm font-medium text-slate-300">Результаты выполнения</span>
         </div>
+        {status === 'queued' && (
+          <span className="text-xs text-slate-500">В очереди</span>
+        )}
+        {isRunning && progress && (
+          <span className="text-xs text-slate-500 font-mono">
+            {progress.done}/{progress.total}
+          </span>
+        )}
         {execution_time && (
           <span className="text-xs text-slate-500 font-mono">
-            {execution_time.toFixed(3)}s
+            {execution_time.toFixed(3)}s{peak_memory ? ` · ${(peak_memory / 1024 / 1024).toFixed(1)} MB` : ''}
           </span>
         )}
       </div>
@@ -31,11 +41,30 @@ const TestResults = ({ submission }) => {
             <pre className="whitespace-pre-wrap text-xs opacity-90">{error_message}</pre>
           </div>
         )}
+        {isCancelled && (
+          <div className="bg-slate-500/10 border border-slate-500/20 rounded-lg p-3 text-slate-400 mb-4">
+            <div className="flex items-center gap-2 font-bold">
+              <AlertTriangle className="w-4 h-4" />
+              Проверка отменена: отправлено более новое решение
+            </div>
+          </div>
+        )}
         {test_results && (
           <div className="space-y-2">
             {test_results?.map((test, idx) => {
               const isPassed = test.status === 'passed';
+              const isSkipped = test.status === 'skipped';
               
+              if (isSkipped) {
+                return (
+                  <div key={idx} className="flex items-center gap-3 p-3 rounded-lg border bg-slate-500/5 border-slate-500/20 text-slate-500">
+                    <AlertTriangle className="w-4 h-4" />
+                    <span className="font-bold">Тест #{idx + 1}</span>
+                    <span className="text-xs">Не запускался</span>
+                  </div>
+                );
+              }
+
               return (
                 <div 
                   key={idx}
@@ -58,9 +87,14 @@ const TestResults = ({ submission }) => {
                       <span className={`font-bold ${isPassed ? 'text-green-400' : 'text-red-400'}`}>
                         Тест #{idx + 1}
                       </span>
-                      {!isPassed && (
-                        <span className="text-xs text-red-400 bg-red-500/10 px-1.5 py-0.5 rounded">Failed</span>
-                      )}
+                      <div className="flex items-center gap-2">
+                        {test.wall_time !== undefined && (
+                          <span className="text-xs text-slate-500">{(test.wall_time * 1000).toFixed(1)}ms</span>
+                        )}
+                        {!isPassed && (
+                          <span className="text-xs text-red-400 bg-red-500/10 px-1.5 py-0.5 rounded">{test.status === 'timeout' ? 'Timeout' : 'Failed'}</span>
+                        )}
+                      </div>
                     </div>
                     
                     <div className="grid grid-cols-[auto,1fr] gap-x-4 gap-y-1 text-xs text-slate-400">
@@ -1,11 +1,69 @@
 import { useEffect, useRef, useState, useCallback } from 'react';
+import { encode, decode } from '../utils/msgpack';
 
 const RECONNECT_INTERVAL = 3000;
+// Формат кадров согласуется при рукопожатии; старый сервер без подпротоколов отвечает JSON
+const SUBPROTOCOLS = ['msgpack', 'json'];
+// Сервер считает сокет оборванным, если от клиента долго нет сообщений (PRESENCE_OFFLINE_SECONDS)
+const HEARTBEAT_INTERVAL = 25000;
+// Раз в столько правок вместо дельты отправляем полный снимок буфера
+const SNAPSHOT_EVERY = 100;
+
+// Правки {p, d, i} применяются по очереди; позиции в UTF-16, как у CodeMirror
+export const applyCodeOps = (code, ops) => ops.reduce(
+  (text, { p = 0, d = 0, i = '' }) => text.slice(0, p) + i + text.slice(p + d),
+  code
+);
+
+// Кадры dashboard_delta идут с seq подряд после dashboard_snapshot. Возвращает true, если кадр
+// можно применять; при пропуске кадра просит у сервера новый снимок и ждет его
+export const acceptDashboardFrame = (seqRef, data, sendMessage) => {
+  if (data.type === 'dashboard_snapshot') {
+    seqRef.current = data.seq;
+    return true;
+  }
+  if (seqRef.current !== null && data.seq === seqRef.current + 1) {
+    seqRef.current = data.seq;
+    return true;
+  }
+  if (seqRef.current !== null) {
+    seqRef.current = null;
+    sendMessage?.({ type: 'dashboard_resync' });
+  }
+  return false;
+};
+
+// Дельта-протокол live-кода: сервер хранит канонический буфер и применяет правки,
+// если их base совпадает с его версией, иначе просит снимок сообщением code_resync
+export const useLiveCode = (sendMessage) => {
+  const versionRef = useRef(0);
+  const sinceSnapshotRef = useRef(0);
+
+  const sendSnapshot = useCallback((code) => {
+    versionRef.current += 1;
+    sinceSnapshotRef.current = 0;
+    sendMessage({ type: 'code_snapshot', version: versionRef.current, code });
+  }, [sendMessage]);
+
+  const sendChange = useCallback((code, ops) => {
+    if (!ops?.length) return;
+    if (sinceSnapshotRef.current + 1 >= SNAPSHOT_EVERY) {
+      sendSnapshot(code);
+      return;
+    }
+    sinceSnapshotRef.current += 1;
+    sendMessage({ type: 'code_delta', base: versionRef.current, ops });
+    versionRef.current += 1;
+  }, [sendMessage, sendSnapshot]);
+
+  return { sendChange, sendSnapshot };
+};
 
 export const useWebSocket = (url, onMessage) => {
   const [isConnected, setIsConnected] = useState(false);
   const wsRef = useRef(null);
   const reconnectTimeoutRef = useRef(null);
+  const heartbeatRef = useRef(null);
 
   const connect = useCallback(() => {
     if (!url) {
@@ -20,16 +78,21 @@ export const useWebSocket = (url, onMessage) => {
     const wsUrl = `${protocol}//${host}${url}`;
 
     console.log('🔌 Connecting to WebSocket:', wsUrl);
-    const ws = new WebSocket(wsUrl);
+    const ws = new WebSocket(wsUrl, SUBPROTOCOLS);
+    ws.binaryType = 'arraybuffer';
 
     ws.onopen = () => {
       console.log('✅ WebSocket Connected');
       setIsConnected(true);
+      heartbeatRef.current = setInterval(() => {
+        ws.send(ws.protocol === 'msgpack' ? encode({ type: 'ping' }) : JSON.stringify({ type: 'ping' }));
+      }, HEARTBEAT_INTERVAL);
     };
 
     ws.onclose = () => {
       console.log('❌ WebSocket Disconnected');
       setIsConnected(false);
+      clearInterval(heartbeatRef.current);
       wsRef.current = null;
       
       reconnectTimeoutRef.current = setTimeout(() => {
@@ -45,7 +108,7 @@ export const useWebSocket = (url, onMessage) => {
 
     ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
+        const data = typeof event.data === 'string' ? JSON.parse(event.data) : decode(event.data);
         if (onMessage) {
           onMessage(data);
         }
@@ -76,7 +139,8 @@ export const useWebSocket = (url, onMessage) => {
 
   const sendMessage = useCallback((data) => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
-      wsRef.current.send(JSON.stringify(data));
+      const ws = wsRef.current;
+      ws.send(ws.protocol === 'msgpack' ? encode(data) : JSON.stringify(data));
     } else {
       console.warn('Cannot send message: WebSocket is not open');
     }
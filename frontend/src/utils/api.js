@@ -97,7 +97,7 @@ export const api = {
     }).then(handleResponse);
   },
 
-  submitSolution: async (userId, taskId, code) => {
+  submitSolution: async (userId, taskId, code, failFast = false) => {
     return fetch(`${API_BASE}/submit`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
@@ -105,12 +105,17 @@ export const api = {
         user_id: userId,
         submission: {
           task_id: taskId,
-          code: code
+          code: code,
+          fail_fast: failFast
         }
       }),
     }).then(handleResponse);
   },
 
+  getSubmission: async (submissionId) => {
+    return fetch(`${API_BASE}/submissions/${submissionId}`).then(handleResponse);
+  },
+
   // --- Admin ---
   getStudents: async (token) => {
     return fetch(`${API_BASE}/admin/students`, {
@@ -124,6 +129,12 @@ export const api = {
     }).then(handleResponse);
   },
 
+  getStudentTimeline: async (token, studentId) => {
+    return fetch(`${API_BASE}/admin/student/${studentId}/timeline`, {
+      headers: { 'Authorization': `Bearer ${token}` }
+    }).then(handleResponse);
+  },
+
   assignTasks: async (token) => {
     return fetch(`${API_BASE}/admin/tasks/assign`, {
       method: 'POST',
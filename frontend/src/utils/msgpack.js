@@ -0,0 +1,190 @@
+// Минимальный MessagePack для кадров вебсокета: null, bool, числа, строки, bin, массивы и объекты.
+// Этого достаточно для наших сообщений, отдельная зависимость не нужна.
+
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+class Writer {
+  constructor() {
+    this.buffer = new Uint8Array(256);
+    this.view = new DataView(this.buffer.buffer);
+    this.length = 0;
+  }
+
+  reserve(size) {
+    if (this.length + size <= this.buffer.length) return;
+    let capacity = this.buffer.length * 2;
+    while (capacity < this.length + size) capacity *= 2;
+    const next = new Uint8Array(capacity);
+    next.set(this.buffer.subarray(0, this.length));
+    this.buffer = next;
+    this.view = new DataView(next.buffer);
+  }
+
+  byte(value) {
+    this.reserve(1);
+    this.buffer[this.length++] = value;
+  }
+
+  header(type, size, value) {
+    this.reserve(1 + size);
+    this.buffer[this.length++] = type;
+    if (size === 1) this.view.setUint8(this.length, value);
+    else if (size === 2) this.view.setUint16(this.length, value);
+    else if (size === 4) this.view.setUint32(this.length, value);
+    this.length += size;
+  }
+
+  bytes(data) {
+    this.reserve(data.length);
+    this.buffer.set(data, this.length);
+    this.length += data.length;
+  }
+
+  number(value) {
+    if (Number.isInteger(value) && value >= 0 && value <= 0xffffffff) {
+      if (value < 0x80) this.byte(value);
+      else if (value < 0x100) this.header(0xcc, 1, value);
+      else if (value < 0x10000) this.header(0xcd, 2, value);
+      else this.header(0xce, 4, value);
+    } else if (Number.isInteger(value) && value < 0 && value >= -0x80000000) {
+      if (value >= -32) this.byte(value & 0xff);
+      else {
+        this.reserve(5);
+        this.buffer[this.length++] = 0xd2;
+        this.view.setInt32(this.length, value);
+        this.length += 4;
+      }
+    } else if (Number.isSafeInteger(value)) {
+      this.reserve(9);
+      this.buffer[this.length++] = value > 0 ? 0xcf : 0xd3;
+      if (value > 0) this.view.setBigUint64(this.length, BigInt(value));
+      else this.view.setBigInt64(this.length, BigInt(value));
+      this.length += 8;
+    } else {
+      this.reserve(9);
+      this.buffer[this.length++] = 0xcb;
+      this.view.setFloat64(this.length, value);
+      this.length += 8;
+    }
+  }
+
+  string(value) {
+    const data = textEncoder.encode(value);
+    if (data.length < 32) this.byte(0xa0 | data.length);
+    else if (data.length < 0x100) this.header(0xd9, 1, data.length);
+    else if (data.length < 0x10000) this.header(0xda, 2, data.length);
+    else this.header(0xdb, 4, data.length);
+    this.bytes(data);
+  }
+
+  value(value) {
+    if (value === null || value === undefined) this.byte(0xc0);
+    else if (value === false) this.byte(0xc2);
+    else if (value === true) this.byte(0xc3);
+    else if (typeof value === 'number') this.number(value);
+    else if (typeof value === 'string') this.string(value);
+    else if (value instanceof Uint8Array) {
+      if (value.length < 0x100) this.header(0xc4, 1, value.length);
+      else if (value.length < 0x10000) this.header(0xc5, 2, value.length);
+      else this.header(0xc6, 4, value.length);
+      this.bytes(value);
+    } else if (Array.isArray(value)) {
+      if (value.length < 16) this.byte(0x90 | value.length);
+      else if (value.length < 0x10000) this.header(0xdc, 2, value.length);
+      else this.header(0xdd, 4, value.length);
+      value.forEach((item) => this.value(item));
+    } else if (value instanceof Date) {
+      this.string(value.toISOString());
+    } else {
+      const entries = Object.entries(value).filter(([, item]) => item !== undefined);
+      if (entries.length < 16) this.byte(0x80 | entries.length);
+      else if (entries.length < 0x10000) this.header(0xde, 2, entries.length);
+      else this.header(0xdf, 4, entries.length);
+      entries.forEach(([key, item]) => {
+        this.string(key);
+        this.value(item);
+      });
+    }
+  }
+}
+
+export const encode = (value) => {
+  const writer = new Writer();
+  writer.value(value);
+  return writer.buffer.subarray(0, writer.length);
+};
+
+class Reader {
+  constructor(data) {
+    this.data = data;
+    this.view = new DataView(data.buffer, data.byteOffset, data.byteLength);
+    this.offset = 0;
+  }
+
+  take(size) {
+    const start = this.offset;
+    this.offset += size;
+    return start;
+  }
+
+  string(size) {
+    const start = this.take(size);
+    return textDecoder.decode(this.data.subarray(start, start + size));
+  }
+
+  array(size) {
+    const result = new Array(size);
+    for (let i = 0; i < size; i++) result[i] = this.value();
+    return result;
+  }
+
+  map(size) {
+    const result = {};
+    for (let i = 0; i < size; i++) {
+      const key = this.value();
+      result[key] = this.value();
+    }
+    return result;
+  }
+
+  value() {
+    const type = this.data[this.take(1)];
+    if (type < 0x80) return type;
+    if (type < 0x90) return this.map(type & 0x0f);
+    if (type < 0xa0) return this.array(type & 0x0f);
+    if (type < 0xc0) return this.string(type & 0x1f);
+    if (type >= 0xe0) return type - 0x100;
+    const view = this.view;
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: case 0xc5: case 0xc6: {
+        const size = type === 0xc4 ? view.getUint8(this.take(1)) : type === 0xc5 ? view.getUint16(this.take(2)) : view.getUint32(this.take(4));
+        const start = this.take(size);
+        return this.data.slice(start, start + size);
+      }
+      case 0xca: return view.getFloat32(this.take(4));
+      case 0xcb: return view.getFloat64(this.take(8));
+      case 0xcc: return view.getUint8(this.take(1));
+      case 0xcd: return view.getUint16(this.take(2));
+      case 0xce: return view.getUint32(this.take(4));
+      case 0xcf: return Number(view.getBigUint64(this.take(8)));
+      case 0xd0: return view.getInt8(this.take(1));
+      case 0xd1: return view.getInt16(this.take(2));
+      case 0xd2: return view.getInt32(this.take(4));
+      case 0xd3: return Number(view.getBigInt64(this.take(8)));
+      case 0xd9: return this.string(view.getUint8(this.take(1)));
+      case 0xda: return this.string(view.getUint16(this.take(2)));
+      case 0xdb: return this.string(view.getUint32(this.take(4)));
+      case 0xdc: return this.array(view.getUint16(this.take(2)));
+      case 0xdd: return this.array(view.getUint32(this.take(4)));
+      case 0xde: return this.map(view.getUint16(this.take(2)));
+      case 0xdf: return this.map(view.getUint32(this.take(4)));
+      default: throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+  }
+}
+
+export const decode = (data) => new Reader(data instanceof Uint8Array ? data : new Uint8Array(data)).value();
@@ -0,0 +1,63 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.grader import available_cpus, case_workers, grade_solution
+
+# Сравнивает последовательную проверку кейсов с шардированием по процессам ("parallel_cases")
+# на задаче, где каждый кейс заметно грузит CPU.
+
+CODE = """
+def count_primes(n):
+    count = 0
+    for candidate in range(2, n):
+        if all(candidate % d for d in range(2, int(candidate ** 0.5) + 1)):
+            count += 1
+    return count
+"""
+
+
+def make_spec(cases: int, size: int) -> dict:
+    return {
+        "entry": {"type": "function", "name": "count_primes", "params": ["n"]},
+        # expected заведомо неверный: считаем время, а не правильность
+        "tests": [{"args": [size + i], "expected": -1} for i in range(cases)],
+    }
+
+
+def measure(runs: int, solution: Path, spec: dict) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        grade_solution(solution, "count_primes", spec)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel test-case sharding against serial grading")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cases", type=int, default=32)
+    parser.add_argument("--size", type=int, default=30000)
+    parser.add_argument("--workers", type=int, nargs="*", default=[2, 4])
+    args = parser.parse_args()
+
+    print(f"⏱️ {args.cases} cases of count_primes({args.size}), {args.runs} runs, {available_cpus()} CPUs available")
+    with tempfile.TemporaryDirectory() as work_dir:
+        solution = Path(work_dir) / "solution.py"
+        solution.write_text(CODE, encoding="utf-8")
+        serial = statistics.median(measure(args.runs, solution, make_spec(args.cases, args.size)))
+        print(f"{'serial':<16} median {serial * 1000:8.1f} ms")
+        for workers in args.workers:
+            spec = {**make_spec(args.cases, args.size), "parallel_cases": workers}
+            parallel = statistics.median(measure(args.runs, solution, spec))
+            # Больше процессов, чем доступно ядер (с учетом квоты cgroup), грейдер не запускает
+            effective = case_workers(spec, args.cases)
+            print(f"{f'parallel x{effective}':<16} median {parallel * 1000:8.1f} ms   speedup {serial / parallel:4.2f}x")
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from backend.wire import decode, encode  # noqa: E402
+
+# Сравнивает форматы кадров вебсокета на горячем пути live-просмотра и на итогах проверки:
+# прежний stdlib json с полным буфером на каждое нажатие, orjson и MessagePack с дельтами.
+# Для каждого варианта - время сериализации и разбора на сообщение и байты на проводе без сжатия
+# и с permessage-deflate (raw deflate с общим контекстом на поток, как в браузере и websockets).
+
+LINE = "    total = sum(value * weight for value, weight in zip(values, weights))  # строка решения\n"
+CODE = "def solve(values, weights):\n" + LINE * 299
+
+
+def keystroke_stream(count: int) -> List[Dict[str, Any]]:
+    code, messages = CODE, []
+    for i in range(count):
+        pos = len(code) - 1 - (i % 40)
+        code = code[:pos] + "x" + code[pos:]
+        messages.append({"full": {"type": "live_code_update", "user_id": "3f1c2a9e-5b7d-4e21-9a0c-1d2e3f4a5b6c", "code": code},
+                         "delta": {"type": "live_code_delta", "user_id": "3f1c2a9e-5b7d-4e21-9a0c-1d2e3f4a5b6c",
+                                   "base": i, "version": i + 1, "ops": [{"p": pos, "i": "x"}]}})
+    return messages
+
+
+def submission_stream(count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(0)
+
+    def case(i: int) -> Dict[str, Any]:
+        return {"index": i, "status": "passed", "input": f"solve({rng.sample(range(1000), 8)}, {[1] * 8})",
+                "expected": str(rng.randrange(10 ** 6)), "actual": str(rng.randrange(10 ** 6)),
+                "time": rng.random() / 100, "peak_memory": rng.randrange(10 ** 6, 10 ** 7)}
+
+    return [{"type": "submission_result", "submission": {"id": f"{n:08d}-{rng.getrandbits(64):016x}", "status": "success",
+                                                         "test_results": [case(i) for i in range(20)],
+                                                         "passed_tests": 20, "total_tests": 20, "execution_time": rng.random()}}
+            for n in range(count)]
+
+
+CODECS: Dict[str, Callable[[Dict[str, Any]], bytes]] = {
+    "json (stdlib)": lambda m: json.dumps(m).encode("utf-8"),
+    "orjson": lambda m: encode(m, "json").encode("utf-8"),
+    "msgpack": lambda m: encode(m, "msgpack"),
+}
+DECODERS: Dict[str, Callable[[bytes], Any]] = {
+    "json (stdlib)": lambda b: json.loads(b),
+    "orjson": lambda b: decode(b.decode("utf-8")),
+    "msgpack": lambda b: decode(b),
+}
+
+
+def measure(name: str, messages: List[Dict[str, Any]]) -> Dict[str, float]:
+    started = time.perf_counter()
+    frames = [CODECS[name](m) for m in messages]
+    encode_time = (time.perf_counter() - started) / len(messages)
+    started = time.perf_counter()
+    for frame in frames:
+        DECODERS[name](frame)
+    decode_time = (time.perf_counter() - started) / len(messages)
+    deflate = zlib.compressobj(wbits=-15)
+    compressed = sum(len(deflate.compress(frame) + deflate.flush(zlib.Z_SYNC_FLUSH)) - 4 for frame in frames)
+    return {"encode": encode_time, "decode": decode_time, "raw": sum(map(len, frames)) / len(frames), "deflate": compressed / len(frames)}
+
+
+def report(title: str, rows: List[tuple]) -> None:
+    print(f"\n{title}")
+    print(f"{'variant':<34}{'encode µs':>10}{'decode µs':>11}{'bytes':>10}{'deflate':>10}")
+    for label, stats in rows:
+        print(f"{label:<34}{stats['encode'] * 1e6:>10.1f}{stats['decode'] * 1e6:>11.1f}{stats['raw']:>10.0f}{stats['deflate']:>10.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="WebSocket frame encoding benchmark")
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    keystrokes = keystroke_stream(args.messages)
+    full = [m["full"] for m in keystrokes]
+    delta = [m["delta"] for m in keystrokes]
+    report(f"Live code, {len(CODE.splitlines())}-line solution, per keystroke", [
+        ("full buffer, json (stdlib)", measure("json (stdlib)", full)),
+        ("delta, json (stdlib)", measure("json (stdlib)", delta)),
+        ("delta, orjson", measure("orjson", delta)),
+        ("delta, msgpack", measure("msgpack", delta)),
+    ])
+    results = submission_stream(max(args.messages // 10, 1))
+    report("submission_result, 20 test cases", [(name, measure(name, results)) for name in CODECS])
+
+
+if __name__ == "__main__":
+    main()
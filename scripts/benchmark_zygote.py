@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+# Сравнивает запуск проверки новым интерпретатором на каждое решение (python -c со сценарием,
+# как раньше, и python -m backend.batch_grader --single) с fork от зигота, который уже импортировал грейдер.
+# По умолчанию все пути запускаются локальными подпроцессами, с --docker - через DockerSandbox и пул контейнеров.
+
+CODE = "def sum_two_numbers(a, b):\n    return a + b\n"
+SPEC = {
+    "entry": {"type": "function", "name": "sum_two_numbers", "params": ["a", "b"]},
+    "tests": [{"args": [i, i], "expected": 2 * i} for i in range(10)],
+}
+LIMITS = {"cpu_seconds": 5, "file_size": 1024 * 1024, "max_processes": 64}
+
+RUNNER_SCRIPT = """
+import json, base64
+from pathlib import Path
+from backend.grader import grade_solution
+Path('solution.py').write_text(base64.b64decode('{code}').decode('utf-8'), encoding='utf-8')
+spec = json.loads(base64.b64decode('{spec}').decode('utf-8'))
+print(json.dumps(grade_solution(Path('solution.py'), 'sum_two_numbers', spec)))
+"""
+
+
+def report(name: str, samples: List[float]) -> None:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<28} mean {statistics.mean(samples) * 1000:7.1f} ms   p50 {statistics.median(samples) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms")
+
+
+def measure(runs: int, run_once: Callable[[], None]) -> List[float]:
+    run_once()  # прогрев: кеш страниц, .pyc
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_once()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_local(runs: int) -> None:
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    with tempfile.TemporaryDirectory() as work_dir:
+        work = Path(work_dir)
+        (work / "solution.py").write_text(CODE, encoding="utf-8")
+        (work / "spec.json").write_text(json.dumps(SPEC), encoding="utf-8")
+
+        script = RUNNER_SCRIPT.format(
+            code=base64.b64encode(CODE.encode("utf-8")).decode("ascii"),
+            spec=base64.b64encode(json.dumps(SPEC).encode("utf-8")).decode("ascii"),
+        )
+        report("python -c runner_script", measure(runs, lambda: subprocess.run(
+            [sys.executable, "-c", script], cwd=work, env=env, capture_output=True, check=True)))
+        report("python -m batch_grader", measure(runs, lambda: subprocess.run(
+            [sys.executable, "-m", "backend.batch_grader", "--single", "solution.py", "sum_two_numbers", "spec.json"],
+            cwd=work, env=env, capture_output=True, check=True)))
+
+        zygote = subprocess.Popen([sys.executable, "-m", "backend.zygote"], cwd=work, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        counter = iter(range(1_000_000))
+
+        def run_zygote() -> None:
+            job = {"id": next(counter), "task_id": "sum_two_numbers", "spec": SPEC, "code": CODE, "timeout": 5, "limits": LIMITS}
+            zygote.stdin.write(json.dumps(job).encode("utf-8") + b"\n")
+            zygote.stdin.flush()
+            for line in zygote.stdout:
+                message = json.loads(line)
+                if "result" in message or "killed" in message:
+                    return
+
+        try:
+            report("zygote fork", measure(runs, run_zygote))
+        finally:
+            zygote.stdin.close()
+            zygote.wait(5)
+
+
+def bench_docker(runs: int) -> None:
+    from backend.docker_sandbox import DockerSandbox
+
+    async def run_mode(zygote: bool) -> List[float]:
+        sandbox = DockerSandbox(zygote=zygote)
+        await sandbox.start()
+        try:
+            samples = []
+            for i in range(runs + 1):
+                started = time.perf_counter()
+                await sandbox.run(CODE, "sum_two_numbers", SPEC)
+                if i:
+                    samples.append(time.perf_counter() - started)
+            return samples
+        finally:
+            await sandbox.shutdown()
+
+    report("docker exec (batch_grader)", asyncio.run(run_mode(False)))
+    report("docker zygote", asyncio.run(run_mode(True)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark zygote grading against a fresh interpreter per run")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--docker", action="store_true", help="run through DockerSandbox and the worker image")
+    args = parser.parse_args()
+    print(f"⏱️ {args.runs} runs per mode")
+    if args.docker:
+        bench_docker(args.runs)
+    else:
+        bench_local(args.runs)
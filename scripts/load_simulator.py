@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from backend.wire import decode, encode  # noqa: E402
+
+# Нагрузочный прогон всего стека: создает сессию и N студентов, студенты печатают через
+# /ws/student (дельты live-кода, смена статуса, ping), M преподавателей смотрят через /ws/admin,
+# решения приходят волнами через /api/submit. В конце - p50/p99 задержек рассылки, время от отправки
+# решения до submission_result и метрики сервера: задержка цикла событий и ожидание пула базы.
+#
+#   python scripts/load_simulator.py --spawn stub --students 150 --teachers 3 --duration 60
+#
+# --spawn запускает uvicorn с EXECUTION_BACKEND=stub (проверка без выполнения кода) или local
+# (локальная песочница); без --spawn нагружается уже запущенный сервер --url. В базе должны быть
+# задачи (python scripts/seed_tasks.py).
+
+KEYS = "abcdefghijklmnopqrstuvwxyz  ()=+:_0123456789"
+
+
+class Metrics:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add(self, name: str, value: float) -> None:
+        self.samples.setdefault(name, []).append(value)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self) -> None:
+        print(f"\n{'metric':<34}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, values in sorted(self.samples.items()):
+            values = sorted(values)
+            pick = lambda q: values[min(int(q * len(values)), len(values) - 1)] * 1000
+            print(f"{name:<34}{len(values):>8}{pick(0.5):>10.1f}{pick(0.99):>10.1f}{values[-1] * 1000:>10.1f}")
+        for name, value in sorted(self.counters.items()):
+            print(f"{name:<34}{value:>8}")
+
+
+class Simulation:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.metrics = Metrics()
+        self.http = httpx.AsyncClient(base_url=args.url, timeout=60, limits=httpx.Limits(max_connections=args.students + 10))
+        self.ws_url = args.url.replace("http", "ws", 1)
+        self.session_id = ""
+        self.token = ""
+        self.students: List[Dict[str, Any]] = []
+        # Время отправки правки (студент, версия) и смены статуса - для задержки доставки админам
+        self.sent_versions: Dict[Tuple[str, int], float] = {}
+        self.sent_status: Dict[str, float] = {}
+        self.pending_submits: Dict[str, float] = {}
+        self.stop = asyncio.Event()
+
+    async def setup(self) -> None:
+        password = "load-test"
+        session = (await self.http.post("/api/admin/session/create", json={"password": password})).raise_for_status().json()
+        self.session_id = session["id"]
+        login = await self.http.post("/api/admin/login", data={"username": self.session_id, "password": password})
+        self.token = login.raise_for_status().json()["access_token"]
+
+        async def register(i: int) -> Dict[str, Any]:
+            response = await self.http.post("/api/register", json={"name": f"Load {i:04d}", "session_id": self.session_id})
+            return response.raise_for_status().json()
+
+        self.students = list(await asyncio.gather(*(register(i) for i in range(self.args.students))))
+        await self.http.post("/api/admin/tasks/assign", headers=self.auth())
+        for student in self.students:
+            student["task"] = (await self.http.get(f"/api/student/{student['id']}/task")).json()
+        if not any(student["task"] for student in self.students):
+            raise SystemExit("No tasks assigned: seed them first with python scripts/seed_tasks.py")
+        await self.http.post("/api/admin/stats/runtime/reset", headers=self.auth())
+        print(f"Session {self.session_id}: {len(self.students)} students, {self.args.teachers} teachers")
+
+    def auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def connect(self, path: str):
+        return await websockets.connect(f"{self.ws_url}{path}", subprotocols=[self.args.codec], max_size=None)
+
+    async def send(self, ws, message: Dict[str, Any]) -> None:
+        await ws.send(encode(message, ws.subprotocol))
+
+    async def student(self, student: Dict[str, Any]) -> None:
+        user_id = student["id"]
+        ws = await self.connect(f"/ws/student/{user_id}")
+        rng = random.Random(user_id)
+        code = (student["task"] or {}).get("template") or ""
+        version = 1
+        await self.send(ws, {"type": "code_snapshot", "version": version, "code": code})
+        receiver = asyncio.create_task(self.student_inbox(ws, student))
+        typing = False
+        last_ping = time.monotonic()
+        try:
+            while not self.stop.is_set():
+                # Нажатия - пуассоновский поток со средней скоростью --cps, иногда пауза на подумать
+                pause = rng.uniform(1, 5) if rng.random() < 0.02 else 0.0
+                await asyncio.sleep(rng.expovariate(self.args.cps) + pause)
+                if not typing:
+                    typing = True
+                    self.sent_status[user_id] = time.perf_counter()
+                    await self.send(ws, {"type": "status_update", "status": "typing"})
+                if student.pop("resync", False):
+                    # Сервер потерял версию (например, буфер вытеснен из кэша): шлем снимок, как фронтенд
+                    version += 1
+                    await self.send(ws, {"type": "code_snapshot", "version": version, "code": code})
+                key = "\n" if rng.random() < 0.05 else rng.choice(KEYS)
+                self.sent_versions[(user_id, version + 1)] = time.perf_counter()
+                await self.send(ws, {"type": "code_delta", "base": version, "ops": [{"p": len(code), "i": key}]})
+                code += key
+                version += 1
+                student["code"] = code
+                if rng.random() < 0.01:
+                    typing = False
+                    self.sent_status[user_id] = time.perf_counter()
+                    await self.send(ws, {"type": "status_update", "status": "online"})
+                if time.monotonic() - last_ping > 25:
+                    last_ping = time.monotonic()
+                    await self.send(ws, {"type": "ping"})
+                self.metrics.count("keystrokes sent")
+        except websockets.ConnectionClosed:
+            self.metrics.count("student sockets dropped")
+        finally:
+            receiver.cancel()
+            await ws.close()
+
+    async def student_inbox(self, ws, student: Dict[str, Any]) -> None:
+        async for frame in ws:
+            message = decode(frame)
+            if message.get("type") == "submission_result":
+                started = self.pending_submits.pop(student["id"], None)
+                if started is not None:
+                    self.metrics.add("submit -> submission_result", time.perf_counter() - started)
+            elif message.get("type") == "code_resync":
+                student["resync"] = True
+                self.metrics.count("code_resync received")
+
+    async def teacher(self, index: int) -> None:
+        ws = await self.connect(f"/ws/admin/{self.session_id}")
+        watched = self.students[index % len(self.students)]["id"]
+        await self.send(ws, {"type": "view_student", "student_id": watched})
+        try:
+            async for frame in ws:
+                received = time.perf_counter()
+                message = decode(frame)
+                kind = message.get("type")
+                if kind in ("live_code_delta", "live_code_update"):
+                    sent = self.sent_versions.get((message["user_id"], message["version"]))
+                    if sent is not None:
+                        self.metrics.add("live code fan-out", received - sent)
+                elif kind == "dashboard_delta":
+                    self.metrics.count("dashboard frames")
+                    for change in message["students"]:
+                        sent = self.sent_status.get(change["id"]) if "status" in change else None
+                        if sent is not None:
+                            self.metrics.add("dashboard fan-out", received - sent)
+                if self.stop.is_set():
+                    break
+        except websockets.ConnectionClosed:
+            if not self.stop.is_set():
+                self.metrics.count("teacher sockets dropped")
+        finally:
+            await ws.close()
+
+    async def bursts(self) -> None:
+        # Волна решений: доля студентов отправляет код почти одновременно, как по команде преподавателя
+        while not self.stop.is_set():
+            await asyncio.sleep(self.args.burst_every)
+            wave = [s for s in self.students if s["task"] and s["id"] not in self.pending_submits]
+            wave = random.sample(wave, int(len(wave) * self.args.burst_fraction))
+            await asyncio.gather(*(self.submit(student) for student in wave))
+
+    async def submit(self, student: Dict[str, Any]) -> None:
+        await asyncio.sleep(random.uniform(0, 1))
+        self.pending_submits[student["id"]] = started = time.perf_counter()
+        body = {"submission": {"task_id": student["task"]["id"], "code": student.get("code", "")}, "user_id": student["id"]}
+        response = await self.http.post("/api/submit", json=body)
+        self.metrics.add("POST /api/submit", time.perf_counter() - started)
+        if response.status_code != 200:
+            self.pending_submits.pop(student["id"], None)
+            self.metrics.count(f"submit rejected ({response.status_code})")
+
+    async def run(self) -> None:
+        await self.setup()
+        tasks = [asyncio.create_task(self.student(student)) for student in self.students]
+        tasks += [asyncio.create_task(self.teacher(i)) for i in range(self.args.teachers)]
+        tasks.append(asyncio.create_task(self.bursts()))
+        await asyncio.sleep(self.args.duration)
+        self.stop.set()
+        # Даем дойти последним результатам проверки
+        await asyncio.sleep(2)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.metrics.count("submissions unanswered", len(self.pending_submits))
+        server = (await self.http.get("/api/admin/stats/runtime", headers=self.auth())).json()
+        await self.http.aclose()
+
+        self.metrics.report()
+        print("\nServer (process that answered the stats request)")
+        for name in ("event_loop_lag", "db_pool_wait"):
+            stats = server[name]
+            print(f"{name:<34}{stats['count']:>8}{stats['p50_ms'] or 0:>10.1f}{stats['p99_ms'] or 0:>10.1f}{stats['max_ms'] or 0:>10.1f}")
+        if "db_pool" in server:
+            print(f"db pool at end: {server['db_pool']}")
+
+
+def spawn_server(executor: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, "EXECUTION_BACKEND": executor, "GRADING_MODE": "inline"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--ws", "websockets", "--ws-per-message-deflate", "true", "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            if process.poll() is not None:
+                raise SystemExit("Server exited during startup")
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server did not start in 20 seconds")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Classroom load simulator")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", choices=("stub", "local"), help="start uvicorn with this execution backend")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--teachers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of typing")
+    parser.add_argument("--cps", type=float, default=4.0, help="average keystrokes per second per student")
+    parser.add_argument("--burst-every", type=float, default=20.0, help="seconds between submission waves")
+    parser.add_argument("--burst-fraction", type=float, default=0.5, help="share of students submitting in a wave")
+    parser.add_argument("--codec", choices=("msgpack", "json"), default="msgpack")
+    args = parser.parse_args()
+
+    server: Optional[subprocess.Popen] = None
+    if args.spawn:
+        server = spawn_server(args.spawn, httpx.URL(args.url).port or 8000)
+    try:
+        asyncio.run(Simulation(args).run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import sys
+import os
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import engine, Base
+import backend.models  # noqa: F401
+
+# create_all не добавляет колонки в существующие таблицы, поэтому новые поля докатываем вручную
+MIGRATIONS = [
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS cpu_time DOUBLE PRECISION",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS fail_fast BOOLEAN",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS worker_id VARCHAR",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITHOUT TIME ZONE",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_lease_expires_at ON submissions (lease_expires_at)",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS peak_memory BIGINT",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS process_cpu_time DOUBLE PRECISION",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS throttled_time DOUBLE PRECISION",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS oom_killed BOOLEAN",
+    # SQLAlchemy хранит в enum имена членов, а не значения
+    "ALTER TYPE submissionstatus ADD VALUE IF NOT EXISTS 'QUEUED'",
+    "ALTER TYPE submissionstatus ADD VALUE IF NOT EXISTS 'CANCELLED'",
+]
+
+def migrate():
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for statement in MIGRATIONS:
+            print(f"🛠️ {statement}")
+            conn.execute(text(statement))
+    print("✅ Database schema is up to date.")
+
+if __name__ == "__main__":
+    migrate()
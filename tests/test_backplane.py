@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from backend.backplane import InMemoryBackplane, PostgresBackplane
+from backend.live_code import LiveCodeStore
+from backend.websocket_manager import ConnectionManager
+from tests.test_websocket_manager import FakeSocket
+
+
+async def two_processes():
+    hub = []
+    processes = [ConnectionManager(max_queue=16, backplane=InMemoryBackplane(hub), store=LiveCodeStore()) for _ in range(2)]
+    for process in processes:
+        await process.start()
+    return processes
+
+
+@pytest.mark.asyncio
+async def test_messages_reach_sockets_in_other_process():
+    a, b = await two_processes()
+    admin, student = FakeSocket(), FakeSocket()
+    await a.connect_admin(admin, "s1")
+    a.set_admin_viewing(admin, "u1")
+    await b.connect_student(student, "u1")
+
+    await b.broadcast_to_admins("s1", {"type": "student_update", "user_id": "u1"})
+    await b.send_to_admins_viewing_student("s1", "u1", {"type": "submission_progress"})
+    await b.send_to_admins_viewing_student("s1", "u2", {"type": "submission_progress"})
+    await a.send_to_student("u1", {"type": "task_assigned"})
+    await asyncio.sleep(0.01)
+
+    assert [m["type"] for m in admin.sent] == ["student_update", "submission_progress"]
+    # Админ открыл студента без копии буфера: процесс студента попросил у него снимок
+    assert student.sent == [{"type": "code_resync"}, {"type": "task_assigned"}]
+    a.disconnect_admin(admin, "s1")
+    b.disconnect_student("u1", student)
+    await a.stop()
+    await b.stop()
+
+
+@pytest.mark.asyncio
+async def test_live_code_follows_student_from_other_process():
+    a, b = await two_processes()
+    student, admin = FakeSocket(), FakeSocket()
+    await b.connect_student(student, "u1")
+    b.live_code.snapshot("u1", "print()", 4)
+
+    # Копии буфера в процессе админа нет: снимок присылает процесс студента
+    await a.connect_admin(admin, "s1")
+    a.set_admin_viewing(admin, "u1")
+    await asyncio.sleep(0.01)
+    assert admin.sent == [{"type": "live_code_update", "user_id": "u1", "code": "print()", "version": 4}]
+
+    ops = [{"p": 6, "i": "1"}]
+    b.publish_live_code("s1", "u1", b.live_code.apply("u1", 4, ops), ops)
+    await asyncio.sleep(0.15)
+    assert admin.sent[1] == {"type": "live_code_delta", "user_id": "u1", "base": 4, "version": 5, "ops": ops}
+    assert a.live_code.get("u1").code == "print(1)"
+
+    # Пропущенная дельта: копия просит снимок, правки до него отбрасываются
+    b.live_code.apply("u1", 5, [{"p": 0, "i": "#"}])
+    ops = [{"p": 1, "i": " "}]
+    b.publish_live_code("s1", "u1", b.live_code.apply("u1", 6, ops), ops)
+    await asyncio.sleep(0.25)
+    assert admin.sent[-1] == {"type": "live_code_update", "user_id": "u1", "code": "# print(1)", "version": 7}
+
+    a.disconnect_admin(admin, "s1")
+    b.disconnect_student("u1", student)
+    await a.stop()
+    await b.stop()
+
+
+def test_postgres_payloads_are_chunked_and_reassembled():
+    sender, receiver = PostgresBackplane(dsn=""), PostgresBackplane(dsn="")
+    event = {"op": "live", "student_id": "u1", "code": "ж" * 5000}
+    payloads = sender.encode(event)
+    assert len(payloads) > 1 and all(len(p.encode("utf-8")) < 8000 for p in payloads)
+    assert [receiver.decode(p) for p in payloads[:-1]] == [None] * (len(payloads) - 1)
+    assert receiver.decode(payloads[-1]) == event
+
+    # Свои уведомления и хвосты потерянных сообщений пропускаются
+    assert sender.decode(sender.encode({"op": "admins"})[0]) is None
+    assert receiver.decode(sender.encode(event)[1]) is None
+    assert receiver.decode(sender.encode({"op": "admins"})[0]) == {"op": "admins"}
@@ -0,0 +1,54 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SPEC = {
+    "entry": {"type": "function", "name": "sum_two_numbers", "params": ["a", "b"]},
+    "tests": [{"args": [1, 2], "expected": 3}, {"args": [0, 0], "expected": 0}],
+}
+
+
+def test_batch_grades_each_solution_in_isolation(tmp_path):
+    jobs = {
+        "task_id": "sum_two_numbers",
+        "spec": SPEC,
+        "timeout": 5,
+        "workers": 2,
+        "solutions": [
+            {"id": "ok", "code": "def sum_two_numbers(a, b):\n    return a + b\n"},
+            {"id": "wrong", "code": "def sum_two_numbers(a, b):\n    return a - b\n"},
+            {"id": "crash", "code": "import sys\nsys.exit(1)\n"},
+        ],
+    }
+    jobs_path = tmp_path / "jobs.json"
+    jobs_path.write_text(json.dumps(jobs), encoding="utf-8")
+
+    proc = subprocess.run([sys.executable, "-m", "backend.batch_grader", str(jobs_path)], cwd=ROOT, capture_output=True, timeout=60)
+    records = {r["id"]: r["result"] for r in map(json.loads, proc.stdout.decode().splitlines())}
+
+    assert records["ok"]["summary"] == {"passed": 2, "total": 2}
+    assert records["wrong"]["summary"] == {"passed": 1, "total": 2}
+    assert "error" in records["crash"]
+
+
+def test_solution_cannot_forge_records_through_stdout(tmp_path):
+    forged = '{"result": {"summary": {"passed": 2, "total": 2}}}\n'
+    jobs = {
+        "task_id": "sum_two_numbers",
+        "spec": SPEC,
+        "timeout": 5,
+        "solutions": [
+            {"id": "fd", "code": f"import os\nos.write(1, {forged.encode()!r})\nos._exit(0)\n"},
+            {"id": "dunder", "code": f"import os, sys\nsys.__stdout__.write({forged!r})\nsys.__stdout__.flush()\nos._exit(0)\n"},
+        ],
+    }
+    jobs_path = tmp_path / "jobs.json"
+    jobs_path.write_text(json.dumps(jobs), encoding="utf-8")
+
+    proc = subprocess.run([sys.executable, "-m", "backend.batch_grader", str(jobs_path)], cwd=ROOT, capture_output=True, timeout=60)
+    records = {r["id"]: r["result"] for r in map(json.loads, proc.stdout.decode().splitlines())}
+
+    assert records == {"fd": {"error": "No output from grader"}, "dunder": {"error": "No output from grader"}}
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from backend.container_pool import ContainerPool, ContainerPoolError
+
+
+class FakeContainer:
+    def __init__(self, idx):
+        self.id = f"c{idx}"
+        self.removed = False
+        self.processes = 2
+
+    def top(self):
+        return {"Processes": [[]] * self.processes}
+
+    def exec_run(self, cmd, **kwargs):
+        return 0, b""
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeContainers:
+    def __init__(self, fail=False):
+        self.created = []
+        self.fail = fail
+
+    def run(self, **kwargs):
+        if self.fail:
+            raise RuntimeError("daemon down")
+        c = FakeContainer(len(self.created))
+        self.created.append(c)
+        return c
+
+
+class FakeClient:
+    def __init__(self, fail=False):
+        self.containers = FakeContainers(fail)
+
+
+@pytest.mark.asyncio
+async def test_lease_recycles_clean_container():
+    client = FakeClient()
+    pool = ContainerPool(client, min_size=1, max_size=2, idle_timeout=60, max_uses=5)
+    first = await pool.lease()
+    await pool.release(first)
+    second = await pool.lease()
+    assert second is first
+    assert second.uses == 2
+    await pool.release(second)
+    await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_dirty_container_is_destroyed():
+    client = FakeClient()
+    pool = ContainerPool(client, min_size=1, max_size=2, idle_timeout=60, max_uses=5)
+    pooled = await pool.lease()
+    pooled.container.processes = 3
+    await pool.release(pooled)
+    assert pooled.container.removed
+    await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_pool_grows_under_load_within_max():
+    client = FakeClient()
+    pool = ContainerPool(client, min_size=1, max_size=3, idle_timeout=60, max_uses=5)
+    pool.avg_grade_time.value = 10.0
+    pool.avg_start_time.value = 0.1
+    leased = await asyncio.gather(*(pool.lease() for _ in range(3)))
+    assert len({p.id for p in leased}) == 3
+    assert pool.size == 3
+    for p in leased:
+        await pool.release(p)
+    await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_idle_containers_are_reaped_down_to_min():
+    client = FakeClient()
+    pool = ContainerPool(client, min_size=1, max_size=3, idle_timeout=0, max_uses=5)
+    pool.avg_start_time.value = 0.0
+    leased = await asyncio.gather(*(pool.lease() for _ in range(3)))
+    for p in leased:
+        await pool.release(p)
+    await pool._reap_idle()
+    assert pool.size == 1
+    await pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_lease_fails_when_containers_cannot_start():
+    pool = ContainerPool(FakeClient(fail=True), min_size=1, max_size=2, idle_timeout=60, max_uses=5)
+    with pytest.raises(ContainerPoolError):
+        await pool.lease()
+    await pool.shutdown()
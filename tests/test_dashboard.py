@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from backend import dashboard as module
+from backend.dashboard import DashboardHub, Roster
+from tests.test_backplane import two_processes
+from tests.test_websocket_manager import FakeSocket
+
+
+def student(user_id, status="offline"):
+    return {"id": user_id, "name": f"Student {user_id}", "status": status, "is_online": status != "offline"}
+
+
+def test_roster_coalesces_changes_between_ticks():
+    roster = Roster()
+    roster.update("u1", {"status": "typing"})
+    roster.load([student("u1"), student("u2")])
+    roster.loaded, roster.changed = True, {}
+    # Живое изменение, пришедшее во время загрузки, не перетирается строкой из базы
+    assert roster.rows["u1"]["status"] == "typing"
+    assert roster.delta() is None
+
+    for status in ("online", "typing", "online"):
+        roster.update("u2", {"status": status})
+    roster.update("u1", {"submission_status": "success"})
+    assert roster.delta() == {"type": "dashboard_delta", "seq": 1, "students": [
+        {"id": "u2", "status": "online"}, {"id": "u1", "submission_status": "success"}]}
+    assert roster.snapshot()["seq"] == 1
+
+    roster.update("u3", {"status": "online"})
+    assert roster.missing == {"u3"}
+
+
+@pytest.mark.asyncio
+async def test_admins_get_snapshot_then_sequenced_deltas_from_any_process(monkeypatch):
+    loads, rows = [], [student("u1"), student("u2")]
+
+    def fake_load(session_id, user_ids=None):
+        loads.append(sorted(user_ids) if user_ids is not None else None)
+        return [row for row in rows if user_ids is None or row["id"] in user_ids]
+
+    monkeypatch.setattr(module, "load_students", fake_load)
+    a, b = await two_processes()
+    panel_a, panel_b = DashboardHub(a, tick_interval=60), DashboardHub(b, tick_interval=60)
+    first, second = FakeSocket(), FakeSocket()
+    await a.connect_admin(first, "s1")
+    await a.connect_admin(second, "s1")
+    await asyncio.gather(panel_a.attach(first, "s1"), panel_a.attach(second, "s1"))
+    await asyncio.sleep(0.01)
+    assert loads == [None]
+    assert first.sent == second.sent == [{"type": "dashboard_snapshot", "seq": 0, "students": [student("u1"), student("u2")]}]
+
+    # Студенты подключены к другому процессу; десятки событий за тик дают один кадр
+    for _ in range(20):
+        panel_b.student_changed("s1", "u1", status="typing")
+        panel_b.student_changed("s1", "u1", status="online")
+    # Новый студент зарегистрировался после снимка: его строка подгружается к тику
+    rows.append(student("u3"))
+    panel_b.student_changed("s1", "u3", status="online")
+    await asyncio.sleep(0.01)
+    await panel_a.tick()
+    await panel_a.tick()
+    await asyncio.sleep(0.01)
+
+    assert loads == [None, ["u3"]]
+    assert first.sent[1:] == [{"type": "dashboard_delta", "seq": 1, "students": [
+        {"id": "u1", "status": "online", "is_online": True}, student("u3", "online")]}]
+    # В процессе b нет админов сессии, ростер там не ведется
+    assert panel_b.rosters == {}
+
+    await panel_a.send_snapshot(second, "s1")
+    await asyncio.sleep(0.01)
+    assert second.sent[-1]["seq"] == 1 and len(second.sent[-1]["students"]) == 3
+
+    a.disconnect_admin(first, "s1")
+    a.disconnect_admin(second, "s1")
+    await panel_a.tick()
+    assert panel_a.rosters == {}
+    await a.stop()
+    await b.stop()
@@ -0,0 +1,110 @@
+import io
+import socket
+import struct
+import subprocess
+import sys
+import tarfile
+import threading
+from pathlib import Path
+
+import pytest
+import docker
+from backend.docker_sandbox import DockerSandbox
+from backend.zygote import serve
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SPEC = {
+    "entry": {"type": "function", "name": "total", "params": ["values"]},
+    "tests": [{"args": [list(range(200_000))], "expected": sum(range(200_000))}],
+}
+
+
+class LocalContainer:
+    # Распаковывает архив во временную папку и запускает раннер как обычный подпроцесс
+    def __init__(self, root: Path):
+        self.id = "local"
+        self.root = root
+        self.commands = []
+
+    def put_archive(self, path, data):
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            tar.extractall(self.root / path.lstrip("/"))
+        return True
+
+    def exec_run(self, cmd, stream=False, **kwargs):
+        self.commands.append(cmd)
+        if not stream:
+            return 0, b""
+        local_cmd = [sys.executable] + [str(self.root / arg.lstrip("/")) if arg.startswith("/tmp/") else arg for arg in cmd[1:]]
+        proc = subprocess.run(local_cmd, capture_output=True, cwd=ROOT)
+        return 0, iter([(proc.stdout, proc.stderr)])
+
+    def top(self):
+        return {"Processes": [[], []]}
+
+    def remove(self, force=False):
+        pass
+
+
+class LocalClient:
+    def __init__(self, root: Path):
+        self.container = LocalContainer(root)
+        self.containers = self
+
+    def run(self, **kwargs):
+        return self.container
+
+
+@pytest.mark.asyncio
+async def test_code_and_spec_travel_in_archive(tmp_path, monkeypatch):
+    client = LocalClient(tmp_path)
+    monkeypatch.setattr(docker, "from_env", lambda: client)
+    sandbox = DockerSandbox(zygote=False)
+
+    code = "def total(values):\n    print('debug output')\n    return sum(values)\n"
+    result = await sandbox.run(code, "total", SPEC)
+    await sandbox.shutdown()
+
+    assert result["summary"] == {"passed": 1, "total": 1}
+    command = client.container.commands[-1]
+    assert all(len(arg) < 100 for arg in command)
+    assert (tmp_path / "tmp" / "job" / "solution.py").read_text() == code
+
+
+class FramedWriter:
+    # Оборачивает вывод в кадры stdout, как это делает Docker для attach без tty
+    def __init__(self, sock):
+        self.sock = sock
+
+    def write(self, data):
+        self.sock.sendall(struct.pack(">BxxxL", 1, len(data)) + data)
+
+    def flush(self):
+        pass
+
+
+class ZygoteContainer(LocalContainer):
+    def attach_socket(self, params=None):
+        ours, theirs = socket.socketpair()
+        threading.Thread(target=serve, args=(theirs.makefile("rb"), FramedWriter(theirs)), daemon=True).start()
+        return ours
+
+
+@pytest.mark.asyncio
+async def test_zygote_channel_reuses_one_connection(tmp_path, monkeypatch):
+    client = LocalClient(tmp_path)
+    client.container = ZygoteContainer(tmp_path)
+    monkeypatch.setattr(docker, "from_env", lambda: client)
+    sandbox = DockerSandbox(zygote=True)
+
+    streamed = []
+    code = "def total(values):\n    return sum(values)\n"
+    first = await sandbox.run(code, "total", SPEC, on_case=streamed.append)
+    second = await sandbox.run("def total(values):\n    return 0\n", "total", SPEC)
+    await sandbox.shutdown()
+
+    assert first["summary"] == {"passed": 1, "total": 1}
+    assert second["summary"] == {"passed": 0, "total": 1}
+    assert [case["status"] for case in streamed] == ["passed"]
+    assert not any("batch_grader" in " ".join(cmd) for cmd in client.container.commands)
@@ -0,0 +1,192 @@
+from pathlib import Path
+from backend.grader import grade_solution
+
+SPEC = {
+    "entry": {"type": "function", "name": "sum_two_numbers", "params": ["a", "b"]},
+    "tests": [{"args": [1, 2], "expected": 3}, {"args": [0, 0], "expected": 0}],
+}
+
+
+def write_solution(tmp_path: Path, code: str) -> Path:
+    path = tmp_path / "solution.py"
+    path.write_text(code, encoding="utf-8")
+    return path
+
+
+def test_grade_solution_reports_timing(tmp_path):
+    code = "import time\ntime.sleep(0.02)\n\ndef sum_two_numbers(a, b):\n    return a + b\n"
+    result = grade_solution(write_solution(tmp_path, code), "sum_two_numbers", SPEC)
+
+    assert result["summary"] == {"passed": 2, "total": 2}
+    for case in result["cases"]:
+        assert case["wall_time"] >= 0 and case["cpu_time"] >= 0
+    timing = result["timing"]
+    assert timing["import"]["wall_time"] >= 0.02
+    assert timing["total"]["wall_time"] >= timing["import"]["wall_time"] + timing["tests"]["wall_time"] - 1e-6
+
+
+def test_failing_case_still_timed(tmp_path):
+    code = "def sum_two_numbers(a, b):\n    raise ValueError('nope')\n"
+    result = grade_solution(write_solution(tmp_path, code), "sum_two_numbers", SPEC)
+
+    assert result["summary"]["passed"] == 0
+    assert all(case["status"] == "error" and "wall_time" in case for case in result["cases"])
+
+
+def test_cases_are_streamed_in_order(tmp_path):
+    streamed = []
+    code = "def sum_two_numbers(a, b):\n    return a + b\n"
+    result = grade_solution(write_solution(tmp_path, code), "sum_two_numbers", SPEC, on_case=streamed.append)
+
+    assert [case["index"] for case in streamed] == [1, 2]
+    assert [case["status"] for case in streamed] == [case["status"] for case in result["cases"]]
+
+
+def test_fail_fast_skips_remaining_cases(tmp_path):
+    streamed = []
+    code = "def sum_two_numbers(a, b):\n    return 0\n"
+    spec = {**SPEC, "fail_fast": True}
+    result = grade_solution(write_solution(tmp_path, code), "sum_two_numbers", spec, on_case=streamed.append)
+
+    assert len(streamed) == 1
+    assert [case["status"] for case in result["cases"]] == ["failed", "skipped"]
+    assert result["summary"] == {"passed": 0, "total": 2}
+
+
+def test_parallel_cases_keep_order_and_isolation(tmp_path, monkeypatch):
+    from backend import grader
+
+    monkeypatch.setattr(grader, "available_cpus", lambda: 4)
+    # Каждый кейс дописывает в глобальный список; в изолированном кейсе он всегда пуст перед вызовом
+    code = "seen = []\ndef probe(x):\n    seen.append(x)\n    return len(seen)\n"
+    spec = {
+        "entry": {"type": "function", "name": "probe", "params": ["x"]},
+        "tests": [{"args": [i], "expected": 1} for i in range(8)],
+        "parallel_cases": 3,
+    }
+    streamed = []
+    result = grade_solution(write_solution(tmp_path, code), "probe", spec, on_case=streamed.append)
+
+    assert result["summary"] == {"passed": 8, "total": 8}
+    assert [case["index"] for case in result["cases"]] == list(range(1, 9))
+    assert [case["input"] for case in result["cases"]] == [[i] for i in range(8)]
+    assert [case["index"] for case in streamed] == list(range(1, 9))
+    assert all(case["entry"] == "probe" for case in result["cases"])
+
+
+def test_parallel_case_crash_is_reported_per_case(tmp_path, monkeypatch):
+    from backend import grader
+
+    monkeypatch.setattr(grader, "available_cpus", lambda: 2)
+    code = "import os\ndef probe(x):\n    if x == 1:\n        os._exit(3)\n    return True\n"
+    spec = {
+        "entry": {"type": "function", "name": "probe"},
+        "tests": [{"args": [0], "expected": True}, {"args": [1], "expected": True}, {"args": [2], "expected": True}],
+        "parallel_cases": True,
+    }
+    result = grade_solution(write_solution(tmp_path, code), "probe", spec)
+
+    assert [case["status"] for case in result["cases"]] == ["passed", "error", "passed"]
+    assert result["cases"][1]["error"] == "Case process exited without result"
+
+
+def test_parallel_missing_function_is_grading_error(tmp_path, monkeypatch):
+    import pytest
+    from backend import grader
+
+    monkeypatch.setattr(grader, "available_cpus", lambda: 2)
+    spec = {"entry": {"type": "function", "name": "probe"}, "tests": [{"args": [0]}, {"args": [1]}], "parallel_cases": 2}
+    with pytest.raises(grader.GradingError, match="not found"):
+        grade_solution(write_solution(tmp_path, "x = 1\n"), "probe", spec)
+
+
+def test_parallel_cases_fall_back_to_serial_when_fork_fails(tmp_path, monkeypatch):
+    import errno
+    from backend import grader
+
+    def no_fork():
+        raise OSError(errno.EAGAIN, "Resource temporarily unavailable")
+
+    monkeypatch.setattr(grader, "available_cpus", lambda: 2)
+    monkeypatch.setattr(grader.os, "fork", no_fork)
+    code = "def sum_two_numbers(a, b):\n    return a + b\n"
+    streamed = []
+    result = grade_solution(write_solution(tmp_path, code), "sum_two_numbers", {**SPEC, "parallel_cases": 2}, on_case=streamed.append)
+
+    assert result["summary"] == {"passed": 2, "total": 2}
+    assert [case["index"] for case in streamed] == [1, 2]
+
+
+def test_process_limit_covers_parallel_workers(monkeypatch):
+    from backend import grader
+
+    monkeypatch.setattr(grader, "available_cpus", lambda: 4)
+    spec = {**SPEC, "tests": SPEC["tests"] * 3, "parallel_cases": 3}
+    assert grader.process_limit(spec, 1) == 4
+    assert grader.process_limit(spec, 16) == 16
+    assert grader.process_limit(SPEC, 1) == 1
+
+
+def test_fit_complexity_on_synthetic_timings():
+    from backend.grader import fit_complexity
+
+    sizes = [1000, 2000, 4000, 8000, 16000]
+    assert fit_complexity(sizes, [1e-6 * n + 1e-4 for n in sizes]) == "n"
+    assert fit_complexity(sizes, [1e-9 * n * n for n in sizes]) == "n^2"
+    assert fit_complexity(sizes, [1e-7 * n * __import__("math").log2(n) for n in sizes]) == "n log n"
+
+
+PERF_ENTRY = {
+    "type": "performance",
+    "name": "has_duplicates",
+    "params": ["items"],
+    "input": {"generator": "int_list", "max_value": 10 ** 9},
+    "sizes": [250, 500, 1000, 2000],
+    "complexity": "n log n",
+    "reference": "def has_duplicates(items):\n    return len(set(items)) != len(items)\n",
+    "time_budget": 20,
+    "memory_budget": 4,
+    "repeats": 2,
+}
+
+
+def test_performance_entry_passes_efficient_solution(tmp_path):
+    from backend.grader import planned_cases
+
+    spec = {"entry": {**PERF_ENTRY, "sizes": [10000, 20000, 40000, 80000], "repeats": 3}}
+    code = "def has_duplicates(items):\n    return len(set(items)) != len(items)\n"
+    result = grade_solution(write_solution(tmp_path, code), "perf", spec)
+
+    assert len(planned_cases(spec)) == 5
+    assert result["summary"] == {"passed": 5, "total": 5}, result["cases"]
+    assert result["cases"][0]["input"] == ["n=10000"]
+    assert result["cases"][0]["peak_memory"] > 0 and result["cases"][0]["reference_time"] > 0
+
+
+def test_performance_entry_rejects_quadratic_solution(tmp_path):
+    code = (
+        "def has_duplicates(items):\n"
+        "    for i in range(len(items)):\n"
+        "        for j in range(i):\n"
+        "            if items[i] == items[j]:\n"
+        "                return True\n"
+        "    return False\n"
+    )
+    result = grade_solution(write_solution(tmp_path, code), "perf", {"entry": PERF_ENTRY})
+
+    complexity = result["cases"][-1]
+    assert complexity["status"] == "failed"
+    assert complexity["actual"] in ("O(n^2)", "O(n^3)", "O(2^n)")
+    assert result["cases"][-2]["status"] == "failed" and "Too slow" in result["cases"][-2]["error"]
+
+
+def test_performance_entry_checks_memory_and_results(tmp_path):
+    entry = {**PERF_ENTRY, "complexity": None, "time_budget": None}
+    hungry = "def has_duplicates(items):\n    copies = [list(items) for _ in range(200)]\n    return len(set(items)) != len(items)\n"
+    wrong = "def has_duplicates(items):\n    return True\n"
+
+    hungry_result = grade_solution(write_solution(tmp_path, hungry), "perf", {"entry": entry})
+    assert all("Too much memory" in case["error"] for case in hungry_result["cases"])
+
+    wrong_result = grade_solution(write_solution(tmp_path, wrong), "perf", {"entry": entry})
+    assert all(case["error"] == "Result differs from reference solution" for case in wrong_result["cases"])
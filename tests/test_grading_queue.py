@@ -0,0 +1,376 @@
+import asyncio
+import pytest
+from backend.grading_queue import GradingQueue, GradingJob, QueueFullError
+
+
+def make_job(idx):
+    return GradingJob(idx, f"user-{idx}", "task", "pass", {})
+
+
+@pytest.mark.asyncio
+async def test_workers_respect_concurrency_cap():
+    running, peak, done = 0, 0, []
+
+    async def handler(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        done.append(job.submission_id)
+
+    queue = GradingQueue(handler, workers=2, max_size=10)
+    await queue.start()
+    for i in range(6):
+        queue.submit(make_job(i))
+    await queue.join()
+    await queue.shutdown()
+
+    assert sorted(done) == list(range(6))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_submissions():
+    async def handler(job):
+        await asyncio.sleep(0)
+
+    queue = GradingQueue(handler, workers=1, max_size=2)
+    queue.submit(make_job(1))
+    queue.submit(make_job(2))
+    with pytest.raises(QueueFullError):
+        queue.submit(make_job(3))
+
+
+@pytest.mark.asyncio
+async def test_full_queue_keeps_previous_submission_of_student():
+    started, release, done = asyncio.Event(), asyncio.Event(), []
+
+    async def handler(job):
+        started.set()
+        await release.wait()
+        done.append(job.submission_id)
+
+    queue = GradingQueue(handler, workers=1, max_size=1)
+    await queue.start()
+    queue.submit(make_job(1))
+    await started.wait()
+    queue.submit(make_job(2))
+    # Очередь полна: новое решение отклонено, а идущая проверка прежнего не прерывается
+    with pytest.raises(QueueFullError):
+        queue.submit(GradingJob(3, "user-1", "task", "pass", {}))
+    # Решение той же задачи, что ждет в очереди, заменяется и при полной очереди
+    queue.submit(GradingJob(4, "user-2", "task", "pass", {}))
+    release.set()
+    await queue.join()
+    await queue.shutdown()
+    assert done == [1, 4]
+
+
+@pytest.mark.asyncio
+async def test_failing_job_does_not_stop_worker():
+    done = []
+
+    async def handler(job):
+        if job.submission_id == 0:
+            raise RuntimeError("boom")
+        done.append(job.submission_id)
+
+    queue = GradingQueue(handler, workers=1, max_size=10)
+    await queue.start()
+    queue.submit(make_job(0))
+    queue.submit(make_job(1))
+    await queue.join()
+    await queue.shutdown()
+    assert done == [1]
+
+
+@pytest.mark.asyncio
+async def test_progress_relay_sends_cases_in_order(monkeypatch):
+    from backend import grading_queue as module
+
+    sent = []
+
+    async def fake_send(user_id, message):
+        await asyncio.sleep(0)
+        sent.append(message["case"]["index"])
+
+    monkeypatch.setattr(module.manager, "send_to_student", fake_send)
+    job = GradingJob(1, "user-1", "task", "pass", {"entry": {"name": "f"}, "tests": [{}, {}, {}]})
+    relay = module.ProgressRelay(job)
+    for index in (1, 2, 3):
+        relay.push({"index": index, "status": "passed"})
+    await relay.close()
+
+    assert sent == [1, 2, 3]
+    assert relay.total == 3
+
+
+def session_job(idx, user, session, task="task"):
+    return GradingJob(idx, user, task, "pass", {}, session)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_round_robins_sessions_and_students():
+    order = []
+
+    async def handler(job):
+        order.append(job.submission_id)
+
+    queue = GradingQueue(handler, workers=1, max_size=20)
+    # Студент "a" сдал пачку разных задач, но не должен задерживать остальных
+    for i in range(3):
+        queue.submit(session_job(f"a{i}", "a", "s1", task=f"t{i}"))
+    queue.submit(session_job("b0", "b", "s1"))
+    queue.submit(session_job("c0", "c", "s2"))
+    await queue.start()
+    await queue.join()
+    await queue.shutdown()
+
+    assert order == ["a0", "c0", "b0", "a1", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_session_weight_gives_more_turns():
+    order = []
+
+    async def handler(job):
+        order.append(job.submission_id)
+
+    queue = GradingQueue(handler, workers=1, max_size=20)
+    queue.set_weight("big", 2)
+    for i in range(4):
+        queue.submit(session_job(f"big{i}", f"u{i}", "big"))
+        queue.submit(session_job(f"small{i}", f"v{i}", "small"))
+    await queue.start()
+    await queue.join()
+    await queue.shutdown()
+
+    assert order[:6] == ["big0", "big1", "small0", "big2", "big3", "small1"]
+
+
+@pytest.mark.asyncio
+async def test_student_in_flight_cap():
+    running, peak = {}, {}
+
+    async def handler(job):
+        running[job.user_id] = running.get(job.user_id, 0) + 1
+        peak[job.user_id] = max(peak.get(job.user_id, 0), running[job.user_id])
+        await asyncio.sleep(0.01)
+        running[job.user_id] -= 1
+
+    queue = GradingQueue(handler, workers=4, max_size=20, max_per_student=1)
+    for i in range(4):
+        queue.submit(session_job(f"a{i}", "a", "s1", task=f"t{i}"))
+    queue.submit(session_job("b0", "b", "s1"))
+    await queue.start()
+    await queue.join()
+    await queue.shutdown()
+
+    assert peak == {"a": 1, "b": 1}
+
+
+@pytest.mark.asyncio
+async def test_resubmission_supersedes_queued_and_running_jobs():
+    started, finished, cancelled = [], [], []
+    release = asyncio.Event()
+
+    async def handler(job):
+        started.append(job.submission_id)
+        await release.wait()
+        finished.append(job.submission_id)
+
+    async def on_cancel(job):
+        cancelled.append(job.submission_id)
+
+    queue = GradingQueue(handler, workers=2, max_size=20, max_per_student=2, on_cancel=on_cancel)
+    await queue.start()
+    queue.submit(session_job(1, "a", "s1"))
+    await asyncio.sleep(0.01)
+    queue.submit(session_job(2, "a", "s1", task="other"))
+    queue.submit(session_job(3, "a", "s1", task="other"))
+    await asyncio.sleep(0.01)
+    queue.submit(session_job(4, "a", "s1"))
+    await asyncio.sleep(0.01)
+    release.set()
+    await queue.join()
+    await queue.shutdown()
+
+    assert sorted(cancelled) == [1, 2]
+    assert sorted(finished) == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_deferred_supersede_cancels_all_but_kept_job():
+    started, finished, cancelled = [], [], []
+    release = asyncio.Event()
+
+    async def handler(job):
+        started.append(job.submission_id)
+        await release.wait()
+        finished.append(job.submission_id)
+
+    async def on_cancel(job):
+        cancelled.append(job.submission_id)
+
+    queue = GradingQueue(handler, workers=1, max_size=20, on_cancel=on_cancel)
+    await queue.start()
+    queue.submit(session_job(1, "a", "s1"))
+    await asyncio.sleep(0.01)
+    latest = session_job(2, "a", "s1")
+    # Пока отмена не записана в базу, старая проверка продолжает идти
+    queue.submit(latest, supersede=False)
+    await asyncio.sleep(0.01)
+    assert started == [1] and cancelled == [] and queue.depth == 1
+
+    queue.cancel("a", "task", keep=latest)
+    await asyncio.sleep(0.01)
+    release.set()
+    await queue.join()
+    await queue.shutdown()
+
+    assert cancelled == [1]
+    assert finished == [2]
+    assert queue.depth == 0 and queue.in_flight == 0
+
+
+def speculative_job(user, session, code="pass", task="task"):
+    return GradingJob(None, user, task, code, {}, session, speculative=True)
+
+
+@pytest.mark.asyncio
+async def test_speculative_jobs_wait_for_real_ones_and_are_capped():
+    order = []
+
+    async def handler(job):
+        order.append(("spec" if job.speculative else "real", job.user_id))
+
+    queue = GradingQueue(handler, workers=1, max_size=20, max_speculative_per_session=2)
+    assert queue.submit_speculative(speculative_job("a", "s1"))
+    assert queue.submit_speculative(speculative_job("b", "s1"))
+    assert not queue.submit_speculative(speculative_job("c", "s1"))
+    # Новый снимок того же студента заменяет старый, а не занимает место
+    assert queue.submit_speculative(speculative_job("a", "s1", code="x = 1"))
+    queue.submit(session_job(1, "d", "s1"))
+    await queue.start()
+    await queue.join()
+    await queue.shutdown()
+
+    assert order == [("real", "d"), ("spec", "b"), ("spec", "a")]
+
+
+@pytest.mark.asyncio
+async def test_real_submission_preempts_speculative_run():
+    events = []
+
+    async def handler(job):
+        kind = "spec" if job.speculative else "real"
+        try:
+            await asyncio.sleep(0.05 if kind == "real" else 10)
+            events.append(f"{kind} done")
+        except asyncio.CancelledError:
+            events.append(f"{kind} cancelled")
+            raise
+
+    async def on_cancel(job):
+        events.append("notified")
+
+    queue = GradingQueue(handler, workers=1, max_size=20, on_cancel=on_cancel)
+    await queue.start()
+    queue.submit_speculative(speculative_job("a", "s1"))
+    await asyncio.sleep(0.01)
+    queue.submit(session_job(1, "b", "s1"))
+    await queue.join()
+    await queue.shutdown()
+
+    assert events == ["spec cancelled", "real done"]
+
+
+@pytest.mark.asyncio
+async def test_speculative_grader_queues_parsable_snapshot_after_pause(monkeypatch):
+    from backend import speculative as module
+
+    submitted = []
+
+    class FakeQueue:
+        def submit_speculative(self, job):
+            submitted.append(job)
+            return True
+
+    monkeypatch.setattr(module, "current_task", lambda user_id: ("task", {"tests": []}))
+    grader = module.SpeculativeGrader(FakeQueue(), enabled=True, idle_seconds=0.02)
+    grader.code_changed("u1", "s1", "def f(:")
+    await asyncio.sleep(0.05)
+    grader.code_changed("u1", "s1", "def f(x):\n    return")
+    grader.code_changed("u1", "s1", "def f(x):\n    return x\n")
+    await asyncio.sleep(0.05)
+
+    assert [(job.code, job.speculative) for job in submitted] == [("def f(x):\n    return x\n", True)]
+
+
+@pytest.mark.asyncio
+async def test_speculative_grader_keeps_and_stops_running_checks(monkeypatch):
+    import time
+    from backend import speculative as module
+
+    submitted = []
+
+    class FakeQueue:
+        def submit_speculative(self, job):
+            submitted.append(job)
+            return True
+
+    monkeypatch.setattr(module, "current_task", lambda user_id: time.sleep(0.2) or ("task", {"tests": []}))
+    grader = module.SpeculativeGrader(FakeQueue(), enabled=True, idle_seconds=0.01)
+    grader.code_changed("u1", "s1", "x = 1\n")
+    await asyncio.sleep(0.05)
+    assert len(grader._tasks) == 1
+
+    await grader.stop()
+    assert not grader._tasks and submitted == []
+
+
+@pytest.mark.asyncio
+async def test_speculative_result_is_hit_by_real_submit(monkeypatch):
+    from types import SimpleNamespace
+    from backend import speculative as module
+    from backend.code_executor import grading_spec
+    from backend.models import AssignedTask
+    from backend.result_cache import ResultCache
+
+    rows = {AssignedTask: SimpleNamespace(task_id="task"), module.Task: SimpleNamespace(id="task", spec={"tests": []}, time_limit=2)}
+
+    class FakeSession:
+        def query(self, model):
+            self.model = model
+            return self
+
+        def filter(self, *conditions):
+            return self
+
+        def first(self):
+            return rows[self.model]
+
+        def close(self):
+            pass
+
+    async def runner(code, task_id, spec):
+        return {"status": "success", "test_results": []}
+
+    cache, runs = ResultCache(), []
+
+    class CachingQueue:
+        def submit_speculative(self, job):
+            runs.append(asyncio.ensure_future(cache.get_or_run(job.code, job.task_id, job.spec, runner)))
+            return True
+
+    monkeypatch.setattr(module, "SessionLocal", FakeSession)
+    monkeypatch.setattr(module, "result_cache", cache)
+    grader = module.SpeculativeGrader(CachingQueue(), enabled=True, idle_seconds=0.01)
+    code = "def f(x):\n    return x\n"
+    grader.code_changed("u1", "s1", code)
+    await asyncio.sleep(0.05)
+    await asyncio.gather(*runs)
+
+    # Редактор всегда присылает fail_fast: false
+    assert cache.lookup(code, "task", grading_spec({"tests": []}, 2, False)) == {"status": "success", "test_results": [], "cached": True}
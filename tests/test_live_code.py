@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+from backend.live_code import LiveCodeError, LiveCodeFeed, LiveCodeStore, apply_ops
+
+
+def test_ops_apply_in_sequence():
+    code = "def f(x):\n    return x\n"
+    ops = [{"p": 4, "d": 1, "i": "g"}, {"p": 22, "i": " + 1"}]
+    assert apply_ops(code, ops) == "def g(x):\n    return x + 1\n"
+    assert apply_ops("abc", [{"p": 0, "d": 3}]) == ""
+    with pytest.raises(LiveCodeError):
+        apply_ops("abc", [{"p": 2, "d": 5}])
+    with pytest.raises(LiveCodeError):
+        apply_ops("abc", [{"p": -1}])
+
+
+def test_positions_count_utf16_units():
+    # Эмодзи занимает две единицы UTF-16, кириллица - одну
+    code = "s = '😀'\nt = 'ж'\n"
+    assert apply_ops(code, [{"p": 7, "i": "!"}]) == "s = '😀!'\nt = 'ж'\n"
+    assert apply_ops(code, [{"p": 5, "d": 2}]) == "s = ''\nt = 'ж'\n"
+    assert apply_ops(code, [{"p": 14, "d": 1, "i": "щ"}]) == "s = '😀'\nt = 'щ'\n"
+    with pytest.raises(LiveCodeError):
+        apply_ops(code, [{"p": 6, "i": "x"}])
+
+
+def test_store_applies_deltas_and_requests_resync_once():
+    store = LiveCodeStore()
+    with pytest.raises(LiveCodeError):
+        store.apply("u1", 0, [{"p": 0, "i": "x"}])
+
+    store.snapshot("u1", "print()", 3)
+    buffer = store.apply("u1", 3, [{"p": 6, "i": "1"}])
+    assert (buffer.code, buffer.version) == ("print(1)", 4)
+
+    # Устаревшая версия: буфер не меняется, снимок просим один раз
+    with pytest.raises(LiveCodeError):
+        store.apply("u1", 3, [{"p": 0, "i": "x"}])
+    assert store.request_resync("u1")
+    assert not store.request_resync("u1")
+    with pytest.raises(LiveCodeError):
+        store.apply("u1", 4, [{"p": 0, "i": "x"}])
+    assert store.get("u1").code == "print(1)"
+
+    store.snapshot("u1", "print(2)", 9)
+    assert store.apply("u1", 9, [{"p": 8, "i": "\n"}]).code == "print(2)\n"
+    assert store.request_resync("u1")
+
+
+def test_store_evicts_least_recently_edited_buffers():
+    store = LiveCodeStore(max_entries=2, max_chars=10)
+    store.snapshot("u1", "aaaa", 1)
+    store.snapshot("u2", "bbbb", 1)
+    store.apply("u1", 1, [{"p": 4, "i": "a"}])
+    store.snapshot("u3", "cc", 1)
+    # u2 дольше всех не менялся, u1 только что правили
+    assert store.get("u2") is None and len(store) == 2
+    store.apply("u3", 1, [{"p": 2, "i": "cccccc"}])
+    assert store.get("u1") is None and store.get("u3").code == "cccccccc"
+    # Один буфер больше лимита символов все равно остается
+    store.snapshot("u3", "x" * 50, 2)
+    assert len(store) == 1 and store.get("u3").version == 2
+    store.forget("u3")
+    assert len(store) == 0 and store._chars == 0
+
+
+def test_malformed_delta_keeps_buffer():
+    store = LiveCodeStore()
+    store.snapshot("u1", "abc", 0)
+    with pytest.raises(LiveCodeError):
+        store.apply("u1", 0, [{"p": 1, "i": "x"}, {"p": 10, "d": 1}])
+    assert (store.get("u1").code, store.get("u1").version) == ("abc", 0)
+
+
+def type_text(store, feed, text):
+    for char in text:
+        buffer = store.get("u1")
+        ops = [{"p": len(buffer.code), "i": char}]
+        feed.push("u1", store.apply("u1", buffer.version, ops), ops)
+
+
+@pytest.mark.asyncio
+async def test_feed_coalesces_deltas_between_frames():
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    store = LiveCodeStore()
+    store.snapshot("u1", "x = 1", 0)
+    feed = LiveCodeFeed(send, store, max_fps=20)
+    feed.push("u1")
+    await asyncio.sleep(0.01)
+    assert sent == [{"type": "live_code_update", "user_id": "u1", "code": "x = 1", "version": 0}]
+
+    type_text(store, feed, "23")
+    await asyncio.sleep(0.01)
+    type_text(store, feed, "4")
+    assert len(sent) == 1
+    await asyncio.sleep(0.06)
+    assert sent[1] == {"type": "live_code_delta", "user_id": "u1", "base": 0, "version": 3,
+                       "ops": [{"p": 5, "i": "2"}, {"p": 6, "i": "3"}, {"p": 7, "i": "4"}]}
+    assert apply_ops("x = 1", sent[1]["ops"]) == store.get("u1").code
+
+    # Снимок студента перекрывает накопленные дельты
+    type_text(store, feed, "5")
+    store.snapshot("u1", "y = 2", 10)
+    feed.push("u1", store.get("u1"))
+    await asyncio.sleep(0.06)
+    assert sent[2:] == [{"type": "live_code_update", "user_id": "u1", "code": "y = 2", "version": 10}]
+
+
+@pytest.mark.asyncio
+async def test_slow_viewer_gets_latest_state_without_blocking_pushes():
+    sent, release = [], asyncio.Event()
+
+    async def send(message):
+        sent.append(message)
+        await release.wait()
+
+    store = LiveCodeStore()
+    store.snapshot("u1", "", 0)
+    feed = LiveCodeFeed(send, store, max_fps=0)
+    type_text(store, feed, "a")
+    await asyncio.sleep(0.01)
+    assert len(sent) == 1
+
+    # Пока первая отправка висит, правки только копятся
+    type_text(store, feed, "bcdefgh")
+    await asyncio.sleep(0.01)
+    assert len(sent) == 1
+    release.set()
+    await asyncio.sleep(0.01)
+    assert len(sent) == 2
+    # Правок стало больше, чем символов в буфере: дешевле отправить снимок
+    assert sent[1] == {"type": "live_code_update", "user_id": "u1", "code": "abcdefgh", "version": 8}
+    feed.close()
@@ -0,0 +1,151 @@
+import time
+import threading
+
+import pytest
+from backend.code_executor import CodeExecutor, grading_spec
+from backend.sandbox import LocalSandbox
+
+SPEC = {
+    "entry": {"type": "function", "name": "sum_two_numbers", "params": ["a", "b"]},
+    "tests": [{"args": [1, 2], "expected": 3}, {"args": [10, -2], "expected": 8}],
+}
+
+
+@pytest.fixture(scope="module")
+def executor():
+    return CodeExecutor(LocalSandbox(cpu_seconds=1, wall_timeout=2))
+
+
+@pytest.mark.asyncio
+async def test_correct_solution_passes(executor):
+    result = await executor.run_code("def sum_two_numbers(a, b):\n    return a + b\n", "sum_two_numbers", SPEC)
+    assert result["status"] == "success"
+    assert [case["status"] for case in result["test_results"]] == ["passed", "passed"]
+    assert result["execution_time"] is not None
+
+
+@pytest.mark.asyncio
+async def test_wrong_solution_fails(executor):
+    result = await executor.run_code("def sum_two_numbers(a, b):\n    return a * b\n", "sum_two_numbers", SPEC)
+    assert result["status"] == "error"
+    assert result["test_results"][0]["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_cpu_limit_stops_infinite_loop(executor):
+    result = await executor.run_code("while True:\n    pass\n", "sum_two_numbers", SPEC)
+    assert result["status"] == "error"
+    assert "limit" in result["error_message"].lower()
+
+
+@pytest.mark.asyncio
+async def test_network_is_unavailable(executor):
+    code = (
+        "import socket\n"
+        "def sum_two_numbers(a, b):\n"
+        "    try:\n"
+        "        socket.create_connection(('1.1.1.1', 53), timeout=1)\n"
+        "        return 'network'\n"
+        "    except OSError:\n"
+        "        return a + b\n"
+    )
+    result = await executor.run_code(code, "sum_two_numbers", SPEC)
+    assert result["status"] == "success"
+
+
+@pytest.mark.asyncio
+async def test_solution_does_not_see_api_environment(executor, monkeypatch):
+    # forkserver мог стартовать раньше и не увидеть эту переменную, но у него есть и свои
+    # (PYTEST_CURRENT_TEST, настройки API): решению не должна достаться ни одна
+    monkeypatch.setenv("SECRET_KEY", "leak")
+    code = "import os\ndef sum_two_numbers(a, b):\n    return sorted(os.environ)\n"
+    spec = {**SPEC, "tests": [{"args": [1, 2], "expected": []}]}
+    result = await executor.run_code(code, "sum_two_numbers", spec)
+    assert set(result["test_results"][0]["actual"]) <= {"PATH", "LANG", "LC_ALL"}
+
+
+@pytest.mark.asyncio
+async def test_sys_exit_is_reported(executor):
+    result = await executor.run_code("import sys\nsys.exit(3)\n", "sum_two_numbers", SPEC)
+    assert result["status"] == "error"
+    assert result["error_message"]
+
+
+SLOW_SECOND_CASE = (
+    "import time\n"
+    "def sum_two_numbers(a, b):\n"
+    "    if a == 10:\n"
+    "        time.sleep(30)\n"
+    "    return a + b\n"
+)
+
+
+@pytest.mark.asyncio
+async def test_case_deadline_marks_only_slow_case(executor):
+    result = await executor.run_code(SLOW_SECOND_CASE, "sum_two_numbers", grading_spec(SPEC, 1))
+    assert result["status"] == "error"
+    assert [case["status"] for case in result["test_results"]] == ["passed", "timeout"]
+    assert result["test_results"][1]["wall_time"] < 2
+
+
+@pytest.mark.asyncio
+async def test_run_deadline_kills_solution_and_keeps_finished_cases(executor):
+    started = time.monotonic()
+    result = await executor.run_code(SLOW_SECOND_CASE, "sum_two_numbers", SPEC)
+    assert time.monotonic() - started < 5
+    assert result["error_message"].startswith("Time limit exceeded")
+    assert [case["status"] for case in result["test_results"]] == ["passed", "timeout"]
+
+
+def test_run_deadline_matches_docker_backend():
+    from backend.config import settings
+
+    assert LocalSandbox(cpu_seconds=1).wall_timeout == settings.EXECUTION_TIMEOUT
+
+
+@pytest.mark.asyncio
+async def test_cancelled_run_kills_child():
+    import asyncio
+
+    finished = threading.Event()
+
+    class Recording(LocalSandbox):
+        def _run_sync(self, *args, **kwargs):
+            try:
+                return super()._run_sync(*args, **kwargs)
+            finally:
+                finished.set()
+
+    running = asyncio.create_task(Recording(cpu_seconds=5).run("while True:\n    pass\n", "sum_two_numbers", SPEC))
+    await asyncio.sleep(0.5)
+    running.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running
+    # Без убийства процесса поток ждал бы дедлайн прогона (EXECUTION_TIMEOUT)
+    assert await asyncio.to_thread(finished.wait, 3)
+
+
+@pytest.mark.asyncio
+async def test_result_reports_process_resources(executor):
+    result = await executor.run_code("def sum_two_numbers(a, b):\n    return a + b\n", "sum_two_numbers", SPEC)
+    assert result["peak_memory"] > 0
+    assert result["process_cpu_time"] >= 0
+    # Без собственного cgroup троттлинг и OOM неизвестны
+    assert result["throttled_time"] is None and result["oom_killed"] is None
+
+
+@pytest.mark.asyncio
+async def test_batch_leaves_ungraded_solutions_out():
+    from backend.sandbox import SandboxBackend, SandboxError
+
+    class Flaky(SandboxBackend):
+        async def run(self, code, task_id, spec, on_case=None):
+            if code == "broken":
+                raise SandboxError("Docker not available")
+            return {"summary": {"passed": 1, "total": 1}}
+
+    solutions = [{"id": 1, "code": "ok"}, {"id": 2, "code": "broken"}]
+    results = await CodeExecutor(Flaky()).run_batch("sum_two_numbers", SPEC, solutions)
+    # Непроверенное решение не получает результат-ошибку, его прежняя оценка останется в базе
+    assert list(results) == [1]
+    assert results[1]["status"] == "success"
@@ -0,0 +1,84 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from backend import presence as module
+from backend.models import UserStatus
+from backend.presence import PresenceTable
+
+
+def test_status_changes_are_reported_once():
+    table = PresenceTable()
+    assert table.connected("u1", "s1")
+    assert not table.set_status("u1", "online")
+    assert table.set_status("u1", "typing")
+    assert not table.set_status("u1", "typing")
+    assert not table.set_status("u1", "bogus") and not table.set_status("u1", "offline")
+
+    # Вторая вкладка возвращает статус online; студент онлайн, пока не закроет обе
+    assert table.connected("u1", "s1")
+    assert not table.connected("u1", "s1")
+    assert not table.disconnected("u1")
+    assert not table.disconnected("u1")
+    assert table.disconnected("u1")
+    assert table.get("u1").status == UserStatus.OFFLINE
+    assert not table.set_status("u1", "online")
+
+
+def test_reaper_marks_idle_students_afk_then_offline():
+    table = PresenceTable(afk_seconds=60, offline_seconds=90)
+    table.connected("u1", "s1")
+    table.connected("u2", "s1")
+    now = time.monotonic()
+    assert table.reap(now + 30) == []
+
+    table.get("u2").active_at = now + 40
+    assert [e.user_id for e in table.reap(now + 70)] == ["u1"]
+    assert table.get("u1").status == UserStatus.AFK
+
+    # Ping обновляет только seen_at: студент остается AFK, но не считается оборванным
+    table.seen("u1")
+    table.get("u1").seen_at = now + 80
+    reaped = table.reap(now + 120)
+    assert [e.user_id for e in reaped] == ["u2"]
+    assert table.get("u2").status == UserStatus.OFFLINE and table.get("u2").connections == 0
+    assert table.get("u1").status == UserStatus.AFK
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_one_batch_and_retries_on_failure(monkeypatch):
+    batches, fail = [], [True]
+
+    def fake_write(rows):
+        if fail[0]:
+            raise RuntimeError("db down")
+        batches.append(sorted((row["id"], row["status"], row["is_online"]) for row in rows))
+
+    monkeypatch.setattr(module, "write_presence", fake_write)
+    table = PresenceTable()
+    table.connected("u1", "s1")
+    table.connected("u2", "s1")
+    table.set_status("u2", "typing")
+    await table.flush()
+    assert batches == []
+
+    fail[0] = False
+    table.disconnected("u1")
+    await table.flush()
+    assert batches == [[("u1", "OFFLINE", False), ("u2", "TYPING", True)]]
+    # Офлайн сохранен - запись больше не нужна; без изменений база не трогается
+    assert table.get("u1") is None
+    await table.flush()
+    assert len(batches) == 1
+
+
+def test_overlay_prefers_live_presence():
+    table = PresenceTable()
+    table.connected("u1", "s1")
+    table.set_status("u1", "typing")
+    response = SimpleNamespace(id="u1", is_online=False, status=UserStatus.OFFLINE, last_seen=None)
+    table.overlay(response)
+    assert (response.is_online, response.status) == (True, UserStatus.TYPING)
+    other = SimpleNamespace(id="u2", is_online=False, status=UserStatus.OFFLINE, last_seen=None)
+    assert table.overlay(other).status == UserStatus.OFFLINE
+    assert table.status_of("u2", "stored") == "stored"
@@ -0,0 +1,26 @@
+import resource
+
+from backend.resource_usage import cgroup_counters, measure
+
+
+def test_cgroup_v2_counters(tmp_path):
+    (tmp_path / "cpu.stat").write_text("usage_usec 900\nnr_throttled 2\nthrottled_usec 1500000\n")
+    (tmp_path / "memory.events").write_text("low 0\nhigh 0\nmax 3\noom 1\noom_kill 1\n")
+    assert cgroup_counters(tmp_path) == {"throttled_usec": 1500000, "oom_kill": 1}
+
+
+def test_cgroup_v1_counters(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "cpu" / "cpu.stat").write_text("nr_periods 10\nthrottled_time 2000000\n")
+    (tmp_path / "memory" / "memory.oom_control").write_text("oom_kill_disable 0\nunder_oom 0\noom_kill 0\n")
+    assert cgroup_counters(tmp_path) == {"throttled_usec": 2000, "oom_kill": 0}
+
+
+def test_measure_takes_deltas():
+    usage = measure(resource.getrusage(resource.RUSAGE_SELF), {"throttled_usec": 1000000, "oom_kill": 0}, {"throttled_usec": 1250000, "oom_kill": 1})
+    assert usage["throttled_time"] == 0.25
+    assert usage["oom_killed"] is True
+    assert usage["peak_memory"] > 0
+
+    assert measure(resource.getrusage(resource.RUSAGE_SELF), {}, {})["oom_killed"] is None
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from backend.result_cache import ResultCache, cache_key
+
+SPEC = {"entry": {"type": "function", "name": "f"}, "tests": [{"args": [1], "expected": 1}]}
+
+
+def test_cache_key_ignores_whitespace_and_comments():
+    a = "def f(x):\n    return x\n"
+    b = "# comment\ndef f(x):   # identity\n\n    return x"
+    assert cache_key(a, "t", SPEC) == cache_key(b, "t", SPEC)
+    assert cache_key(a, "t", SPEC) != cache_key("def f(x):\n    return x + 0\n", "t", SPEC)
+    assert cache_key(a, "t", SPEC) != cache_key(a, "t", {**SPEC, "tests": []})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_submissions_share_one_run():
+    calls = 0
+
+    async def runner(code, task_id, spec):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"status": "success", "test_results": []}
+
+    cache = ResultCache(max_entries=10)
+    results = await asyncio.gather(*(cache.get_or_run("def f(x): return x", "t", SPEC, runner) for _ in range(5)))
+    assert calls == 1
+    assert all(r["status"] == "success" for r in results)
+
+    await cache.get_or_run("def f(x):\n    return x", "t", SPEC, runner)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_task_invalidation():
+    async def runner(code, task_id, spec):
+        return {"status": "success", "test_results": []}
+
+    cache = ResultCache(max_entries=2)
+    for i in range(3):
+        await cache.get_or_run(f"x = {i}", "t", SPEC, runner)
+    assert len(cache) == 2
+    assert cache.get(cache_key("x = 0", "t", SPEC)) is None
+
+    cache.invalidate_task("t")
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_system_errors_are_not_cached():
+    async def runner(code, task_id, spec):
+        return {"status": "error", "error_message": "System Error: boom"}
+
+    cache = ResultCache(max_entries=10)
+    await cache.get_or_run("x = 1", "t", SPEC, runner)
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_timed_out_cases_are_not_cached():
+    async def runner(code, task_id, spec):
+        return {"status": "error", "test_results": [{"index": 1, "status": "timeout"}]}
+
+    cache = ResultCache(max_entries=10)
+    await cache.get_or_run("x = 1", "t", SPEC, runner)
+    assert len(cache) == 0
+
+
+def test_time_budget_failures_are_not_cached():
+    from backend.result_cache import is_cacheable
+
+    slow = {"status": "error", "test_results": [{"status": "failed", "error": "Too slow: 12.0 ms > 5.0 ms"}]}
+    wrong = {"status": "error", "test_results": [{"status": "failed", "error": "Result differs from reference solution"}]}
+    assert not is_cacheable(slow)
+    assert is_cacheable(wrong)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from backend import runtime_stats as module
+from backend.runtime_stats import RuntimeStats, Samples, TimedQueuePool
+from backend.sandbox import StubSandbox
+
+
+def test_samples_report_percentiles_in_ms():
+    samples = Samples(size=100)
+    for i in range(1, 201):
+        samples.add(i / 1000)
+    # Считаются последние size значений, счетчик - все
+    assert samples.summary() == {"count": 200, "p50_ms": 151.0, "p99_ms": 200.0, "max_ms": 200.0}
+    samples.reset()
+    assert samples.summary()["p50_ms"] is None
+
+
+def test_pool_checkout_waits_are_recorded(tmp_path):
+    module.pool_waits.reset()
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+    with engine.connect() as connection:
+        connection.execute(text("select 1"))
+    with engine.connect():
+        pass
+    assert module.pool_waits.count == 2
+    stats = RuntimeStats().summary(engine.pool)
+    assert stats["db_pool"] == {"size": 1, "checked_out": 0, "overflow": 0}
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_probe_sees_blocked_event_loop():
+    stats = RuntimeStats(probe_interval=0.01)
+    await stats.start()
+    await asyncio.sleep(0.05)
+    time.sleep(0.2)
+    await asyncio.sleep(0.05)
+    await stats.stop()
+    assert stats.loop_lag.summary()["max_ms"] >= 150
+
+
+@pytest.mark.asyncio
+async def test_stub_backend_passes_every_planned_case():
+    spec = {"entry": {"name": "solve", "tests": [{"input": [1], "output": 1}, {"input": [2], "output": 2}]}}
+    seen = []
+    result = await StubSandbox(case_delay=0.001).run("pass", "t1", spec, on_case=seen.append)
+    assert result["summary"] == {"passed": 2, "total": 2}
+    assert [case["index"] for case in seen] == [1, 2]
+    assert result["timing"]["total"]["wall_time"] > 0
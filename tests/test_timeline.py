@@ -0,0 +1,53 @@
+import os
+import pytest
+from backend import timeline as module
+from backend.live_code import LiveBuffer
+from backend.timeline import TimelineLog, read_events, replay
+
+SESSION = "6f1c2a9e-5b7d-4e21-9a0c-1d2e3f4a5b6c"
+
+
+@pytest.mark.asyncio
+async def test_edits_are_replayed_from_compressed_blocks(tmp_path):
+    log = TimelineLog(directory=str(tmp_path), flush_interval=60)
+    log.record(SESSION, "u1", LiveBuffer("def f():\n", 1))
+    log.record(SESSION, "u2", LiveBuffer("x = 1\n", 1))
+    log.record(SESSION, "u1", LiveBuffer("def f():\n    pass\n", 2), [{"p": 9, "i": "    pass\n"}])
+    await log.flush()
+    for version in range(3, 203):
+        log.record(SESSION, "u1", LiveBuffer("", version), [{"p": 0, "i": "#"}])
+    await log.flush()
+
+    frames = log.read(SESSION, "u1")
+    assert [frame["version"] for frame in frames] == list(range(1, 203))
+    assert frames[0]["code"] == "def f():\n" and frames[1]["ops"] == [{"p": 9, "i": "    pass\n"}]
+    # 200 однотипных правок сжимаются: блок заметно меньше сырого MessagePack
+    assert os.path.getsize(log.path(SESSION)) < 2000
+    assert [frame["version"] for frame in log.read(SESSION, "u1", until=frames[1]["t"])] == [1, 2]
+    assert log.read(SESSION, "u3") == []
+
+
+def test_reader_skips_torn_tail_and_broken_chains(tmp_path):
+    path = str(tmp_path / "session.timeline")
+    module.append_block(path, [[1.0, "u1", 1, "s", "ab"], [2.0, "u1", 2, "d", [{"p": 2, "i": "c"}]]])
+    # Блок второго процесса записан раньше по времени, но позже в файле
+    module.append_block(path, [[1.5, "u2", 1, "s", "zz"]])
+    with open(path, "ab") as f:
+        f.write(b"\x10\x00\x00\x00 torn")
+    assert [event[0] for event in read_events(path)] == [1.0, 1.5, 2.0]
+
+    events = read_events(path, "u1") + [
+        [3.0, "u1", 4, "d", [{"p": 0, "i": "lost base"}]],
+        [4.0, "u1", 5, "d", [{"p": 0, "i": "x"}]],
+        [5.0, "u1", 10, "s", "fresh"],
+        [6.0, "u1", 11, "d", [{"p": 9, "i": "out of range"}]],
+    ]
+    assert [frame["version"] for frame in replay(events)] == [1, 2, 10]
+
+
+def test_disabled_log_records_nothing(tmp_path):
+    log = TimelineLog(directory="")
+    log.record(SESSION, "u1", LiveBuffer("x", 1))
+    assert log._pending == {} and log.read(SESSION, "u1") == []
+    with pytest.raises(ValueError):
+        TimelineLog(directory=str(tmp_path)).path("../../etc/passwd")
@@ -9,4 +9,34 @@ def test_websocket_connection():
         try:
             data = websocket.receive_json()
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+def test_malformed_frame_does_not_end_student_session(monkeypatch):
+    from backend import main
+
+    monkeypatch.setattr(main, "student_session", lambda user_id: "00000000-0000-0000-0000-000000000001")
+    with client.websocket_connect("/ws/student/frames") as websocket:
+        websocket.send_bytes(b"\xc1")
+        websocket.send_text("{not json")
+        # Ответ на дельту без буфера приходит, только если сессия пережила испорченные кадры
+        websocket.send_json({"type": "code_delta", "base": 5, "ops": []})
+        assert websocket.receive_json() == {"type": "code_resync"}
+        assert "frames" in main.manager.active_connections
+    assert "frames" not in main.manager.active_connections
+
+
+def test_failed_student_session_goes_offline(monkeypatch):
+    from backend import main
+    from backend.presence import presence
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main, "student_session", lambda user_id: "00000000-0000-0000-0000-000000000001")
+    monkeypatch.setattr(main.timeline, "record", broken)
+    with pytest.raises(RuntimeError):
+        with client.websocket_connect("/ws/student/crash") as websocket:
+            websocket.send_json({"type": "code_snapshot", "version": 1, "code": ""})
+            websocket.receive_json()
+    assert "crash" not in main.manager.active_connections
+    assert not presence.get("crash").is_online
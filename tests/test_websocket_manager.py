@@ -0,0 +1,94 @@
+import asyncio
+import json
+import msgpack
+import pytest
+from backend.websocket_manager import ConnectionManager
+
+
+class FakeSocket:
+    def __init__(self, stall: bool = False, broken: bool = False, subprotocols=()):
+        self.sent = []
+        self.closed_with = None
+        self.stall = stall
+        self.broken = broken
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.subprotocol = None
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def send_text(self, text):
+        if self.broken:
+            raise RuntimeError("connection reset")
+        if self.stall:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        await self.send_text(json.dumps(msgpack.unpackb(data)))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+@pytest.mark.asyncio
+async def test_fan_out_reaches_only_viewers_of_student():
+    manager = ConnectionManager(max_queue=8)
+    watching, other, elsewhere = FakeSocket(), FakeSocket(), FakeSocket()
+    for socket, session in ((watching, "s1"), (other, "s1"), (elsewhere, "s2")):
+        await manager.connect_admin(socket, session)
+    manager.set_admin_viewing(watching, "u1")
+    manager.set_admin_viewing(other, "u2")
+    manager.set_admin_viewing(elsewhere, "u1")
+
+    await manager.send_to_admins_viewing_student("s1", "u1", {"type": "submission_progress"})
+    await manager.broadcast_to_admins("s1", {"type": "student_update"})
+    await asyncio.sleep(0.01)
+    assert [m["type"] for m in watching.sent] == ["submission_progress", "student_update"]
+    assert [m["type"] for m in other.sent] == ["student_update"]
+    assert elsewhere.sent == []
+
+    manager.set_admin_viewing(watching, "u2")
+    assert manager.viewers[("s1", "u2")] == {watching, other}
+    assert ("s1", "u1") not in manager.viewers
+    manager.disconnect_admin(watching, "s1")
+    manager.disconnect_admin(other, "s1")
+    assert "s1" not in manager.admin_connections
+    assert list(manager.viewers) == [("s2", "u1")]
+    manager.disconnect_admin(elsewhere, "s2")
+
+
+@pytest.mark.asyncio
+async def test_slow_and_broken_clients_are_evicted():
+    manager = ConnectionManager(max_queue=2)
+    slow, broken, healthy = FakeSocket(stall=True), FakeSocket(broken=True), FakeSocket()
+    for socket in (slow, broken, healthy):
+        await manager.connect_admin(socket, "s1")
+
+    for i in range(4):
+        await manager.broadcast_to_admins("s1", {"type": "student_update", "n": i})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    # Застрявший клиент держит одно сообщение в отправке и два в очереди, четвертое переполняет ее
+    assert manager.admin_connections["s1"] == {healthy}
+    assert slow.closed_with == 1013 and broken.closed_with == 1013
+    assert [m["n"] for m in healthy.sent] == [0, 1, 2, 3]
+    manager.disconnect_admin(slow, "s1")
+    manager.disconnect_admin(healthy, "s1")
+
+
+@pytest.mark.asyncio
+async def test_stale_student_socket_does_not_drop_reconnected_one():
+    manager = ConnectionManager(max_queue=4)
+    old, new = FakeSocket(), FakeSocket()
+    await manager.connect_student(old, "u1")
+    await manager.connect_student(new, "u1")
+    manager.disconnect_student("u1", old)
+    assert manager.active_connections["u1"] is new
+
+    await manager.send_personal_message({"type": "task_assigned"}, new)
+    await asyncio.sleep(0.01)
+    assert new.sent == [{"type": "task_assigned"}]
+    manager.disconnect_student("u1", new)
+    assert "u1" not in manager.active_connections
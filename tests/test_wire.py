@@ -0,0 +1,42 @@
+import asyncio
+from datetime import datetime
+from uuid import UUID
+
+import msgpack
+import pytest
+from backend.websocket_manager import ConnectionManager
+from backend.wire import Frame, decode, encode
+from tests.test_websocket_manager import FakeSocket
+
+MESSAGE = {"type": "submission_result", "submission": {"id": UUID(int=1), "submitted_at": datetime(2024, 5, 1, 12, 30), "test_results": [{"time": 0.5}]}}
+EXPECTED = {"type": "submission_result", "submission": {"id": str(UUID(int=1)), "submitted_at": "2024-05-01T12:30:00", "test_results": [{"time": 0.5}]}}
+
+
+def test_both_codecs_round_trip_the_same_message():
+    text = encode(MESSAGE, "json")
+    packed = encode(MESSAGE, "msgpack")
+    assert isinstance(text, str) and isinstance(packed, bytes)
+    assert decode(text) == decode(packed) == EXPECTED
+    assert len(packed) < len(text.encode("utf-8"))
+
+
+def test_frame_encodes_once_per_codec():
+    frame = Frame({"type": "student_update", "status": "online"})
+    assert frame.encoded("msgpack") is frame.encoded("msgpack")
+    assert frame.encoded(None) is frame.encoded(None)
+    assert decode(frame.encoded("msgpack")) == decode(frame.encoded(None))
+
+
+@pytest.mark.asyncio
+async def test_subprotocol_is_negotiated_per_socket():
+    manager = ConnectionManager(max_queue=8)
+    binary, text, legacy = FakeSocket(subprotocols=["msgpack", "json"]), FakeSocket(subprotocols=["json"]), FakeSocket()
+    for socket in (binary, text, legacy):
+        await manager.connect_admin(socket, "s1")
+    assert (binary.subprotocol, text.subprotocol, legacy.subprotocol) == ("msgpack", "json", None)
+
+    await manager.broadcast_to_admins("s1", {"type": "student_update", "user_id": "u1"})
+    await asyncio.sleep(0.01)
+    assert binary.sent == text.sent == legacy.sent == [{"type": "student_update", "user_id": "u1"}]
+    for socket in (binary, text, legacy):
+        manager.disconnect_admin(socket, "s1")
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from backend import worker as module
+from backend.grading_queue import GradingJob
+
+SPEC = {"entry": {"name": "f"}, "tests": [{}, {}]}
+
+
+class RecordingNotifier:
+    def __init__(self):
+        self.events = []
+
+    def send(self, event):
+        self.events.append(event)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    state = {"queue": [GradingJob(f"s{i}", f"u{i}", "task", f"x = {i}", SPEC, "session") for i in range(3)], "stored": [], "released": []}
+
+    def claim_jobs(worker_id, limit):
+        jobs, state["queue"] = state["queue"][:limit], state["queue"][limit:]
+        return jobs, []
+
+    def store_result(submission_id, result, lease_owner=None):
+        state["stored"].append((submission_id, lease_owner))
+        return {"submission": {"id": submission_id}}
+
+    async def run_code(code, task_id, spec, on_case=None):
+        for index in (1, 2):
+            on_case({"index": index, "status": "passed"})
+        await asyncio.sleep(0.01)
+        return {"status": "success", "test_results": []}
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(module, "claim_jobs", claim_jobs)
+    monkeypatch.setattr(module, "store_result", store_result)
+    monkeypatch.setattr(module, "release_jobs", lambda worker_id, ids: state["released"].extend(ids))
+    monkeypatch.setattr(module.code_executor, "run_code", run_code)
+    monkeypatch.setattr(module.code_executor, "start", noop)
+    monkeypatch.setattr(module.code_executor, "shutdown", noop)
+    monkeypatch.setattr(module.result_cache, "get_or_run", lambda code, task_id, spec, runner: runner(code, task_id, spec))
+    monkeypatch.setattr(module.settings, "WORKER_POLL_INTERVAL", 0.01)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_worker_grades_claimed_jobs_and_notifies_api(fake_backend):
+    notifier = RecordingNotifier()
+    worker = module.GradingWorker(worker_id="w1", concurrency=2, notifier=notifier)
+    running = asyncio.create_task(worker.run())
+    for _ in range(100):
+        if len(fake_backend["stored"]) == 3:
+            break
+        await asyncio.sleep(0.01)
+    worker.stop()
+    await running
+
+    assert sorted(fake_backend["stored"]) == [("s0", "w1"), ("s1", "w1"), ("s2", "w1")]
+    finished = [e["submission_id"] for e in notifier.events if e["type"] == "finished"]
+    assert sorted(finished) == ["s0", "s1", "s2"]
+    progress = [e for e in notifier.events if e["type"] == "progress" and e["submission_id"] == "s0"]
+    assert [(e["done"], e["total"]) for e in progress] == [(1, 2), (2, 2)]
+    assert fake_backend["released"] == []
+
+
+@pytest.mark.asyncio
+async def test_stopping_worker_releases_unfinished_jobs(fake_backend, monkeypatch):
+    async def hang(code, task_id, spec, on_case=None):
+        await asyncio.sleep(30)
+
+    monkeypatch.setattr(module.code_executor, "run_code", hang)
+    worker = module.GradingWorker(worker_id="w1", concurrency=2, notifier=RecordingNotifier())
+    running = asyncio.create_task(worker.run())
+    await asyncio.sleep(0.05)
+    worker.stop()
+    await running
+
+    assert sorted(fake_backend["released"]) == ["s0", "s1"]
+    assert fake_backend["stored"] == []
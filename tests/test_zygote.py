@@ -0,0 +1,105 @@
+import io
+import json
+import os
+
+import pytest
+from backend.zygote import serve
+
+SPEC = {
+    "entry": {"type": "function", "name": "probe", "params": ["x"]},
+    "tests": [{"args": [1], "expected": False}, {"args": [2], "expected": False}],
+}
+LIMITS = {"cpu_seconds": 2, "file_size": 1024 * 1024, "max_processes": 64}
+
+
+def make_job(job_id, code, timeout=2):
+    return {"id": job_id, "task_id": "probe", "spec": SPEC, "code": code, "timeout": timeout, "limits": LIMITS}
+
+
+def run_jobs(*jobs):
+    stdin = io.BytesIO(b"".join(json.dumps(job).encode() + b"\n" for job in jobs))
+    stdout = io.BytesIO()
+    serve(stdin, stdout)
+    return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+
+def test_each_job_runs_in_fresh_child():
+    # Первое решение портит модуль грейдера, второе не должно этого увидеть
+    leaky = "import backend.grader as g\ng.leaked = True\ndef probe(x):\n    print('noise')\n    return False\n"
+    check = "import backend.grader as g\ndef probe(x):\n    return hasattr(g, 'leaked')\n"
+    records = run_jobs(make_job("a", leaky), make_job("b", check))
+
+    cases = [(r["id"], r["case"]["status"]) for r in records if "case" in r]
+    assert cases == [("a", "passed"), ("a", "passed"), ("b", "passed"), ("b", "passed")]
+    results = {r["id"]: r["result"] for r in records if "result" in r}
+    assert results["a"]["summary"] == results["b"]["summary"] == {"passed": 2, "total": 2}
+
+
+def test_deadline_kills_child_and_keeps_serving():
+    hung = "import time\ndef probe(x):\n    if x == 2:\n        time.sleep(30)\n    return False\n"
+    ok = "def probe(x):\n    return False\n"
+    records = run_jobs(make_job("slow", hung, timeout=0.5), make_job("next", ok))
+
+    slow = [r for r in records if r["id"] == "slow"]
+    assert slow[0]["case"]["status"] == "passed"
+    assert slow[-1]["killed"] == "Time limit exceeded (0.5s)"
+    assert any(r["id"] == "next" and "result" in r for r in records)
+
+
+def test_result_carries_child_resource_usage():
+    hog = "data = bytearray(64 * 1024 * 1024)\ndef probe(x):\n    return False\n"
+    records = run_jobs(make_job("hog", hog), make_job("small", "def probe(x):\n    return False\n"))
+    usage = {r["id"]: r["usage"] for r in records if "result" in r}
+
+    assert usage["hog"]["peak_memory"] - usage["small"]["peak_memory"] >= 60 * 1024 * 1024
+    assert usage["hog"]["cpu_time"] >= 0
+
+
+def test_oom_kill_is_reported(monkeypatch):
+    from backend import zygote
+
+    counters = iter([{"oom_kill": 0}, {"oom_kill": 1}])
+    monkeypatch.setattr(zygote, "cgroup_counters", lambda: next(counters))
+    killer = "import os, signal\nos.kill(os.getpid(), signal.SIGKILL)\n"
+    records = run_jobs(make_job("oom", killer))
+
+    assert records[-1]["killed"] == "Out of memory"
+    assert records[-1]["usage"]["oom_killed"] is True
+
+
+def test_parallel_cases_fork_under_process_limit_as_unprivileged_user(monkeypatch):
+    # Лимит процессов не действует на root, а учитывает все процессы и потоки пользователя,
+    # поэтому проверка идет от имени свободного uid
+    if os.geteuid() != 0:
+        pytest.skip("needs root to switch to an unprivileged user")
+    from backend import grader
+
+    monkeypatch.setattr(grader, "available_cpus", lambda: 3)
+    spec = {
+        "entry": {"type": "function", "name": "probe", "params": ["x"]},
+        "tests": [{"args": [i], "expected": 1} for i in range(4)],
+        "parallel_cases": 3,
+    }
+    code = "seen = []\ndef probe(x):\n    seen.append(x)\n    return len(seen)\n"
+    job = {**make_job("par", code), "spec": spec, "limits": {**LIMITS, "max_processes": 1}}
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            os.setgroups([])
+            os.setgid(54321)
+            os.setuid(54321)
+            stdout = io.BytesIO()
+            serve(io.BytesIO(json.dumps(job).encode() + b"\n"), stdout)
+            os.write(write_fd, stdout.getvalue())
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as pipe:
+        records = [json.loads(line) for line in pipe.read().splitlines()]
+    os.waitpid(pid, 0)
+
+    result = records[-1]["result"]
+    assert "error" not in result
+    assert result["summary"] == {"passed": 4, "total": 4}